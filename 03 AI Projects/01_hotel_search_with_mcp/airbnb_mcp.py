@@ -14,9 +14,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_agent
 from langchain.messages import HumanMessage
 
-from scripts import base_tools, prompts
+from scripts import base_tools, mcp_pool, prompts
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 
 # Set UTF-8 encoding for Windows console
@@ -27,17 +26,8 @@ model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview")
 
 
 async def get_tools():
-    client = MultiServerMCPClient(
-        {
-            "airbnb": {
-                "command": "npx",
-                "args": ["-y", "@openbnb/mcp-server-airbnb", "--ignore-robots-txt"],
-                "transport": "stdio",
-            }
-        }
-    )
-
-    mcp_tools = await client.get_tools()
+    # airbnb server is started once and reused across queries
+    mcp_tools = await mcp_pool.get_tools("airbnb")
 
     tools = mcp_tools + [base_tools.web_search, base_tools.get_weather]
 
@@ -71,6 +61,8 @@ async def ask():
 
         await hotel_search(query)
 
+    await mcp_pool.close()
+
 
 if __name__ == "__main__":
     # query = "Show me hotels for a party in Pune, India. also check the latest news and weather."
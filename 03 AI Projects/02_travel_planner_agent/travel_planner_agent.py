@@ -13,11 +13,9 @@ load_dotenv()
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_agent
 from langchain.messages import HumanMessage
-from langgraph.checkpoint.memory import InMemorySaver
 
-from scripts import base_tools, prompts, utils
+from scripts import base_tools, checkpointers, mcp_pool, prompts
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 
 # Set UTF-8 encoding for Windows console
@@ -26,16 +24,13 @@ if sys.platform == "win32":
 
 model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview")
 
-checkpointer = InMemorySaver()
+# Bounded in-memory by default; CHECKPOINTER=sqlite persists threads to disk
+checkpointer = checkpointers.get_checkpointer()
 
 
 async def get_tools():
-    mcp_config = utils.load_mcp_config("airbnb", "google-calendar")
-    # print("mcp config loaded:", mcp_config)
-
-    client = MultiServerMCPClient(mcp_config)
-
-    mcp_tools = await client.get_tools()
+    # servers are started once and reused across queries
+    mcp_tools = await mcp_pool.get_tools("airbnb", "google-calendar")
 
     tools = mcp_tools + [base_tools.web_search, base_tools.get_weather]
 
@@ -76,6 +71,8 @@ async def ask():
 
         await plan_trip(query)
 
+    await mcp_pool.close()
+
 if __name__ == "__main__":
     # query = """Plan a romantic 5-day trip to Mumbai. 
     #             Find romantic hotels for 2 adults, check weather, 
@@ -12,11 +12,10 @@ load_dotenv()
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_agent
 from langchain.messages import HumanMessage, AIMessage
-from langgraph.checkpoint.memory import InMemorySaver
 
-from scripts import base_tools, prompts, utils
+from scripts import base_tools, checkpointers, mcp_pool, prompts
+from scripts.tool_output import ToolOutputMiddleware
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 
 # Set UTF-8 encoding for Windows console
@@ -26,15 +25,15 @@ if sys.platform == "win32":
 # model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview")
 model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
 
-checkpointer = InMemorySaver()
+# Bounded in-memory by default; CHECKPOINTER=sqlite persists threads to disk
+checkpointer = checkpointers.get_checkpointer()
 
-async def get_tools():
-    mcp_config = utils.load_mcp_config("google-sheets", "yahoo-finance")
-    # print("mcp config loaded:", mcp_config)
-
-    client = MultiServerMCPClient(mcp_config)
+# get_sheet_data can return whole sheets; summarize and spill large results
+tool_output = ToolOutputMiddleware(max_chars=4000)
 
-    mcp_tools = await client.get_tools()
+async def get_tools():
+    # servers are started once and reused across queries
+    mcp_tools = await mcp_pool.get_tools("google-sheets", "yahoo-finance")
 
     tools = mcp_tools + [base_tools.web_search, base_tools.get_weather]
 
@@ -54,7 +53,8 @@ async def google_sheet_agent(query, thread_id="default"):
     agent = create_agent(model=model,
                          tools=tools, 
                          system_prompt=prompts.GOOGLE_SHEETS_PROMPT,
-                         checkpointer=checkpointer)
+                         checkpointer=checkpointer,
+                         middleware=[tool_output])
 
     config = {"configurable": {"thread_id": thread_id}}
     result = await agent.ainvoke({'messages': [HumanMessage(query)]}, config=config)
@@ -78,6 +78,8 @@ async def ask():
 
         await google_sheet_agent(query)
 
+    await mcp_pool.close()
+
 if __name__ == "__main__":
     # query = "list all my spreadsheets"
     # asyncio.run(google_sheet_agent(query))
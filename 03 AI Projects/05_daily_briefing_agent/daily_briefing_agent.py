@@ -13,11 +13,11 @@ load_dotenv()
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.agents import create_agent
 from langchain.messages import HumanMessage, AIMessage
-from langgraph.checkpoint.memory import InMemorySaver
 
-from scripts import base_tools, prompts, utils
+from scripts import base_tools, checkpointers, mcp_pool, prompts
+from scripts.tool_execution import ToolExecutionMiddleware
+from scripts.tool_output import ToolOutputMiddleware
 
-from langchain_mcp_adapters.client import MultiServerMCPClient
 import asyncio
 
 # Set UTF-8 encoding for Windows console
@@ -27,16 +27,19 @@ if sys.platform == "win32":
 # model = ChatGoogleGenerativeAI(model="gemini-3-flash-preview")
 model = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
 
-checkpointer = InMemorySaver()
+# Bounded in-memory by default; CHECKPOINTER=sqlite persists threads to disk
+checkpointer = checkpointers.get_checkpointer()
 
+# Briefing tools are fetched together; cap each tool and bound slow ones
+tool_execution = ToolExecutionMiddleware(default_max_concurrency=4, default_timeout=60)
 
-async def get_tools():
-    mcp_config = utils.load_mcp_config("gmail","google-calendar", "yahoo-finance")
-    # print("mcp config loaded:", mcp_config)
+# Gmail listings can be huge; summarize and spill large results
+tool_output = ToolOutputMiddleware(max_chars=4000)
 
-    client = MultiServerMCPClient(mcp_config)
 
-    mcp_tools = await client.get_tools()
+async def get_tools():
+    # servers are started once and reused across queries
+    mcp_tools = await mcp_pool.get_tools("gmail","google-calendar", "yahoo-finance")
 
     tools = mcp_tools + [base_tools.web_search, base_tools.get_weather]
 
@@ -59,7 +62,8 @@ async def get_briefing(query, thread_id='default'):
         model=model,
         tools=tools,
         system_prompt=system_prompt,
-        checkpointer=checkpointer
+        checkpointer=checkpointer,
+        middleware=[tool_execution, tool_output]
     )
 
     config = {"configurable": {"thread_id": thread_id}}
@@ -82,6 +86,8 @@ async def ask():
 
         await get_briefing(query)
 
+    await mcp_pool.close()
+
 if __name__ == "__main__":
     # query = """Give me my daily briefing:
     #                1. Today's weather
@@ -12,12 +12,19 @@ from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 load_dotenv()
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import create_agent
 from langchain.messages import HumanMessage, AIMessage
 
+import asyncio
+
+from scripts import agent_cache
+
 app = FastAPI()
 
+# Concurrency limit for /chat; extra requests wait in the semaphore queue
+MAX_CONCURRENT_CHATS = int(os.getenv("MAX_CONCURRENT_CHATS", "32"))
+chat_slots = asyncio.Semaphore(MAX_CONCURRENT_CHATS)
+chat_stats = {"in_flight": 0, "queue_depth": 0, "completed": 0, "failed": 0}
+
 # Pydantic Data Model
 class ChatRequest(BaseModel):
     prompt: str = Field(..., min_length=2)
@@ -46,16 +53,34 @@ async def chat(request: ChatRequest):
     if not request.prompt.strip():
         raise HTTPException(status_code=400, detail="Empty prompt!")
     
+    chat_stats["queue_depth"] += 1
+    try:
+        await chat_slots.acquire()
+    finally:
+        chat_stats["queue_depth"] -= 1
+
+    chat_stats["in_flight"] += 1
     try:
-        model = ChatGoogleGenerativeAI(model=request.model)
-        agent = create_agent(model=model)
-        response = agent.invoke({'messages': [HumanMessage(request.prompt)]})
+        agent = agent_cache.get_agent(request.model)
+        # ainvoke keeps the event loop free while waiting on the model
+        response = await agent.ainvoke({'messages': [HumanMessage(request.prompt)]})
 
+        chat_stats["completed"] += 1
         return {'response': response['messages'][-1].text}
     
     except Exception as e:
+        chat_stats["failed"] += 1
         raise HTTPException(status_code=500, detail=f"Server error: {e}")
 
+    finally:
+        chat_stats["in_flight"] -= 1
+        chat_slots.release()
+
+
+@app.get("/chat/stats")
+async def get_chat_stats():
+    return {**chat_stats, "max_concurrent": MAX_CONCURRENT_CHATS}
+
 
 if __name__=="__main__":
     import uvicorn
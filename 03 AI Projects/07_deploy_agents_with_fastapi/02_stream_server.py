@@ -10,39 +10,101 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException
+from contextlib import AsyncExitStack, asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import Literal
 
+import asyncio
 import json
+import time
 
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.agents import create_agent
-from langchain_mcp_adapters.client import MultiServerMCPClient
-from langgraph.checkpoint.memory import InMemorySaver
 from langchain.messages import HumanMessage, AIMessageChunk
 
-from scripts import base_tools, prompts, utils
+from scripts import agent_cache, artifacts, base_tools, checkpointers, mcp_pool, metrics, prompts, semantic_cache, stream_protocol
+from scripts.concurrency import AdmissionController, Overloaded, ThreadLocks
+from scripts.instrumentation import InstrumentationMiddleware, observe_stream
+from scripts.stream_coalescer import StreamCoalescer
+from scripts.stream_runs import RunRegistry, SharedRunRegistry, StreamGone
+from scripts.thread_leases import ThreadLeases
+from scripts.token_budget import TokenBudgetMiddleware
+from scripts.tool_output import ToolOutputMiddleware
 
-checkpointer = InMemorySaver()
+# WORKERS > 1 runs several processes; thread state then lives in shared SQLite
+WORKERS = int(os.getenv("WORKERS", "1"))
+
+# Bounded in-memory by default; CHECKPOINTER=sqlite persists threads to disk
+checkpointer = checkpointers.get_checkpointer()
 tools = None
 
+# One run per thread_id at a time (leases extend this across worker processes)
+thread_locks = ThreadLocks(max_waiting=int(os.getenv("MAX_THREAD_QUEUE", "8")))
+thread_leases = ThreadLeases() if WORKERS > 1 else None
+
+# At most MAX_IN_FLIGHT_RUNS agent runs; others queue (fair across users) or get 429
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MAX_IN_FLIGHT_RUNS", "16")),
+    max_queue=int(os.getenv("MAX_QUEUED_RUNS", "64")),
+    queue_timeout=float(os.getenv("QUEUE_TIMEOUT", "0")) or None,
+)
+metrics.gauge("agent_runs_in_flight", "Agent runs currently executing", lambda: admission.in_flight)
+metrics.gauge("agent_runs_queued", "Agent runs waiting for a slot", lambda: admission.stats()["queued"])
+
+# Model/tool latency, token usage and tool payload sizes for /metrics
+instrumentation = InstrumentationMiddleware()
+
+# Shares one agent run between identical stateless requests
+coalescer = StreamCoalescer()
+
+# SEMANTIC_CACHE=1: paraphrased stateless questions are answered from earlier runs
+answer_cache = semantic_cache.from_env()
+
+# Long threads send only the newest messages that fit this many tokens
+token_budget = TokenBudgetMiddleware(max_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", "16000")))
+
+# Large sheet, Gmail and SQL results are digested; full payloads go to the blob store
+tool_output = ToolOutputMiddleware(max_chars=int(os.getenv("TOOL_OUTPUT_MAX_CHARS", "4000")))
+
+# "events" streams: flush batched frames every N ms or once this many bytes are pending
+STREAM_BATCH_MS = int(os.getenv("STREAM_BATCH_MS", "50"))
+STREAM_BATCH_BYTES = int(os.getenv("STREAM_BATCH_BYTES", "4096"))
+
+# Resumable runs (SSE / WebSocket): events kept per run for reconnecting clients.
+# With several workers they are also kept in db/runs.db, so any worker can serve a run.
+runs = (SharedRunRegistry if WORKERS > 1 else RunRegistry)(
+    max_events=int(os.getenv("STREAM_BUFFER_EVENTS", "2000")),
+    retain_seconds=int(os.getenv("STREAM_RETAIN_SECONDS", "300")),
+    window=STREAM_BATCH_MS / 1000,
+)
+
+MCP_SERVERS = ("gmail", "yahoo-finance", "google-sheets")
+
+# CODE_TOOLS=1 adds the code execution agent's upload_file / run_python_code
+# (one sandbox per thread_id, SANDBOX_* settings); its charts are served from /artifacts
+CODE_TOOLS = os.getenv("CODE_TOOLS", "0") == "1"
+CODE_DATA_DIR = os.getenv("CODE_DATA_DIR", os.path.join(root_dir, "03 AI Projects", "03_code_execution_agent", "data"))
+sandboxes = None
+sandbox_tools = []
+
 # Pydantic Data Model
 class ChatRequest(BaseModel):
     query: str = Field(..., min_length=2)
     model: str = "gemini-2.5-flash"
     thread_id: str = "default"
+    # Stateless request: no thread history; identical in-flight queries share one run
+    coalesce: bool = False
+    # "messages": one line per model chunk; "events": batched compact frames (see stream_protocol)
+    stream_format: Literal["messages", "events"] = "messages"
+    # Fair scheduling key when the server is busy (defaults to thread_id)
+    user_id: str | None = None
 
 
 async def get_tools():
-    mcp_config = utils.load_mcp_config("gmail", "yahoo-finance", "google-sheets")
-    # print("mcp config loaded:", mcp_config)
-
-    client = MultiServerMCPClient(mcp_config)
-    mcp_tools = await client.get_tools()
-    tools = mcp_tools + [base_tools.web_search, base_tools.get_weather]
+    # sessions stay warm in the shared pool for the lifetime of the server
+    mcp_tools = await mcp_pool.get_tools(*MCP_SERVERS)
+    tools = mcp_tools + [base_tools.web_search, base_tools.get_weather] + sandbox_tools
 
     # # Filter tools that work with Gemini
     filter_tools = [
@@ -62,12 +124,31 @@ async def get_tools():
     return safe_tools
 
 
+async def reload_tools(changed_servers):
+    global tools
+    tools = await get_tools()
+    if answer_cache is not None:
+        # answers may depend on tools that just changed
+        answer_cache.invalidate()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global tools
+    global tools, sandboxes, sandbox_tools
+    if CODE_TOOLS:
+        # imported here: the code tools pull in pandas
+        from scripts import code_tools, sandbox_pool
+
+        sandboxes = sandbox_pool.from_env().start()
+        sandbox_tools = code_tools.make_code_tools(sandboxes, data_dir=CODE_DATA_DIR)
     tools = await get_tools()
     print("Tools are loaded. ready to create agent!")
+    # tools may come from the on-disk schema cache; check them once each server is started
+    mcp_pool.get_pool().revalidate_in_background(*MCP_SERVERS, on_change=reload_tools)
     yield
+    await mcp_pool.close()
+    if sandboxes is not None:
+        sandboxes.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -81,19 +162,67 @@ app.add_middleware(
 )
 
 
-async def stream_response(query, model_name, thread_id):
+async def agent_stream(query, model_name, thread_id, user=None, reservation=None):
+    start = time.perf_counter()
+
+    # stateless requests only: a cached answer would not enter the thread's history
+    vector = None
+    if answer_cache is not None and thread_id is None:
+        namespace = f"{model_name}:{user or 'anonymous'}"
+        entry, vector = await answer_cache.lookup(query, namespace)
+        if entry is not None:
+            if reservation is not None:
+                reservation.release()
+            async for item in answer_cache.replay(entry):
+                yield item
+            return
+
     system_prompt = prompts.get_assistant_prompt()
 
-    # Initialize model and agent
-    model = ChatGoogleGenerativeAI(model=model_name)
-    agent = create_agent(model=model, tools=tools, system_prompt=system_prompt, checkpointer=checkpointer)
+    # Reuse the compiled agent for this model, tool set and prompt
+    agent = agent_cache.get_agent(
+        model_name,
+        tools,
+        system_prompt,
+        checkpointer=checkpointer if thread_id else None,
+        middleware=[token_budget, tool_output, instrumentation],
+    )
 
     # Configuration with thread ID for conversation memory
-    config = {"configurable": {"thread_id": thread_id}}
+    config = {"configurable": {"thread_id": thread_id}} if thread_id else {}
+
+    stream = agent.astream({"messages": [HumanMessage(query)]}, stream_mode="messages", config=config)
+
+    async with AsyncExitStack() as stack:
+        if thread_id is not None:
+            await stack.enter_async_context(thread_locks.hold(thread_id))
+            if thread_leases is not None:
+                await stack.enter_async_context(thread_leases.hold(thread_id))
+        await stack.enter_async_context(
+            admission.slot(user or thread_id or "anonymous", reservation)
+        )
+
+        stream = observe_stream(stream, model_name, start)
+        if vector is not None:
+            stream = answer_cache.record(stream, query, namespace, vector)
+        async for item in stream:
+            yield item
+
 
-    async for chunk, metadata in agent.astream(
-        {'messages':[HumanMessage(query)]},
-        stream_mode='messages', config=config):
+async def stream_response(
+    query, model_name, thread_id, stream_format="messages", user=None, reservation=None
+):
+    stream = agent_stream(query, model_name, thread_id, user, reservation)
+
+    if stream_format == "events":
+        events = stream_protocol.to_events(stream)
+        async for frames in stream_protocol.batch_frames(
+            events, window=STREAM_BATCH_MS / 1000, max_bytes=STREAM_BATCH_BYTES
+        ):
+            yield frames
+        return
+
+    async for chunk, metadata in stream:
 
         data = {
             "type": chunk.__class__.__name__,
@@ -103,6 +232,10 @@ async def stream_response(query, model_name, thread_id):
         if isinstance(chunk, AIMessageChunk) and chunk.tool_calls:
             data['tool_calls'] = chunk.tool_calls
 
+        handles = stream_protocol.artifact_handles(chunk)
+        if handles:
+            data['artifacts'] = handles
+
         # send json response
         yield (json.dumps(data) + "\n").encode()
 
@@ -112,19 +245,173 @@ async def read_root():
     return {"Hello": "Laxmi. Your FastAPI Server is up!"}
 
 
+def reserve_capacity(request):
+    # counted now, so a full server answers 429 instead of starting a stream
+    try:
+        if not request.coalesce:
+            thread_locks.check(request.thread_id)
+        return admission.reserve()
+    except Overloaded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "admission": admission.stats(),
+        "runs": runs.stats(),
+        "coalescer": coalescer.stats,
+        "semantic_cache": answer_cache.get_stats() if answer_cache is not None else None,
+    }
+
+
+@app.delete("/semantic_cache")
+async def clear_semantic_cache(category: str | None = None):
+    # e.g. ?category=sql after loading new data; no category clears everything
+    if answer_cache is None:
+        return {"invalidated": 0}
+    return {"invalidated": answer_cache.invalidate(category=category)}
+
+
+@app.get("/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str, thumbnail: bool = False):
+    # chart handles on tool_result frames point here
+    try:
+        path = await asyncio.to_thread(artifacts.get_store().open_path, artifact_id, thumbnail)
+    except ValueError:
+        path = None
+    if path is None:
+        raise HTTPException(status_code=404, detail="Unknown artifact")
+    return FileResponse(path, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+
 @app.post("/chat_stream")
 async def chat_stream(request: ChatRequest):
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Empty prompt!")
+    reservation = reserve_capacity(request)
     
+    if request.coalesce:
+        key = (request.model, request.stream_format, " ".join(request.query.split()).casefold())
+        stream = coalescer.subscribe(
+            key,
+            lambda: stream_response(
+                request.query, request.model, None, request.stream_format, request.user_id, reservation
+            ),
+            # joiners share the leader's slot
+            on_join=reservation.release,
+        )
+    else:
+        stream = stream_response(
+            request.query,
+            request.model,
+            request.thread_id,
+            request.stream_format,
+            request.user_id,
+            reservation,
+        )
+
     try:
         return StreamingResponse(
-            stream_response(request.query, request.model, request.thread_id),
+            stream,
             media_type="application/x-ndjson")
     
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Server error: {e}")
 
+def start_run(request, reservation=None):
+    thread_id = None if request.coalesce else request.thread_id
+    return runs.start(
+        lambda: stream_protocol.to_events(
+            agent_stream(request.query, request.model, thread_id, request.user_id, reservation)
+        )
+    )
+
+
+@app.post("/runs")
+async def create_run(request: ChatRequest):
+    if not request.query.strip():
+        raise HTTPException(status_code=400, detail="Empty prompt!")
+    return {"stream_id": start_run(request, reserve_capacity(request))}
+
+
+@app.get("/runs/{stream_id}/events")
+async def run_events(stream_id: str, last_event_id: int = Header(0)):
+    # reconnecting clients send Last-Event-ID and continue after it
+    try:
+        runs.validate(stream_id, last_event_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown or expired stream")
+    except StreamGone as e:
+        raise HTTPException(status_code=410, detail=str(e))
+
+    async def events():
+        async for item in runs.subscribe(stream_id, last_event_id, heartbeat=15):
+            if item is None:
+                yield b": keep-alive\n\n"
+            else:
+                yield stream_protocol.sse_event(*item)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.delete("/runs/{stream_id}")
+async def cancel_run(stream_id: str):
+    return {"cancelled": runs.cancel(stream_id)}
+
+
+@app.websocket("/ws")
+async def chat_ws(websocket: WebSocket):
+    # send {"query": ...} to start a run, {"stream_id": ..., "last_event_id": n} to resume one
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if "stream_id" in message:
+                stream_id, last_event_id = message["stream_id"], message.get("last_event_id", 0)
+            else:
+                try:
+                    request = ChatRequest(**message)
+                    stream_id, last_event_id = start_run(request, reserve_capacity(request)), 0
+                except ValidationError as e:
+                    await websocket.send_json({"t": "error", "d": str(e)})
+                    continue
+                except HTTPException as e:
+                    await websocket.send_json({"t": "error", "d": e.detail})
+                    continue
+
+            try:
+                runs.validate(stream_id, last_event_id)
+            except KeyError:
+                await websocket.send_json({"t": "error", "d": "Unknown or expired stream"})
+                continue
+            except StreamGone as e:
+                await websocket.send_json({"t": "error", "d": str(e)})
+                continue
+
+            await websocket.send_json({"t": "stream", "i": stream_id})
+            async for seq, frame in runs.subscribe(stream_id, last_event_id):
+                await websocket.send_text(stream_protocol.dumps({"id": seq, **frame}).decode())
+    except WebSocketDisconnect:
+        pass
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app=app, host="0.0.0.0", port=8002)
\ No newline at end of file
+
+    if WORKERS > 1:
+        # each worker is its own process with its own MCP sessions; share state through SQLite
+        os.environ.setdefault("CHECKPOINTER", "sqlite")
+        os.environ.setdefault("TOOL_CACHE_BACKEND", "sqlite")
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        uvicorn.run("02_stream_server:app", host="0.0.0.0", port=8002, workers=WORKERS)
+    else:
+        uvicorn.run(app=app, host="0.0.0.0", port=8002)
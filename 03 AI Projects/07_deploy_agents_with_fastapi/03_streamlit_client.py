@@ -5,10 +5,14 @@ import streamlit as st
 import httpx
 import json
 import os
+import time
 from datetime import datetime
 import markdown2
 from xhtml2pdf import pisa
 
+SERVER_URL = "http://localhost:8002"
+MAX_RECONNECTS = 5
+
 st.title("Personal Assistant")
 
 thread_id = st.sidebar.text_input("Thread ID", value="default")
@@ -87,36 +91,81 @@ if query:
 
         placeholder = st.empty()
         full_response = ""
-
-        # receive server response
-        #
-        #
-        with httpx.Client(timeout=None) as client:
-            with client.stream(
-                "POST",
-                "http://localhost:8002/chat_stream",
-                json={"query": query, "thread_id": thread_id},
-            ) as response:
-                for line in response.iter_lines():
-                    if not line.strip():
-                        continue
-
-                    chunk = json.loads(line)
-
-                    msg_type = chunk.get("type", "")
-                    content = chunk.get("content", "")
-
-                    if chunk.get("tool_calls"):
-                        for tc in chunk["tool_calls"]:
-                            with tool_container:
-                                st.status(f"🔧 {tc['name']}", state="complete").write(
-                                    f"```json\n{json.dumps(tc['args'], indent=2)}\n```"
-                                )
-
-                    if content and "AI" in msg_type:
-                        full_response = full_response + content
-                        placeholder.markdown(full_response.replace("$", "\\$"))
-                    # st.write(chunk)
+        tool_calls = {}
+
+        # start the run, then follow its events over SSE; if the connection
+        # drops, reconnect with Last-Event-ID instead of re-running the agent
+        with httpx.Client(base_url=SERVER_URL, timeout=httpx.Timeout(10, read=60)) as client:
+            stream_id = client.post(
+                "/runs", json={"query": query, "thread_id": thread_id}
+            ).json()["stream_id"]
+
+            last_event_id = 0
+            finished = False
+            for attempt in range(MAX_RECONNECTS):
+                try:
+                    with client.stream(
+                        "GET",
+                        f"/runs/{stream_id}/events",
+                        headers={"Last-Event-ID": str(last_event_id)},
+                    ) as response:
+                        if response.status_code in (404, 410):
+                            # the run expired (404) or its buffered events were dropped (410)
+                            response.read()
+                            try:
+                                detail = response.json().get("detail", "")
+                            except ValueError:
+                                detail = response.text
+                            st.warning(f"Could not resume the response ({response.status_code}): {detail}")
+                            finished = True
+                            break
+                        response.raise_for_status()
+                        for line in response.iter_lines():
+                            if line.startswith("id: "):
+                                event_id = int(line[4:])
+                            if not line.startswith("data: "):
+                                continue
+
+                            frame = json.loads(line[6:])
+                            frame_type = frame["t"]
+                            last_event_id = event_id
+
+                            if frame_type == "text":
+                                full_response = full_response + frame["d"]
+                                placeholder.markdown(full_response.replace("$", "\\$"))
+
+                            elif frame_type == "tool_start":
+                                tool_calls[frame["i"]] = {"name": frame["n"], "args": ""}
+
+                            elif frame_type == "tool_args":
+                                tool_calls.setdefault(frame["i"], {"name": "tool", "args": ""})["args"] += frame["d"]
+
+                            elif frame_type == "tool_result":
+                                tc = tool_calls.get(frame["i"], {"name": frame["n"], "args": ""})
+                                try:
+                                    args = json.dumps(json.loads(tc["args"] or "{}"), indent=2)
+                                except ValueError:
+                                    args = tc["args"]
+                                state = "error" if frame.get("e") else "complete"
+                                with tool_container:
+                                    st.status(f"🔧 {tc['name']}", state=state).write(
+                                        f"```json\n{args}\n```"
+                                    )
+
+                            elif frame_type == "done":
+                                st.caption(f"Tokens: {frame['u'].get('total_tokens', 0)}")
+
+                            elif frame_type == "error":
+                                st.error(frame["d"])
+                            # st.write(frame)
+
+                    finished = True
+                    break
+                except httpx.TransportError:
+                    time.sleep(min(2**attempt, 10))
+
+            if not finished:
+                st.warning("Lost connection to the server.")
 
         # placeholder.markdown(full_response.replace("$", "\\$"))
 
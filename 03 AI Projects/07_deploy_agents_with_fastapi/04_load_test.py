@@ -0,0 +1,67 @@
+# python .\04_load_test.py
+"""Load test for /chat against a stub model with fixed latency.
+
+Runs the FastAPI app in-process and fires N concurrent requests. With a
+non-blocking handler, throughput should scale roughly linearly with N.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(root_dir)
+
+import asyncio
+import importlib.util
+import time
+
+import httpx
+
+from scripts import agent_cache
+from scripts.fake_llm import FakeChatModel
+
+MODEL_LATENCY = 0.2
+CONCURRENCY_LEVELS = [1, 2, 4, 8, 16, 32]
+REQUESTS_PER_WORKER = 4
+
+
+def load_server():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "01_fastapi_server.py")
+    spec = importlib.util.spec_from_file_location("fastapi_server", path)
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+    return server
+
+
+async def run_level(app, concurrency):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+
+        async def worker():
+            for _ in range(REQUESTS_PER_WORKER):
+                response = await client.post("/chat", json={"prompt": "hello there"})
+                response.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    total = concurrency * REQUESTS_PER_WORKER
+    return total, elapsed
+
+
+async def main():
+    server = load_server()
+    agent_cache.get_cache().model_factory = lambda name: FakeChatModel(latency=MODEL_LATENCY)
+
+    print(f"Stub model latency: {MODEL_LATENCY}s, max concurrent chats: {server.MAX_CONCURRENT_CHATS}")
+    print(f"{'in-flight':>10} {'requests':>9} {'seconds':>8} {'req/s':>8}")
+
+    for concurrency in CONCURRENCY_LEVELS:
+        total, elapsed = await run_level(server.app, concurrency)
+        print(f"{concurrency:>10} {total:>9} {elapsed:>8.2f} {total / elapsed:>8.1f}")
+
+    print(f"\nServer stats: {server.chat_stats}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""The 02 stream server wired to the fake model and stub MCP servers.
+
+Used by benchmarks that need real uvicorn worker processes:
+    uvicorn fake_stream_app:app --app-dir benchmarks --workers 4
+BENCH_ANSWER_WORDS sets the length of each streamed answer.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import importlib.util
+
+from scripts import agent_cache, mcp_pool
+from scripts.fake_llm import FakeChatModel
+from stub_mcp_server import stub_config
+
+SERVER_PATH = os.path.join(root_dir, "03 AI Projects", "07_deploy_agents_with_fastapi", "02_stream_server.py")
+ANSWER_WORDS = int(os.getenv("BENCH_ANSWER_WORDS", "300"))
+
+spec = importlib.util.spec_from_file_location("stream_server", SERVER_PATH)
+server = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(server)
+
+mcp_pool.configure(config=stub_config(*server.MCP_SERVERS))
+answer = " ".join(f"word{n}" for n in range(ANSWER_WORDS))
+agent_cache.get_cache().model_factory = lambda name: FakeChatModel(responses=[answer])
+
+app = server.app
@@ -0,0 +1,105 @@
+# python benchmarks/instrumentation_bench.py
+"""Overhead of InstrumentationMiddleware + observe_stream on an agent run.
+
+Runs the same fake-model agent (one tool call, then a streamed answer)
+plain, with a no-op middleware, and instrumented. Any middleware adds a
+fixed framework hop per model/tool call; the no-op variant separates that
+from the cost of the instrumentation itself. The added time is also shown
+against a run whose model calls take MODEL_LATENCY seconds, as real ones do.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import asyncio
+import statistics
+import time
+
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import HumanMessage
+from langchain.tools import tool
+
+from scripts import metrics
+from scripts.fake_llm import FakeChatModel, tool_call_message
+from scripts.instrumentation import InstrumentationMiddleware, observe_stream
+
+RUNS = 200
+ROUNDS = 5
+ANSWER_WORDS = 200
+MODEL_LATENCY = 0.5
+
+
+@tool
+def lookup_orders(region: str) -> str:
+    """Look up recent orders for a region."""
+    return f"12 orders in {region}"
+
+
+class NoopMiddleware(AgentMiddleware):
+    async def awrap_model_call(self, request, handler):
+        return await handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        return await handler(request)
+
+
+def build_agent(middleware):
+    model = FakeChatModel(
+        responses=[
+            tool_call_message(("lookup_orders", {"region": "north"})),
+            " ".join(f"word{n}" for n in range(ANSWER_WORDS)),
+        ]
+    )
+    return create_agent(model=model, tools=[lookup_orders], middleware=middleware)
+
+
+async def run_once(agent, instrumented):
+    stream = agent.astream({"messages": [HumanMessage("orders?")]}, stream_mode="messages")
+    if instrumented:
+        stream = observe_stream(stream, "fake")
+    async for _ in stream:
+        pass
+
+
+async def time_runs(agent, instrumented):
+    start = time.perf_counter()
+    for _ in range(RUNS):
+        await run_once(agent, instrumented)
+    return (time.perf_counter() - start) / RUNS
+
+
+async def main():
+    variants = {
+        "plain": (build_agent([]), False),
+        "no-op middleware": (build_agent([NoopMiddleware()]), False),
+        "instrumented": (build_agent([InstrumentationMiddleware()]), True),
+    }
+    for agent, instrumented in variants.values():
+        await run_once(agent, instrumented)
+
+    # interleave rounds so drift affects every variant equally
+    timings = {name: [] for name in variants}
+    for _ in range(ROUNDS):
+        for name, (agent, instrumented) in variants.items():
+            timings[name].append(await time_runs(agent, instrumented))
+
+    plain, noop, inst = (statistics.median(timings[name]) for name in variants)
+    real_run = plain + 2 * MODEL_LATENCY
+    print(f"{RUNS} runs x {ROUNDS} rounds, 2 model calls + 1 tool call + {ANSWER_WORDS} streamed chunks per run")
+    for name in variants:
+        print(f"{name:>17} {statistics.median(timings[name]) * 1000:8.2f} ms/run")
+    print(f"instrumentation vs no-op middleware: {(inst - noop) * 1e6:+.0f} us/run")
+    print(
+        f"total added vs plain: {(inst - plain) * 1e6:+.0f} us/run = "
+        f"{(inst - plain) / real_run * 100:.3f}% of a run with {MODEL_LATENCY}s model calls"
+    )
+    # the fake model is not in METRICS_MODELS, so it is recorded as "other"
+    samples = metrics.MODEL_CALL_SECONDS._series[(metrics.model_label("fake-chat-model"),)][-1]
+    print(f"model call samples recorded: {samples}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+# python benchmarks/mcp_startup_bench.py
+"""Time-to-first-request for the /chat_stream server with and without cached MCP tools.
+
+The MCP servers are replaced by stub servers with a fixed start-up delay
+(like `npx`/`uvx` resolving packages) and the model by a fake one. A cold
+start has to spawn every server to list its tools; a warm start serves the
+versioned on-disk schema cache and spawns nothing until a tool is called
+(cached schemas are revalidated when their server first starts).
+"""
+import sys
+import os
+import tempfile
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+# keep the benchmark's schema cache away from the real one
+os.environ["AGENT_CACHE_DIR"] = tempfile.mkdtemp(prefix="mcp_startup_bench_")
+
+import asyncio
+import importlib.util
+import time
+
+import httpx
+
+from scripts import agent_cache, mcp_pool
+from scripts.fake_llm import FakeChatModel
+from stub_mcp_server import stub_config
+
+SERVER_STARTUP_DELAY = 1.5
+SERVER_PATH = os.path.join(root_dir, "03 AI Projects", "07_deploy_agents_with_fastapi", "02_stream_server.py")
+
+
+def load_server():
+    spec = importlib.util.spec_from_file_location("stream_server", SERVER_PATH)
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+    return server
+
+
+async def time_to_first_request(server):
+    pool = mcp_pool.configure(config=stub_config(*server.MCP_SERVERS, startup_delay=SERVER_STARTUP_DELAY))
+
+    start = time.perf_counter()
+    async with server.lifespan(server.app):
+        ready = time.perf_counter() - start
+
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+            response = await client.post("/chat_stream", json={"query": "hello there", "coalesce": True})
+            response.raise_for_status()
+        first_request = time.perf_counter() - start
+
+        await asyncio.gather(*pool._revalidate_tasks)
+        spawned = len(pool._tasks)
+
+    return ready, first_request, spawned
+
+
+async def main():
+    server = load_server()
+    agent_cache.get_cache().model_factory = lambda name: FakeChatModel(responses=["Hi! How can I help?"])
+
+    print(f"Stub MCP servers: {', '.join(server.MCP_SERVERS)} (start-up delay {SERVER_STARTUP_DELAY}s each)")
+    print(f"{'start':>6} {'tools ready':>12} {'first request':>14} {'servers spawned':>16}")
+    for label in ("cold", "warm"):
+        ready, first_request, spawned = await time_to_first_request(server)
+        print(f"{label:>6} {ready:>11.3f}s {first_request:>13.3f}s {spawned:>16}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,401 @@
+# python benchmarks/offline_bench.py [entry ...] [--save-baseline | --compare]
+"""Offline benchmarks for the CLI agents and the stream servers.
+
+Every entry point runs against a scripted FakeChatModel (fixed tool calls,
+then an answer) and stub MCP servers that replay fixtures/mcp_servers.json;
+web_search and get_weather replay fixtures/base_tools.json. Nothing touches
+the network and no API keys are needed, so runs are repeatable.
+
+Each entry point runs in its own process and reports p50/p95/p99 latency,
+throughput, CPU time per request and peak RSS. CPU and memory cover the
+agent process only, not the stub MCP server subprocesses.
+
+    python benchmarks/offline_bench.py                    # all entry points
+    python benchmarks/offline_bench.py airbnb --requests 100
+    python benchmarks/offline_bench.py --save-baseline    # write baselines/offline_bench.json
+    python benchmarks/offline_bench.py --compare          # exit 1 on regressions vs the baseline
+
+Baselines are machine specific; compare against one recorded on the same box.
+"""
+import sys
+import os
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.dirname(bench_dir)
+sys.path.append(root_dir)
+sys.path.append(bench_dir)
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import platform
+import subprocess
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BASELINE_PATH = os.path.join(bench_dir, "baselines", "offline_bench.json")
+STUB_FIXTURES = os.path.join(bench_dir, "fixtures", "mcp_servers.json")
+BASE_TOOL_FIXTURES = os.path.join(bench_dir, "fixtures", "base_tools.json")
+PROJECTS_DIR = os.path.join(root_dir, "03 AI Projects")
+
+# metric -> True if higher is worse. p99 of a few dozen requests is close to the
+# max and too noisy to gate on; it is reported but not compared.
+COMPARED_METRICS = {
+    "p50_ms": True,
+    "p95_ms": True,
+    "throughput_rps": False,
+    "cpu_ms_per_request": True,
+    "rss_peak_mb": True,
+}
+
+# -------------------------
+# Entry Points
+# -------------------------
+# Each script is replayed per turn: one AIMessage (or answer string) per model call.
+# Tool names must exist in the stub fixtures.
+ENTRY_POINTS = {
+    "airbnb": {
+        "kind": "cli",
+        "path": os.path.join(PROJECTS_DIR, "01_hotel_search_with_mcp", "airbnb_mcp.py"),
+        "function": "hotel_search",
+        "query": "Show me hotels for a party in Pune, India. Also check the latest news and weather.",
+        "script": [
+            [("airbnb_search", {"location": "Pune, India"}), ("get_weather", {"location": "Pune"}),
+             ("web_search", {"query": "Pune news today"})],
+        ],
+    },
+    "travel_planner": {
+        "kind": "cli",
+        "path": os.path.join(PROJECTS_DIR, "02_travel_planner_agent", "travel_planner_agent.py"),
+        "function": "plan_trip",
+        "query": "Plan a 5-day trip to Mumbai for 2 adults, check the weather and add it to my calendar.",
+        "script": [
+            [("airbnb_search", {"location": "Mumbai"}), ("get_weather", {"location": "Mumbai"})],
+            [("create-event", {"calendarId": "primary", "summary": "Mumbai trip",
+                               "start": "2025-11-01", "end": "2025-11-05"})],
+        ],
+    },
+    "daily_briefing": {
+        "kind": "cli",
+        "path": os.path.join(PROJECTS_DIR, "05_daily_briefing_agent", "daily_briefing_agent.py"),
+        "function": "get_briefing",
+        "query": "Give me my daily briefing: weather, calendar, unread emails and top news.",
+        "script": [
+            [("get_weather", {"location": "Mumbai"}), ("list-events", {"calendarId": "primary"}),
+             ("search_emails", {"query": "is:unread"}), ("web_search", {"query": "top news today"})],
+        ],
+    },
+    "stream_server": {
+        "kind": "server",
+        "path": os.path.join(PROJECTS_DIR, "07_deploy_agents_with_fastapi", "02_stream_server.py"),
+        "query": "Summarize my unread emails and how AAPL is doing.",
+        "script": [
+            [("search_emails", {"query": "is:unread"}), ("get_stock_info", {"symbol": "AAPL"})],
+        ],
+    },
+    "sql_stream_server": {
+        "kind": "server",
+        "path": os.path.join(root_dir, "04 Real-World Projects", "04_02_stream_server.py"),
+        "query": "What were the top products by revenue last month?",
+        "script": [
+            [("mysql_query", {"sql": "SELECT name, SUM(total) AS revenue FROM orders GROUP BY name LIMIT 5"})],
+        ],
+    },
+}
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_model(entry, args):
+    from scripts.fake_llm import FakeChatModel, tool_call_message
+
+    answer = " ".join(f"word{n}" for n in range(args.answer_words))
+    responses = [tool_call_message(*calls) for calls in entry["script"]] + [answer]
+    return FakeChatModel(
+        responses=responses, latency=args.model_latency, token_latency=args.token_latency, per_turn=True
+    )
+
+
+def replay_base_tools(latency):
+    """Swap base_tools.web_search/get_weather for tools that replay recorded results."""
+    from langchain_core.tools import StructuredTool
+
+    from scripts import base_tools
+
+    with open(BASE_TOOL_FIXTURES, "r") as f:
+        recorded = json.load(f)
+
+    async def web_search(query: str):
+        await asyncio.sleep(latency)
+        return recorded["web_search"]["response"]
+
+    async def get_weather(location: str):
+        await asyncio.sleep(latency)
+        return recorded["get_weather"]["response"]
+
+    for func in (web_search, get_weather):
+        tool = StructuredTool.from_function(
+            coroutine=func, name=func.__name__, description=recorded[func.__name__]["description"]
+        )
+        setattr(base_tools, func.__name__, tool)
+
+
+# -------------------------
+# Runners
+# -------------------------
+async def cli_runner(name, entry, args):
+    """Return an async `run(n)` that makes one call to the agent's entry function."""
+    module = load_module(name, entry["path"])
+    module.model = build_model(entry, args)
+    func = getattr(module, entry["function"])
+    takes_thread = "thread_id" in func.__code__.co_varnames
+
+    async def run(n):
+        kwargs = {"thread_id": f"bench-{n}"} if takes_thread else {}
+        # the agents print their tool list and answer on every call
+        with contextlib.redirect_stdout(io.StringIO()):
+            await func(entry["query"], **kwargs)
+
+    return run, contextlib.nullcontext()
+
+
+async def server_runner(name, entry, args):
+    """Return an async `run(n)` that streams one /chat_stream request in-process."""
+    import httpx
+
+    from scripts import agent_cache
+
+    server = load_module(name, entry["path"])
+    model = build_model(entry, args)
+    agent_cache.get_cache().model_factory = lambda model_name: model
+
+    transport = httpx.ASGITransport(app=server.app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None)
+
+    async def run(n):
+        body = {"query": entry["query"], "thread_id": f"bench-{n}", "stream_format": "events"}
+        async with client.stream("POST", "/chat_stream", json=body) as response:
+            response.raise_for_status()
+            async for _ in response.aiter_raw():
+                pass
+
+    @contextlib.asynccontextmanager
+    async def lifespan():
+        # ASGITransport does not run the app lifespan (tool loading); do it here
+        async with server.app.router.lifespan_context(server.app), client:
+            yield
+
+    return run, lifespan()
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    idx = max(math.ceil(q / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[idx]
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+async def measure(name, args):
+    from scripts import mcp_pool
+    from stub_mcp_server import stub_config
+
+    entry = ENTRY_POINTS[name]
+    # every server gets a stub; only the ones an agent asks for are started
+    with open(STUB_FIXTURES, "r") as f:
+        servers = list(json.load(f))
+    mcp_pool.configure(config=stub_config(*servers, latency=args.tool_latency))
+    replay_base_tools(args.tool_latency)
+
+    runner = cli_runner if entry["kind"] == "cli" else server_runner
+    run, lifespan = await runner(name, entry, args)
+    concurrency = args.concurrency or (1 if entry["kind"] == "cli" else 8)
+
+    latencies = []
+    async with lifespan:
+        # warm-up: starts MCP sessions and fills schema caches
+        for n in range(args.warmup):
+            await run(f"warmup-{n}")
+
+        pending = iter(range(args.requests))
+
+        async def worker():
+            for n in pending:
+                start = time.perf_counter()
+                await run(n)
+                latencies.append(time.perf_counter() - start)
+
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        cpu = time.process_time() - cpu_start
+
+    await mcp_pool.close()
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "cpu_ms_per_request": round(cpu / len(latencies) * 1000, 2),
+        "cpu_utilization": round(cpu / elapsed, 3),
+        "rss_peak_mb": peak_rss_mb(),
+    }
+
+
+# -------------------------
+# Baselines
+# -------------------------
+def settings(args):
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "model_latency": args.model_latency,
+        "token_latency": args.token_latency,
+        "tool_latency": args.tool_latency,
+        "answer_words": args.answer_words,
+    }
+
+
+def machine():
+    return {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()}
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, args):
+    # merge, so benchmarking a subset only updates those entries
+    baseline = load_baseline(path) or {"results": {}}
+    baseline.update({"machine": machine(), "settings": settings(args)})
+    baseline["results"].update(results)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(baseline, results, args):
+    """Print changes against the baseline; return the list of regressions."""
+    if baseline["machine"] != machine():
+        print(f"warning: baseline was recorded on {baseline['machine']}")
+    if baseline["settings"] != settings(args):
+        print(f"warning: baseline settings differ: {baseline['settings']}")
+
+    regressions = []
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"{name}: no baseline")
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS.items():
+            if not old.get(metric) or result.get(metric) is None:
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            worse = change > args.tolerance if higher_is_worse else change < -args.tolerance
+            marker = "  REGRESSION" if worse else ""
+            print(f"{name:>18} {metric:>19} {old[metric]:>10} -> {result[metric]:>10} ({change:+.1%}){marker}")
+            if worse:
+                regressions.append((name, metric))
+    return regressions
+
+
+# -------------------------
+# CLI
+# -------------------------
+def run_child(name, argv):
+    """Benchmark one entry point in a fresh process, so memory numbers are not shared."""
+    cmd = [sys.executable, os.path.abspath(__file__), name, "--child", *argv]
+    proc = subprocess.run(cmd, capture_output=True, text=True, cwd=root_dir)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{name} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entries", nargs="*", help=f"entry points (default: all): {', '.join(ENTRY_POINTS)}")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=None, help="default: 1 for CLI agents, 8 for servers")
+    parser.add_argument("--model-latency", type=float, default=0.05, help="seconds per scripted model call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per streamed word")
+    parser.add_argument("--tool-latency", type=float, default=0.02, help="seconds per replayed tool call")
+    parser.add_argument("--answer-words", type=int, default=200)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before flagging")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    unknown = set(args.entries) - set(ENTRY_POINTS)
+    if unknown:
+        sys.exit(f"unknown entry points: {', '.join(sorted(unknown))} (choose from {', '.join(ENTRY_POINTS)})")
+
+    if args.child:
+        os.environ.setdefault("CHECKPOINTER", "memory")
+        # the agents build a Gemini client at import; it is replaced before any call
+        os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+        print(json.dumps(asyncio.run(measure(args.entries[0], args))))
+        return
+
+    names = args.entries or list(ENTRY_POINTS)
+    child_argv = [arg for arg in sys.argv[1:] if arg not in ENTRY_POINTS]
+    child_argv = [arg for arg in child_argv if arg not in ("--save-baseline", "--compare")]
+
+    results = {}
+    print(f"{'entry':>18} {'reqs':>5} {'conc':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'req/s':>7} {'cpu ms/req':>10} {'rss MB':>7}")
+    for name in names:
+        result = results[name] = run_child(name, child_argv)
+        print(f"{name:>18} {result['requests']:>5} {result['concurrency']:>5} {result['p50_ms']:>8} "
+              f"{result['p95_ms']:>8} {result['p99_ms']:>8} {result['throughput_rps']:>7} "
+              f"{result['cpu_ms_per_request']:>10} {result['rss_peak_mb']!s:>7}")
+
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if baseline is None:
+            sys.exit(f"no baseline at {args.baseline}; run with --save-baseline first")
+        regressions = compare(baseline, results, args)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("no regressions")
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args)
+        print(f"baseline saved to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# python benchmarks/sandbox_pool_bench.py
+"""Sandbox pool latency and throughput with the local backend.
+
+1. Time to first execution for a new thread: cold (sandbox booted on demand)
+   vs warm (a spare with pandas/matplotlib already imported).
+2. Several threads running code at once: one shared sandbox (the old single
+   `sbx` global, calls serialized) vs one pooled session per thread.
+"""
+import sys
+import os
+import tempfile
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.sandbox_pool import LocalBackend, SandboxPool
+
+FIRST_CODE = "df = pd.DataFrame({'x': range(1000)})\ndf.x.sum()"
+WORK_CODE = "sum(i * i for i in range(200_000))"
+THREADS = 4
+CALLS_PER_THREAD = 10
+
+
+def first_execution(min_spares, runs=3):
+    times = []
+    for i in range(runs):
+        pool = SandboxPool(LocalBackend(root=tempfile.mkdtemp()), min_spares=min_spares)
+        pool.replenish()
+        start = time.perf_counter()
+        with pool.lease(f"thread-{i}") as session:
+            session.sandbox.run_code(FIRST_CODE)
+        times.append(time.perf_counter() - start)
+        pool.close()
+    return statistics.median(times)
+
+
+def concurrent_throughput(shared):
+    pool = SandboxPool(LocalBackend(root=tempfile.mkdtemp()), min_spares=0, max_sessions=THREADS)
+    for t in range(THREADS):
+        with pool.lease("shared" if shared else f"thread-{t}") as session:
+            session.sandbox.run_code("1")
+
+    def worker(t):
+        for _ in range(CALLS_PER_THREAD):
+            with pool.lease("shared" if shared else f"thread-{t}") as session:
+                session.sandbox.run_code(WORK_CODE)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(THREADS) as executor:
+        list(executor.map(worker, range(THREADS)))
+    elapsed = time.perf_counter() - start
+    pool.close()
+    return THREADS * CALLS_PER_THREAD / elapsed
+
+
+def main():
+    print("Time to first execution on a new thread (median of 3)")
+    print(f"  cold (no spares): {first_execution(0):.3f}s")
+    print(f"  warm (1 spare):   {first_execution(1):.3f}s")
+
+    print(f"\n{THREADS} threads x {CALLS_PER_THREAD} executions (cpu count {os.cpu_count()})")
+    print(f"  one shared sandbox:   {concurrent_throughput(shared=True):.1f} exec/s")
+    print(f"  session per thread:   {concurrent_throughput(shared=False):.1f} exec/s")
+
+
+if __name__ == "__main__":
+    main()
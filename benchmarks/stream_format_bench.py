@@ -0,0 +1,112 @@
+# python benchmarks/stream_format_bench.py
+"""Compare /chat_stream formats: per-chunk "messages" lines vs batched "events" frames.
+
+A fake model streams a tool call and a long word-by-word answer; the app runs
+in-process. Reports model chunks/sec, HTTP writes, lines and bytes on the
+wire, and the client-side time spent decoding lines.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import asyncio
+import importlib.util
+import json
+import time
+
+import httpx
+from langchain.tools import tool
+
+from scripts import agent_cache, stream_protocol
+from scripts.fake_llm import FakeChatModel, tool_call_message
+
+REQUESTS = 20
+ANSWER_WORDS = 1000
+TOKEN_LATENCY = 0.0
+FORMATS = [("messages", None), ("events", 0), ("events", 50)]
+SERVER_PATH = os.path.join(root_dir, "03 AI Projects", "07_deploy_agents_with_fastapi", "02_stream_server.py")
+
+
+@tool
+def lookup_orders(region: str) -> str:
+    """Look up recent orders for a region."""
+    return json.dumps([{"region": region, "order": n, "total": 10 * n} for n in range(20)])
+
+
+def count_writes(app, counter):
+    """Wrap an ASGI app to count response body writes."""
+
+    async def wrapped(scope, receive, send):
+        async def counting_send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                counter["writes"] += 1
+            await send(message)
+
+        await app(scope, receive, counting_send)
+
+    return wrapped
+
+
+def load_server():
+    spec = importlib.util.spec_from_file_location("stream_server", SERVER_PATH)
+    server = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(server)
+    return server
+
+
+async def run_format(server, stream_format, window_ms):
+    if window_ms is not None:
+        server.STREAM_BATCH_MS = window_ms
+
+    counter = {"writes": 0}
+    lines = size = 0
+    decode_time = 0.0
+    transport = httpx.ASGITransport(app=count_writes(server.app, counter))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        start = time.perf_counter()
+        for n in range(REQUESTS):
+            body = {"query": "orders in the north region", "thread_id": f"bench-{stream_format}-{window_ms}-{n}",
+                    "stream_format": stream_format}
+            async with client.stream("POST", "/chat_stream", json=body) as response:
+                buffer = b""
+                async for chunk in response.aiter_raw():
+                    size += len(chunk)
+                    buffer += chunk
+                    *complete, buffer = buffer.split(b"\n")
+                    t0 = time.perf_counter()
+                    for line in complete:
+                        if line:
+                            json.loads(line)
+                            lines += 1
+                    decode_time += time.perf_counter() - t0
+        elapsed = time.perf_counter() - start
+
+    return elapsed, counter["writes"], lines, size, decode_time
+
+
+async def main():
+    server = load_server()
+    server.tools = [lookup_orders]
+    answer = " ".join(f"word{n}" for n in range(ANSWER_WORDS))
+    agent_cache.get_cache().model_factory = lambda name: FakeChatModel(
+        responses=[tool_call_message(("lookup_orders", {"region": "north"})), answer],
+        token_latency=TOKEN_LATENCY,
+    )
+
+    encoder = "orjson" if stream_protocol.orjson is not None else "json"
+    print(f"{REQUESTS} requests, {ANSWER_WORDS} streamed words each, encoder: {encoder}")
+    print(f"{'format':>14} {'chunks/s':>9} {'writes':>7} {'lines':>7} {'KB':>7} {'decode ms':>10}")
+    for stream_format, window_ms in FORMATS:
+        elapsed, writes, lines, size, decode_time = await run_format(server, stream_format, window_ms)
+        label = stream_format if window_ms is None else f"{stream_format}/{window_ms}ms"
+        model_chunks = REQUESTS * (ANSWER_WORDS + 3)
+        print(
+            f"{label:>14} {model_chunks / elapsed:>9.0f} {writes:>7} {lines:>7} "
+            f"{size / 1024:>7.1f} {decode_time * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
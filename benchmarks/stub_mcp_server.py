@@ -0,0 +1,76 @@
+"""Stdio MCP server that replays recorded tool responses.
+
+Stands in for the real MCP servers (Gmail, Sheets, TiDB, ...) in benchmarks:
+tool definitions and canned responses come from fixtures/mcp_servers.json.
+
+    python benchmarks/stub_mcp_server.py gmail --startup-delay 1.5 --latency 0.05
+"""
+import sys
+import os
+
+import argparse
+import asyncio
+import json
+import time
+
+import mcp.server.stdio
+import mcp.types as types
+from mcp.server.lowlevel import Server
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "mcp_servers.json")
+
+
+def stub_config(*server_names, startup_delay=0.0, latency=0.0):
+    """MCP client config that launches the stub in place of each named server."""
+    return {
+        name: {
+            "command": sys.executable,
+            "args": [
+                os.path.abspath(__file__), name,
+                "--startup-delay", str(startup_delay),
+                "--latency", str(latency),
+            ],
+            "transport": "stdio",
+        }
+        for name in server_names
+    }
+
+
+def build_server(name, latency):
+    with open(FIXTURES, "r") as f:
+        recorded = json.load(f)[name]
+
+    server = Server(name)
+
+    @server.list_tools()
+    async def list_tools():
+        return [
+            types.Tool(name=tool_name, description=spec["description"], inputSchema=spec["input_schema"])
+            for tool_name, spec in recorded.items()
+        ]
+
+    @server.call_tool()
+    async def call_tool(tool_name, arguments):
+        if tool_name not in recorded:
+            raise ValueError(f"Unknown tool: {tool_name}")
+        await asyncio.sleep(latency)
+        return [types.TextContent(type="text", text=recorded[tool_name]["response"])]
+
+    return server
+
+
+async def main(args):
+    server = build_server(args.server, args.latency)
+    async with mcp.server.stdio.stdio_server() as (read_stream, write_stream):
+        await server.run(read_stream, write_stream, server.create_initialization_options())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("server")
+    parser.add_argument("--startup-delay", type=float, default=0.0, help="seconds before serving (npx/uvx start-up)")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every tool call")
+    args = parser.parse_args()
+
+    time.sleep(args.startup_delay)
+    asyncio.run(main(args))
@@ -0,0 +1,112 @@
+# python benchmarks/weather_bench.py
+"""Benchmark get_weather against a local stand-in for WeatherAPI.com.
+
+Compares the old per-call `requests.get` (new connection every time) with
+the pooled sync client and the pooled async client under concurrency.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from scripts import base_tools, http_client, tool_cache
+
+CALLS = 100
+CONCURRENCY = 20
+SERVER_LATENCY = 0.02
+
+PAYLOAD = json.dumps({
+    "location": {"name": "Mumbai", "country": "India"},
+    "current": {"temp_c": 31.0, "condition": {"text": "Partly cloudy"}},
+}).encode()
+
+
+class WeatherHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(SERVER_LATENCY)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), WeatherHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def bench_requests_per_call(url):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        response = requests.get(url=f"{url}?key=x&q=Mumbai&aqi=no", timeout=10)
+        response.raise_for_status()
+        response.json()
+    return time.perf_counter() - start
+
+
+def bench_pooled_sync():
+    base_tools.fetch_weather("Mumbai")  # warm the keep-alive connection
+
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        base_tools.fetch_weather("Mumbai")
+    return time.perf_counter() - start
+
+
+async def bench_pooled_async():
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one():
+        async with semaphore:
+            await base_tools.afetch_weather("Mumbai")
+
+    # warm the pool so every concurrent slot has an open connection
+    await asyncio.gather(*(one() for _ in range(CONCURRENCY)))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(CALLS)))
+    elapsed = time.perf_counter() - start
+    await http_client.aclose()
+    return elapsed
+
+
+def main():
+    server = start_server()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/current.json"
+    base_tools.WEATHER_API_URL = url
+    # measure the HTTP path, not the tool result cache
+    tool_cache.get_cache().enabled = False
+
+    print(f"{CALLS} calls, server latency {SERVER_LATENCY * 1000:.0f}ms, HTTP/2 available: {http_client.HTTP2}\n")
+    print(f"{'variant':<32} {'seconds':>8} {'calls/s':>9}")
+
+    results = [
+        ("requests.get per call", bench_requests_per_call(url)),
+        ("pooled sync client", bench_pooled_sync()),
+        (f"pooled async x{CONCURRENCY}", asyncio.run(bench_pooled_async())),
+    ]
+    for name, elapsed in results:
+        print(f"{name:<32} {elapsed:>8.2f} {CALLS / elapsed:>9.1f}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# python benchmarks/worker_scaling_bench.py
+"""Throughput of the stream server at 1, 2 and 4 uvicorn workers.
+
+Each run starts `fake_stream_app` (fake model, stub MCP servers) with shared
+SQLite checkpoints and per-thread leases, then streams answers from many
+concurrent clients. Requests reuse a fixed set of thread ids, so some of
+them queue on the same thread. Throughput can only scale up to the number
+of CPU cores.
+"""
+import sys
+import os
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(root_dir)
+
+import asyncio
+import signal
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+WORKER_COUNTS = [1, 2, 4]
+CONCURRENCY = 32
+REQUESTS = 256
+THREADS = 64
+PORT = 8765
+
+
+def start_server(workers, state_dir):
+    env = {
+        **os.environ,
+        "WORKERS": str(workers),
+        "CHECKPOINTER": "sqlite",
+        "CHECKPOINT_DB": os.path.join(state_dir, "checkpoints.db"),
+        "THREAD_LEASE_DB": os.path.join(state_dir, "leases.db"),
+        "AGENT_CACHE_DIR": os.path.join(state_dir, "cache"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_stream_app:app", "--app-dir", os.path.dirname(os.path.abspath(__file__)),
+         "--port", str(PORT), "--workers", str(workers), "--log-level", "warning"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait(timeout=30)
+
+
+async def wait_ready(client, workers):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            # every worker has to answer at least once before measuring
+            warm = await asyncio.gather(
+                *(client.post("/chat_stream", json={"query": "warm up", "coalesce": True}) for _ in range(4 * workers))
+            )
+            if all(r.status_code == 200 for r in warm):
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5)
+    raise RuntimeError("server did not start")
+
+
+async def run_load(client):
+    queue = asyncio.Queue()
+    for n in range(REQUESTS):
+        queue.put_nowait(n)
+
+    async def worker():
+        while not queue.empty():
+            n = queue.get_nowait()
+            body = {"query": f"question {n}", "thread_id": f"t{n % THREADS}", "stream_format": "events"}
+            async with client.stream("POST", "/chat_stream", json=body) as response:
+                response.raise_for_status()
+                async for _ in response.aiter_raw():
+                    pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return time.perf_counter() - start
+
+
+async def main():
+    print(f"{os.cpu_count()} CPU cores, {REQUESTS} requests over {THREADS} threads, concurrency {CONCURRENCY}")
+    print(f"{'workers':>8} {'seconds':>8} {'req/s':>8}")
+    for workers in WORKER_COUNTS:
+        with tempfile.TemporaryDirectory() as state_dir:
+            process = start_server(workers, state_dir)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=120) as client:
+                    await wait_ready(client, workers)
+                    elapsed = await run_load(client)
+            finally:
+                stop_server(process)
+        print(f"{workers:>8} {elapsed:>8.2f} {REQUESTS / elapsed:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,140 @@
+"""
+LRU cache of chat model clients and compiled agents.
+
+`create_agent` compiles a LangGraph graph, which is wasted work when the
+model, tools and system prompt are the same as the previous request.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain.agents import create_agent
+
+
+# -------------------------
+# Cache Keys
+# -------------------------
+def tools_fingerprint(tools):
+    """Identify a tool set by name and object identity.
+
+    Identity matters because a compiled graph holds the tool objects themselves;
+    cached agents keep their tools alive, so ids cannot be reused while cached.
+    """
+    parts = sorted(f"{tool.name}:{id(tool)}" for tool in tools or [])
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+
+def prompt_hash(system_prompt):
+    if system_prompt is None:
+        return None
+    return hashlib.sha1(str(system_prompt).encode()).hexdigest()
+
+
+class _LRU:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_create(self, key, factory):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+
+        # build outside the lock; a concurrent duplicate build is harmless
+        value = factory()
+
+        with self._lock:
+            self.misses += 1
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+            return self._items[key]
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+# -------------------------
+# Agent Cache
+# -------------------------
+class AgentCache:
+    """Bounded cache of model clients and compiled agents.
+
+    Agents are keyed by model name, tool-set fingerprint, system prompt hash
+    and the identity of any other `create_agent` arguments (checkpointer,
+    middleware, ...).
+    """
+
+    def __init__(self, max_agents=16, max_models=8, model_factory=None):
+        self.model_factory = model_factory or (lambda name: ChatGoogleGenerativeAI(model=name))
+        self._models = _LRU(max_models)
+        self._agents = _LRU(max_agents)
+
+    def get_model(self, model_name):
+        return self._models.get_or_create(model_name, lambda: self.model_factory(model_name))
+
+    def get_agent(self, model_name, tools=None, system_prompt=None, **agent_kwargs):
+        key = (
+            model_name,
+            tools_fingerprint(tools),
+            prompt_hash(system_prompt),
+            tuple(sorted((k, _identity(v)) for k, v in agent_kwargs.items())),
+        )
+
+        def build():
+            return create_agent(
+                model=self.get_model(model_name),
+                tools=tools,
+                system_prompt=system_prompt,
+                **agent_kwargs,
+            )
+
+        return self._agents.get_or_create(key, build)
+
+    def stats(self):
+        return {
+            "agents": len(self._agents),
+            "agent_hits": self._agents.hits,
+            "agent_misses": self._agents.misses,
+            "models": len(self._models),
+        }
+
+    def clear(self):
+        self._agents.clear()
+        self._models.clear()
+
+
+def _identity(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_identity(v) for v in value)
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return id(value)
+
+
+# -------------------------
+# Shared Cache
+# -------------------------
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = AgentCache()
+    return _cache
+
+
+def get_agent(model_name, tools=None, system_prompt=None, **agent_kwargs):
+    return get_cache().get_agent(model_name, tools, system_prompt, **agent_kwargs)
@@ -0,0 +1,163 @@
+"""
+Image artifact store for charts produced by the code execution agent.
+
+`put(png_base64)` names the image by its content hash and returns a compact
+handle right away; decoding is done inline, while writing the file (and a
+thumbnail when Pillow is installed) happens on a background thread. Handles
+only carry `thumbnail_url` when a thumbnail will actually be written. The same
+chart produced twice is stored once, and two charts made in the same second
+no longer collide.
+
+Handles are small dicts that go to the model as one line of text and to
+/chat_stream clients on the tool_result frame:
+
+    {"id": "3f2a9c0d1b7e4a55", "kind": "chart", "mime": "image/png",
+     "width": 1000, "height": 600, "bytes": 48213,
+     "path": "images/3f2a9c0d1b7e4a55.png", "url": "/artifacts/3f2a9c0d1b7e4a55",
+     "thumbnail_url": "/artifacts/3f2a9c0d1b7e4a55?thumbnail=1"}
+
+The stream servers serve `url` from ARTIFACTS_DIR (default "images").
+"""
+import base64
+import hashlib
+import io
+import os
+import re
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "images")
+THUMBNAIL_SIZE = (320, 320)
+
+_ID = re.compile(r"^[0-9a-f]{16}$")
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def png_size(data):
+    """(width, height) from the PNG header, or (None, None)."""
+    if data[:8] != b"\x89PNG\r\n\x1a\n" or len(data) < 24:
+        return None, None
+    return struct.unpack(">II", data[16:24])
+
+
+def _thumbnail(data, size):
+    if Image is None:
+        return None
+    with Image.open(io.BytesIO(data)) as image:
+        image.thumbnail(size)
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+class ArtifactStore:
+    def __init__(self, root=None, thumbnail_size=THUMBNAIL_SIZE, workers=2):
+        self.root = root or ARTIFACTS_DIR
+        self.thumbnail_size = thumbnail_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="artifacts")
+        self._pending = {}  # id -> Future
+        self._lock = threading.Lock()
+        self.stats = {"stored": 0, "deduplicated": 0, "thumbnails": 0, "errors": 0}
+
+    def path(self, artifact_id, thumbnail=False):
+        if not _ID.match(artifact_id):
+            raise ValueError(f"Invalid artifact id: {artifact_id}")
+        suffix = ".thumb.png" if thumbnail else ".png"
+        return os.path.join(self.root, artifact_id + suffix)
+
+    def put(self, png_base64, kind="chart"):
+        """Queue a base64 PNG for writing and return its handle."""
+        data = base64.b64decode(png_base64)
+        artifact_id = hashlib.sha256(data).hexdigest()[:16]
+        path = self.path(artifact_id)
+        width, height = png_size(data)
+        with_thumbnail = Image is not None and bool(self.thumbnail_size) and (
+            (width or 0) > self.thumbnail_size[0] or (height or 0) > self.thumbnail_size[1]
+        )
+
+        with self._lock:
+            if artifact_id in self._pending or os.path.exists(path):
+                self.stats["deduplicated"] += 1
+            else:
+                self._pending[artifact_id] = self._executor.submit(self._write, artifact_id, data, with_thumbnail)
+
+        handle = {
+            "id": artifact_id,
+            "kind": kind,
+            "mime": "image/png",
+            "width": width,
+            "height": height,
+            "bytes": len(data),
+            "path": path,
+            "url": f"/artifacts/{artifact_id}",
+        }
+        if with_thumbnail:
+            handle["thumbnail_url"] = f"/artifacts/{artifact_id}?thumbnail=1"
+        return handle
+
+    def _write(self, artifact_id, data, with_thumbnail):
+        try:
+            os.makedirs(self.root, exist_ok=True)
+            path = self.path(artifact_id)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self.stats["stored"] += 1
+            if with_thumbnail:
+                thumbnail = _thumbnail(data, self.thumbnail_size)
+                if thumbnail is not None:
+                    with open(self.path(artifact_id, thumbnail=True), "wb") as f:
+                        f.write(thumbnail)
+                    self.stats["thumbnails"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"Failed to store artifact {artifact_id}: {e}")
+        finally:
+            with self._lock:
+                self._pending.pop(artifact_id, None)
+
+    def open_path(self, artifact_id, thumbnail=False):
+        """Path of a stored artifact, waiting for a pending write; None if unknown.
+
+        Falls back to the full image when there is no thumbnail.
+        """
+        with self._lock:
+            future = self._pending.get(artifact_id)
+        if future is not None:
+            future.result()
+        if thumbnail and os.path.exists(self.path(artifact_id, thumbnail=True)):
+            return self.path(artifact_id, thumbnail=True)
+        path = self.path(artifact_id)
+        return path if os.path.exists(path) else None
+
+    def flush(self):
+        """Wait for all queued writes."""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            future.result()
+
+    def get_stats(self):
+        return {"pending": len(self._pending), **self.stats}
+
+
+def describe(handle):
+    """One line for the model, e.g. "Chart 3f2a9c0d1b7e4a55 (1000x600 PNG) saved to images/3f2a....png"."""
+    size = f"{handle['width']}x{handle['height']} PNG" if handle.get("width") else "PNG"
+    return f"{handle['kind'].capitalize()} {handle['id']} ({size}) saved to {handle['path']}"
+
+
+_store = None
+
+
+def get_store():
+    """Process-wide store rooted at ARTIFACTS_DIR."""
+    global _store
+    if _store is None:
+        _store = ArtifactStore()
+    return _store
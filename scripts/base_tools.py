@@ -2,8 +2,11 @@ import os
 import json
 
 from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 import ollama
-import requests
+
+from scripts import http_client
+from scripts.tool_cache import cached
 
 # -------------------------
 # MCP Config Loader
@@ -16,6 +19,7 @@ import requests
 # -------------------------
 # @tool('live_web_search', description='Perform live search using Ollama.')
 @tool
+@cached("web_search")
 def web_search(query: str):
     """
     Perform a live web search using Ollama Cloud Web Search API for real-time information and news.
@@ -28,7 +32,7 @@ def web_search(query: str):
     """
 
     response = ollama.web_search(query=query, max_results=2)
-    response = response.results
+    response = [result.model_dump() for result in response.results]
 
     return response
 
@@ -36,8 +40,15 @@ def web_search(query: str):
 # -------------------------
 # Weather Tool
 # -------------------------
-@tool
-def get_weather(location: str):
+WEATHER_API_URL = os.getenv("WEATHER_API_URL", "https://api.weatherapi.com/v1/current.json")
+
+
+def _weather_params(location):
+    return {"key": os.getenv('WEATHER_API_KEY'), "q": location, "aqi": "no"}
+
+
+@cached("get_weather")
+def fetch_weather(location: str):
     """Get current weather for a location using WeatherAPI.com.
     
     Use for queries about weather, temperature, or conditions in any city.
@@ -50,11 +61,21 @@ def get_weather(location: str):
         Current weather information including temperature and conditions.
     """
 
-    url = f"http://api.weatherapi.com/v1/current.json?key={os.getenv('WEATHER_API_KEY')}&q={location}&aqi=no"
+    return http_client.get_json(WEATHER_API_URL, params=_weather_params(location))
+
+
+@cached("get_weather")
+async def afetch_weather(location: str):
+    """Async variant of `fetch_weather` on the shared pooled client."""
 
-    response = requests.get(url=url, timeout=10)
-    response.raise_for_status()
+    return await http_client.aget_json(WEATHER_API_URL, params=_weather_params(location))
 
-    data = response.json()
 
-    return data
\ No newline at end of file
+# Sync and async entry points: invoke() uses fetch_weather, ainvoke()/astream()
+# use afetch_weather so the event loop is never blocked
+get_weather = StructuredTool.from_function(
+    func=fetch_weather,
+    coroutine=afetch_weather,
+    name="get_weather",
+    description=fetch_weather.__doc__,
+)
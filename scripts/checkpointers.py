@@ -0,0 +1,302 @@
+"""
+Bounded and durable checkpointers for agents.
+
+- BoundedInMemorySaver: InMemorySaver that keeps the last N checkpoints per
+  thread, caps the number of threads and their serialized size (LRU) and
+  evicts idle threads.
+- PrunedSqliteSaver: SqliteSaver in WAL mode with the same pruning and idle
+  eviction, plus async methods so it works with `ainvoke`/`astream`.
+
+Use `get_checkpointer()` so every module in a process shares one instance:
+    CHECKPOINTER=memory|sqlite     (default memory)
+    CHECKPOINT_DB=path/to/file.db  (default db/checkpoints.db)
+    CHECKPOINT_KEEP_LAST=20        checkpoints kept per thread
+    CHECKPOINT_THREAD_TTL=86400    seconds of inactivity before a thread is dropped
+    CHECKPOINT_MAX_THREADS=1000    thread cap for the in-memory saver
+    CHECKPOINT_MAX_MB=256          size cap (checkpoints, writes, blobs) for the in-memory saver
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db", "checkpoints.db")
+
+
+# -------------------------
+# In-Memory Saver
+# -------------------------
+def _serialized_size(value):
+    """Bytes held by a stored value: the serialized payloads inside nested tuples/dicts."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, (tuple, list)):
+        return sum(_serialized_size(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_serialized_size(v) for v in value.values())
+    return 0
+
+
+class BoundedInMemorySaver(InMemorySaver):
+    """InMemorySaver with per-thread checkpoint pruning, a thread cap and a byte budget."""
+
+    def __init__(self, keep_last=20, max_threads=1000, thread_ttl=None, max_bytes=None, **kwargs):
+        super().__init__(**kwargs)
+        self.keep_last = keep_last
+        self.max_threads = max_threads
+        self.thread_ttl = thread_ttl
+        self.max_bytes = max_bytes
+
+        self._activity = OrderedDict()  # thread_id -> last write time, LRU order
+        self._versions = {}  # (thread_id, ns, checkpoint_id) -> channel_versions
+        self._blob_keys = defaultdict(set)  # (thread_id, ns) -> blob keys
+        self._sizes = {}  # thread_id -> serialized bytes
+        self.total_bytes = 0
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        self._versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(
+            checkpoint["channel_versions"]
+        )
+        for channel, version in new_versions.items():
+            self._blob_keys[(thread_id, checkpoint_ns)].add(
+                (thread_id, checkpoint_ns, channel, version)
+            )
+
+        self._activity[thread_id] = time.time()
+        self._activity.move_to_end(thread_id)
+
+        self._prune(thread_id, checkpoint_ns)
+        self._measure(thread_id)
+        self.evict_threads()
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        super().put_writes(config, writes, task_id, task_path)
+        thread_id = config["configurable"]["thread_id"]
+        if thread_id in self._activity:
+            self._measure(thread_id)
+            self.evict_threads()
+
+    def _measure(self, thread_id):
+        """Recount one thread's bytes; pruning keeps this to keep_last checkpoints."""
+        size = 0
+        for checkpoint_ns, checkpoints in self.storage.get(thread_id, {}).items():
+            for checkpoint_id, saved in checkpoints.items():
+                size += _serialized_size(saved)
+                size += _serialized_size(self.writes.get((thread_id, checkpoint_ns, checkpoint_id), {}))
+            for key in self._blob_keys.get((thread_id, checkpoint_ns), ()):
+                size += _serialized_size(self.blobs.get(key))
+        self.total_bytes += size - self._sizes.get(thread_id, 0)
+        self._sizes[thread_id] = size
+
+    def _prune(self, thread_id, checkpoint_ns):
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if self.keep_last is None or len(checkpoints) <= self.keep_last:
+            return
+
+        # checkpoint ids are time-ordered (uuid6), so sorting gives age order
+        for checkpoint_id in sorted(checkpoints)[: -self.keep_last]:
+            del checkpoints[checkpoint_id]
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+            self._versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+
+        referenced = set()
+        for checkpoint_id in checkpoints:
+            versions = self._versions.get((thread_id, checkpoint_ns, checkpoint_id), {})
+            referenced.update(versions.items())
+
+        blob_keys = self._blob_keys[(thread_id, checkpoint_ns)]
+        for key in list(blob_keys):
+            if (key[2], key[3]) not in referenced:
+                self.blobs.pop(key, None)
+                blob_keys.discard(key)
+
+    def evict_threads(self):
+        """Drop idle threads (thread_ttl) and least recently used ones (max_threads, max_bytes)."""
+        now = time.time()
+        while self._activity:
+            thread_id, updated_at = next(iter(self._activity.items()))
+            too_many = self.max_threads is not None and len(self._activity) > self.max_threads
+            # the most recent thread is kept even if it alone is over the budget
+            too_big = self.max_bytes is not None and self.total_bytes > self.max_bytes and len(self._activity) > 1
+            expired = self.thread_ttl is not None and now - updated_at > self.thread_ttl
+            if not (too_many or too_big or expired):
+                break
+            self.delete_thread(thread_id)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        self._activity.pop(thread_id, None)
+        self.total_bytes -= self._sizes.pop(thread_id, 0)
+        for key in [k for k in self._versions if k[0] == thread_id]:
+            del self._versions[key]
+        for key in [k for k in self._blob_keys if k[0] == thread_id]:
+            del self._blob_keys[key]
+
+
+# -------------------------
+# SQLite Saver
+# -------------------------
+class PrunedSqliteSaver(SqliteSaver):
+    """SqliteSaver (WAL) that prunes old checkpoints and evicts idle threads.
+
+    SqliteSaver serializes access to its connection with a lock, so async
+    calls run on a small dedicated thread pool rather than one thread per
+    call; one saver per database file is shared through `get_checkpointer()`.
+    """
+
+    def __init__(self, conn, keep_last=20, thread_ttl=None, evict_every=100, max_workers=4, **kwargs):
+        super().__init__(conn, **kwargs)
+        self.keep_last = keep_last
+        self.thread_ttl = thread_ttl
+        self.evict_every = evict_every
+        self._puts = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="checkpoint")
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # the timeout lets writers from other worker processes wait instead of failing
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return cls(conn, **kwargs)
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_activity "
+            "(thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT OR REPLACE INTO thread_activity (thread_id, updated_at) VALUES (?, ?)",
+                (thread_id, time.time()),
+            )
+            if self.keep_last is not None:
+                self._prune(cur, thread_id, checkpoint_ns)
+
+        self._puts += 1
+        if self.thread_ttl is not None and self._puts % self.evict_every == 0:
+            self.evict_threads()
+        return result
+
+    def _prune(self, cur, thread_id, checkpoint_ns):
+        keep = (
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT ?"
+        )
+        params = (thread_id, checkpoint_ns, thread_id, checkpoint_ns, self.keep_last)
+        for table in ("checkpoints", "writes"):
+            cur.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"AND checkpoint_id NOT IN ({keep})",
+                params,
+            )
+
+    def evict_threads(self):
+        """Delete threads with no writes for `thread_ttl` seconds."""
+        if self.thread_ttl is None:
+            return
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT thread_id FROM thread_activity WHERE updated_at < ?",
+                (time.time() - self.thread_ttl,),
+            )
+            expired = [row[0] for row in cur.fetchall()]
+
+        for thread_id in expired:
+            self.delete_thread(thread_id)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    # Async API on the bounded executor
+    async def _run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(*args, **kwargs))
+
+    async def aget_tuple(self, config):
+        return await self._run(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await self._run(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await self._run(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await self._run(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await self._run(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *args, **kwargs):
+        return await self._run(self.get_delta_channel_history, *args, **kwargs)
+
+
+# -------------------------
+# Shared Checkpointers
+# -------------------------
+_checkpointers = {}
+_lock = threading.Lock()
+
+
+def _env_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def get_checkpointer(kind=None, path=None):
+    """Return the shared checkpointer for this process (see module docstring)."""
+    kind = kind or os.getenv("CHECKPOINTER", "memory")
+    keep_last = _env_int("CHECKPOINT_KEEP_LAST", 20)
+    thread_ttl = _env_int("CHECKPOINT_THREAD_TTL")
+
+    if kind == "sqlite":
+        path = path or os.getenv("CHECKPOINT_DB", DEFAULT_DB_PATH)
+        key = ("sqlite", os.path.abspath(path))
+    elif kind == "memory":
+        key = ("memory", None)
+    else:
+        raise ValueError(f"Unknown checkpointer '{kind}', expected 'memory' or 'sqlite'")
+
+    with _lock:
+        if key not in _checkpointers:
+            if kind == "sqlite":
+                _checkpointers[key] = PrunedSqliteSaver.from_path(
+                    path, keep_last=keep_last, thread_ttl=thread_ttl
+                )
+            else:
+                _checkpointers[key] = BoundedInMemorySaver(
+                    keep_last=keep_last,
+                    max_threads=_env_int("CHECKPOINT_MAX_THREADS", 1000),
+                    thread_ttl=thread_ttl,
+                    max_bytes=_env_int("CHECKPOINT_MAX_MB", 256) * 1024 * 1024,
+                )
+        return _checkpointers[key]
@@ -0,0 +1,169 @@
+"""
+Sandbox tools for the code execution agent.
+
+`make_code_tools(pool)` returns `upload_file` and `run_python_code` bound to a
+`SandboxPool`. Each call runs in the sandbox session of the calling thread_id,
+so conversations no longer share one interpreter. Uploads are content
+addressed (see sandbox_files): a file the session already holds is not sent again.
+Tabular files come back with their dataset profile (see dataset_profiles), so
+the model does not need exploration turns before the analysis. Datasets are
+loaded into named DataFrames that persist for the thread, and every execution
+reports the namespace (see sandbox_state). Charts are written to an artifact
+store off the hot path and come back as compact handles (see artifacts): a
+line of text for the model and the ToolMessage artifact for stream clients.
+"""
+import os
+
+from langchain.tools import ToolRuntime, tool
+
+from scripts import artifacts, dataset_profiles, sandbox_files, sandbox_state
+
+MAX_OUTPUT_CHARS = 4000
+MAX_STDERR_CHARS = 1000
+
+
+def thread_id_of(runtime):
+    return (runtime.config or {}).get("configurable", {}).get("thread_id", "default")
+
+
+def clip(text, limit=None):
+    """Keep the head and tail of long output."""
+    limit = limit or MAX_OUTPUT_CHARS
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return f"{text[:half]}\n... [{len(text) - limit} characters omitted] ...\n{text[-half:]}"
+
+
+def make_code_tools(pool, data_dir="./data", images_dir=None, timeout=None, compress_uploads=True,
+                    profiler=None, memory_limit_mb=sandbox_state.MEMORY_LIMIT_MB, artifact_store=None):
+    """`profiler` is a DatasetProfiler (one is created by default); pass False to skip profiles.
+
+    Charts are stored in `artifact_store`, by default the process-wide store that
+    the servers' /artifacts endpoint reads (or a store rooted at `images_dir`).
+    """
+    run_kwargs = {"timeout": timeout} if timeout else {}
+    store = artifact_store or (artifacts.ArtifactStore(images_dir) if images_dir else artifacts.get_store())
+    if profiler is None:
+        profiler = dataset_profiles.DatasetProfiler()
+
+    def profile_of(local_file_path):
+        if not profiler or not profiler.supports(local_file_path):
+            return None
+        try:
+            return profiler.profile(local_file_path)
+        except Exception as e:
+            # e.g. openpyxl missing for .xlsx; the upload itself still works
+            print(f"Profiling {local_file_path} failed: {e}")
+            return None
+
+    def load_datasets(session, local_file_name, sandbox_path, profile, parquet_paths):
+        """Load each sheet into a named DataFrame; returns descriptions like "titanic (891x12)"."""
+        if profile:
+            sheet_names = [sheet["name"] for sheet in profile["sheets"]]
+            excel = profile["excel"]
+        elif os.path.splitext(local_file_name)[1].lower() in (".csv", ".tsv"):
+            sheet_names, excel = [None], False
+        else:
+            return []
+
+        loaded = []
+        for sheet_name in sheet_names:
+            # one variable per file; Excel workbooks with several sheets get one per sheet
+            name = sandbox_state.dataset_name(local_file_name, sheet_name if len(sheet_names) > 1 else None)
+            registered = sandbox_state.register_dataset(
+                session.sandbox, name, sandbox_path, parquet_paths.get(sheet_name), sheet_name if excel else None,
+                version=session.files[f"data/{local_file_name}"][0],
+            )
+            if registered:
+                name, shape = registered
+                loaded.append(f"{name} ({'x'.join(map(str, shape))})")
+        return loaded
+
+    @tool
+    def upload_file(local_file_name: str, runtime: ToolRuntime):
+        """Upload a data file to the sandbox for analysis.
+
+        Args:
+            local_file_name: Name of the file under ./data (e.g., "IMDB-Movie-Data.csv")
+
+        Returns:
+            Success message with sandbox_path and, for CSV/Excel files, the dataset profile
+        """
+        local_file_name = local_file_name.lstrip('/').lstrip('\\')
+        local_file_path = os.path.join(data_dir, local_file_name)
+
+        if not os.path.exists(local_file_path):
+            return f"Error: file not found at {local_file_path}"
+
+        profile = profile_of(local_file_path)
+        parquet_paths = {}
+        with pool.lease(thread_id_of(runtime)) as session:
+            sandbox_path, how = sandbox_files.upload(
+                session, local_file_path, f"data/{local_file_name}", compress=compress_uploads
+            )
+            if profile:
+                for parquet_file, sheet in profiler.parquet_files(local_file_path, profile):
+                    # <digest>/<name>.parquet, so same-named files in different folders do not collide
+                    relative = os.path.relpath(parquet_file, profiler.cache_dir).replace(os.sep, "/")
+                    parquet_paths[sheet["name"]], _ = sandbox_files.upload(
+                        session, parquet_file, f"data/.parquet/{relative}"
+                    )
+            loaded = load_datasets(session, local_file_name, sandbox_path, profile, parquet_paths)
+
+        if how == "cached":
+            message = f"File already in the sandbox (unchanged).\nSandbox path: {sandbox_path}"
+        else:
+            message = f"File uploaded successfully!\nSandbox path: {sandbox_path}"
+        if loaded:
+            message += "\nLoaded (kept in memory between run_python_code calls, do not re-read the file): "
+            message += ", ".join(loaded)
+        if profile:
+            message += "\n\n" + dataset_profiles.render(profile, parquet_paths)
+        return message
+
+    @tool(response_format="content_and_artifact")
+    def run_python_code(code: str, runtime: ToolRuntime):
+        """Execute Python code in the sandbox.
+
+        Args:
+            code: Valid executable Python code. Do not pass anything else otherthan python code.
+
+        Returns:
+            Execution result
+        """
+        print('Running code in sandbox....')
+        with pool.lease(thread_id_of(runtime)) as session:
+            execution = session.sandbox.run_code(code, **run_kwargs)
+            session.failed = execution.error is not None
+            variables = sandbox_state.render(sandbox_state.inspect(session.sandbox, code, memory_limit_mb))
+        print('Code execution is done!')
+
+        # charts go to the store in the background; the model only sees their handles
+        handles = {}
+        for result in execution.results:
+            if result.png:
+                handle = store.put(result.png)
+                handles.setdefault(handle["id"], handle)
+        handles = list(handles.values())
+
+        output = []
+        if execution.error:
+            output.append(f"Error: {execution.error.name}\nValue: {execution.error.value}")
+        stdout = "".join(execution.logs.stdout)
+        if stdout.strip():
+            output.append("Output:\n" + clip(stdout))
+        stderr = "".join(execution.logs.stderr)
+        if stderr.strip():
+            output.append("Stderr:\n" + clip(stderr, MAX_STDERR_CHARS))
+        for result in execution.results:
+            if result.text and not result.png:
+                output.append("Result:\n" + clip(result.text))
+        output.extend(artifacts.describe(handle) for handle in handles)
+        if variables:
+            output.append(variables)
+
+        content = "\n".join(output) if output else "Code executed but no output was returned"
+        return content, {"artifacts": handles} if handles else None
+
+    return [upload_file, run_python_code]
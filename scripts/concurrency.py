@@ -0,0 +1,177 @@
+"""
+Per-thread locks and admission control for the stream servers.
+
+- ThreadLocks: one asyncio.Lock per thread_id, so two runs on the same
+  thread never interleave checkpoints. Locks are dropped when unused.
+- AdmissionController: caps in-flight runs; the rest wait in a bounded
+  queue and are admitted round-robin across users, so one busy user cannot
+  starve the others. When the queue is full, `Overloaded` is raised (HTTP 429).
+  Queue wait times are kept for `stats()`.
+
+Streaming endpoints call `reserve()` before returning the response, so a
+request is counted (and can be rejected with a status code) before its
+stream starts; the stream then passes the reservation to `slot()`.
+"""
+import asyncio
+import statistics
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from scripts import metrics
+
+
+class Overloaded(Exception):
+    """No room in the admission queue (or the per-thread queue)."""
+
+
+# -------------------------
+# Per-thread Locks
+# -------------------------
+class ThreadLocks:
+    def __init__(self, max_waiting=8):
+        self.max_waiting = max_waiting
+        self._locks = {}  # thread_id -> [lock, users]
+
+    def waiting(self, thread_id):
+        entry = self._locks.get(thread_id)
+        return entry[1] if entry else 0
+
+    def check(self, thread_id):
+        if thread_id is not None and self.waiting(thread_id) > self.max_waiting:
+            raise Overloaded(f"too many requests queued on thread '{thread_id}'")
+
+    @asynccontextmanager
+    async def hold(self, thread_id):
+        entry = self._locks.setdefault(thread_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[thread_id]
+
+
+# -------------------------
+# Admission Control
+# -------------------------
+class Reservation:
+    """Capacity held for a request whose stream has not reached `slot()` yet."""
+
+    def __init__(self, controller):
+        self.controller = controller
+
+    def release(self):
+        self.controller._reservations.discard(self)
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=16, max_queue=64, queue_timeout=None, window=1000):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self.in_flight = 0
+        self._queues = OrderedDict()  # user -> deque of futures, in round-robin order
+        self._queued = 0
+        # weak, so a stream that is dropped before it starts frees its place
+        self._reservations = weakref.WeakSet()
+        self._waits = deque(maxlen=window)
+        self.counts = {"admitted": 0, "rejected": 0, "timed_out": 0}
+
+    def check(self):
+        """Raise Overloaded if a new request could not even be queued."""
+        waiting = self._queued + len(self._reservations)
+        if self.in_flight + waiting >= self.max_in_flight + self.max_queue:
+            self.counts["rejected"] += 1
+            raise Overloaded("server is busy, try again later")
+
+    def reserve(self):
+        self.check()
+        reservation = Reservation(self)
+        self._reservations.add(reservation)
+        return reservation
+
+    def _admit_next(self):
+        while self._queues and self.in_flight < self.max_in_flight:
+            user, queue = next(iter(self._queues.items()))
+            future = queue.popleft()
+            self._queued -= 1
+            # move this user to the back of the rotation
+            if queue:
+                self._queues.move_to_end(user)
+            else:
+                del self._queues[user]
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
+
+    def _release(self):
+        self.in_flight -= 1
+        self._admit_next()
+
+    async def _acquire(self, user, reserved):
+        if self.in_flight < self.max_in_flight and not self._queued:
+            self.in_flight += 1
+            return
+
+        if not reserved:
+            self.check()
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(user, deque()).append(future)
+        self._queued += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if future.done():
+                # admitted just as we gave up: hand the slot on
+                self._release()
+            else:
+                future.cancel()
+                queue = self._queues.get(user)
+                if queue is not None and future in queue:
+                    queue.remove(future)
+                    self._queued -= 1
+                    if not queue:
+                        del self._queues[user]
+            if isinstance(e, asyncio.TimeoutError):
+                self.counts["timed_out"] += 1
+                raise Overloaded("timed out waiting for a free slot")
+            raise
+
+    @asynccontextmanager
+    async def slot(self, user="anonymous", reservation=None):
+        """Hold one in-flight slot for the body of the `async with`."""
+        start = time.perf_counter()
+        if reservation is not None:
+            reservation.release()
+        await self._acquire(user, reserved=reservation is not None)
+        wait = time.perf_counter() - start
+        self._waits.append(wait)
+        metrics.QUEUE_WAIT_SECONDS.observe(wait)
+        self.counts["admitted"] += 1
+        try:
+            yield
+        finally:
+            self._release()
+
+    def stats(self):
+        waits = sorted(self._waits)
+        queue_wait = {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        if waits:
+            queue_wait = {
+                "p50": statistics.median(waits),
+                "p95": waits[min(int(len(waits) * 0.95), len(waits) - 1)],
+                "max": waits[-1],
+            }
+        return {
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "reserved": len(self._reservations),
+            "users_waiting": len(self._queues),
+            **self.counts,
+            "queue_wait_seconds": {k: round(v, 4) for k, v in queue_wait.items()},
+        }
@@ -0,0 +1,186 @@
+"""
+Dataset profiles for the data analysis agent.
+
+Each CSV/Excel file under ./data is profiled once per version (content hash):
+shape, columns, dtypes, nulls, distinct counts, numeric ranges, top values
+and a few sample rows per sheet. The profile is cached on disk and
+`upload_file` returns it with the upload, so the model starts the analysis
+already knowing the schema instead of spending run_python_code turns on
+`df.info()` / `describe()`.
+
+When a Parquet engine (pyarrow or fastparquet) is installed, every sheet is
+also converted to Parquet once; `upload_file` sends that copy too, and it
+loads much faster than re-parsing CSV or Excel.
+"""
+import json
+import os
+import threading
+
+import pandas as pd
+
+from scripts import sandbox_files, utils
+
+PROFILE_VERSION = 1
+TABULAR_SUFFIXES = {".csv", ".tsv", ".xlsx", ".xls"}
+SAMPLE_ROWS = 3
+TOP_VALUES = 3
+MAX_RENDERED_COLUMNS = 60
+
+
+def parquet_engine():
+    for module in ("pyarrow", "fastparquet"):
+        try:
+            __import__(module)
+            return module
+        except ImportError:
+            pass
+    return None
+
+
+def read_sheets(path):
+    """{sheet name: DataFrame}; CSV files have a single sheet named after the file."""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in (".csv", ".tsv"):
+        return {os.path.basename(path): pd.read_csv(path, sep="\t" if suffix == ".tsv" else ",")}
+    return pd.read_excel(path, sheet_name=None)
+
+
+def _scalar(value):
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 4)
+    return value if isinstance(value, (int, bool)) or value is None else str(value)
+
+
+def profile_frame(df):
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        column = {
+            "name": str(name),
+            "dtype": str(series.dtype),
+            "nulls": int(series.isna().sum()),
+            "unique": int(series.nunique(dropna=True)),
+        }
+        non_null = series.dropna()
+        numeric = pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series)
+        if non_null.empty:
+            columns.append(column)
+            continue
+        if numeric or pd.api.types.is_datetime64_any_dtype(series):
+            column["min"], column["max"] = _scalar(non_null.min()), _scalar(non_null.max())
+            if numeric:
+                column["mean"] = _scalar(non_null.mean())
+        elif column["unique"] < len(non_null):
+            # top values only say something when values repeat (not for ids or free text)
+            top = non_null.astype(str).value_counts().head(TOP_VALUES)
+            column["top"] = {str(k)[:40]: int(v) for k, v in top.items()}
+        columns.append(column)
+
+    sample = df.head(SAMPLE_ROWS).to_string(max_colwidth=30, max_cols=MAX_RENDERED_COLUMNS)
+    return {"rows": int(len(df)), "columns": columns, "sample": sample}
+
+
+def render(profile, parquet_paths=None):
+    """Compact text form of a profile for the model.
+
+    `parquet_paths` maps sheet names to the sandbox path of their Parquet copy.
+    """
+    parquet_paths = parquet_paths or {}
+    lines = [f"Dataset profile: {profile['file']}"]
+    for sheet in profile["sheets"]:
+        title = f"Sheet '{sheet['name']}'" if profile["excel"] else "Table"
+        lines.append(f"{title}: {sheet['rows']} rows x {len(sheet['columns'])} columns")
+        if sheet["name"] in parquet_paths:
+            lines.append(f"  fast copy: pd.read_parquet('{parquet_paths[sheet['name']]}')")
+        for column in sheet["columns"][:MAX_RENDERED_COLUMNS]:
+            parts = [f"  - {column['name']} ({column['dtype']})"]
+            if column["nulls"]:
+                parts.append(f"nulls={column['nulls']}")
+            parts.append(f"unique={column['unique']}")
+            if "min" in column:
+                parts.append(f"range={column['min']}..{column['max']}")
+            if "mean" in column:
+                parts.append(f"mean={column['mean']}")
+            if "top" in column:
+                parts.append("top=" + ", ".join(f"{k} ({v})" for k, v in column["top"].items()))
+            lines.append(" ".join(parts))
+        hidden = len(sheet["columns"]) - MAX_RENDERED_COLUMNS
+        if hidden > 0:
+            lines.append(f"  ... {hidden} more columns")
+        lines.append("  sample rows:")
+        lines.extend(f"    {row}" for row in sheet["sample"].splitlines())
+    return "\n".join(lines)
+
+
+class DatasetProfiler:
+    """Profiles (and Parquet copies) keyed by file content, cached in memory and on disk."""
+
+    def __init__(self, cache_dir=None, parquet=True):
+        self.cache_dir = cache_dir or os.path.dirname(utils.get_cache_path("datasets", "x"))
+        self.engine = parquet_engine() if parquet else None
+        self._profiles = {}  # digest -> profile
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "profiled": 0}
+
+    def supports(self, path):
+        return os.path.splitext(path)[1].lower() in TABULAR_SUFFIXES
+
+    def profile(self, path):
+        """Profile of the file's current version; computed at most once per version."""
+        digest = sandbox_files.file_digest(path)
+        with self._lock:
+            profile = self._profiles.get(digest)
+            if profile is not None:
+                self.stats["hits"] += 1
+                return profile
+
+            profile_path = os.path.join(self.cache_dir, digest, "profile.json")
+            if os.path.exists(profile_path):
+                with open(profile_path, encoding="utf-8") as f:
+                    profile = json.load(f)
+                if profile.get("version") == PROFILE_VERSION:
+                    self.stats["disk_hits"] += 1
+                    self._profiles[digest] = profile
+                    return profile
+
+            profile = self._build(path, digest)
+            self.stats["profiled"] += 1
+            self._profiles[digest] = profile
+            return profile
+
+    def _build(self, path, digest):
+        directory = os.path.join(self.cache_dir, digest)
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        excel = os.path.splitext(path)[1].lower() in (".xlsx", ".xls")
+
+        sheets = []
+        for index, (name, df) in enumerate(read_sheets(path).items()):
+            sheet = {"name": str(name), **profile_frame(df)}
+            if self.engine:
+                file_name = f"{stem}.{index}.parquet" if excel else f"{stem}.parquet"
+                try:
+                    # Parquet needs string column names
+                    df.set_axis([str(c) for c in df.columns], axis=1).to_parquet(
+                        os.path.join(directory, file_name), engine=self.engine, index=False
+                    )
+                    sheet["parquet_file"] = file_name
+                except Exception as e:  # mixed-type object columns, etc.
+                    print(f"Parquet conversion failed for {path} [{name}]: {e}")
+            sheets.append(sheet)
+
+        profile = {"version": PROFILE_VERSION, "file": os.path.basename(path), "excel": excel, "sheets": sheets}
+        with open(os.path.join(directory, "profile.json"), "w", encoding="utf-8") as f:
+            json.dump(profile, f)
+        return profile
+
+    def parquet_files(self, path, profile):
+        """[(local parquet path, sheet)] for the sheets that have a Parquet copy."""
+        directory = os.path.join(self.cache_dir, sandbox_files.file_digest(path))
+        return [
+            (os.path.join(directory, sheet["parquet_file"]), sheet)
+            for sheet in profile["sheets"]
+            if sheet.get("parquet_file") and os.path.exists(os.path.join(directory, sheet["parquet_file"]))
+        ]
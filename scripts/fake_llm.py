@@ -0,0 +1,114 @@
+"""
+Scripted fake chat model for load tests and benchmarks.
+
+Replays a fixed list of responses with configurable latency, so agents and
+servers can be measured without calling Gemini.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that replays scripted responses.
+
+    `responses` items are either strings or `AIMessage` objects (use the
+    latter to script tool calls). They are replayed in order and cycled.
+    With `per_turn=True` the response is picked by position in the current
+    turn instead (first model call after the user message gets
+    `responses[0]`, the next `responses[1]`, ...), so concurrent runs on one
+    model stay deterministic. `latency` is the time to first token;
+    `token_latency` is added per streamed word.
+    """
+
+    responses: list[Any] = ["This is a scripted response."]
+    latency: float = 0.0
+    token_latency: float = 0.0
+    per_turn: bool = False
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-chat-model"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self, messages):
+        if self.per_turn:
+            step = 0
+            for message in reversed(messages):
+                if isinstance(message, HumanMessage):
+                    break
+                step += isinstance(message, AIMessage)
+            response = self.responses[min(step, len(self.responses) - 1)]
+        else:
+            response = self.responses[self.calls % len(self.responses)]
+        self.calls += 1
+        if isinstance(response, AIMessage):
+            # fresh tool call ids so replayed calls never collide in a thread
+            tool_calls = [{**tc, "id": _new_call_id()} for tc in response.tool_calls]
+            return AIMessage(content=response.content, tool_calls=tool_calls)
+        return AIMessage(content=response)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        message = self._next_message(messages)
+
+        words = message.text.split(" ") if message.text else []
+        for idx, word in enumerate(words):
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            text = word if idx == 0 else " " + word
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+            if run_manager:
+                await run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+        if message.tool_calls:
+            tool_call_chunks = [
+                {"name": tc["name"], "args": json.dumps(tc["args"]), "id": tc["id"], "index": idx}
+                for idx, tc in enumerate(message.tool_calls)
+            ]
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content="", tool_call_chunks=tool_call_chunks)
+            )
+
+        # final chunk carries usage, like real providers do
+        input_tokens = sum(len(m.text) // 4 for m in messages)
+        output_tokens = max(len(words), 1)
+        usage = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=usage))
+
+
+def tool_call_message(*calls, text=""):
+    """Build an `AIMessage` requesting tools, e.g. tool_call_message(("get_weather", {"location": "Mumbai"}))."""
+    return AIMessage(
+        content=text,
+        tool_calls=[
+            {"name": name, "args": args, "id": _new_call_id(), "type": "tool_call"}
+            for name, args in calls
+        ],
+    )
+
+
+def _new_call_id():
+    return f"call_{uuid.uuid4().hex[:12]}"
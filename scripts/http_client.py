@@ -0,0 +1,96 @@
+"""
+Shared, connection-pooled HTTP clients for tools.
+
+One sync client per process and one async client per event loop, so repeated
+tool calls reuse keep-alive connections (and HTTP/2 when `h2` is installed)
+instead of opening a new connection each time.
+"""
+import asyncio
+import importlib.util
+import random
+import threading
+import time
+import weakref
+
+import httpx
+
+HTTP2 = importlib.util.find_spec("h2") is not None
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=30)
+TIMEOUT = httpx.Timeout(10.0, connect=5.0)
+
+_client = None
+_client_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()
+
+
+# -------------------------
+# Clients
+# -------------------------
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT)
+        return _client
+
+
+def get_async_client():
+    # httpx.AsyncClient is bound to the loop it first runs on
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(http2=HTTP2, limits=LIMITS, timeout=TIMEOUT)
+        _async_clients[loop] = client
+    return client
+
+
+# -------------------------
+# Requests with Retry
+# -------------------------
+def _backoff(attempt, base=0.5, cap=8.0):
+    return min(cap, base * 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+def _should_retry(response):
+    return response.status_code in RETRY_STATUS
+
+
+def get_json(url, params=None, retries=3):
+    client = get_client()
+    for attempt in range(retries + 1):
+        try:
+            response = client.get(url, params=params)
+            if not _should_retry(response) or attempt == retries:
+                break
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        time.sleep(_backoff(attempt))
+
+    response.raise_for_status()
+    return response.json()
+
+
+async def aget_json(url, params=None, retries=3):
+    client = get_async_client()
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(url, params=params)
+            if not _should_retry(response) or attempt == retries:
+                break
+        except httpx.TransportError:
+            if attempt == retries:
+                raise
+        await asyncio.sleep(_backoff(attempt))
+
+    response.raise_for_status()
+    return response.json()
+
+
+async def aclose():
+    """Close the async client for the running loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
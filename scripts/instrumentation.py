@@ -0,0 +1,128 @@
+"""
+Latency and usage instrumentation for `create_agent` agents.
+
+`InstrumentationMiddleware` records per-model-call latency and token usage,
+and per-tool latency, result size and errors. `observe_stream` wraps an
+`astream(stream_mode="messages")` iterator to record time-to-first-token and
+total run time. Metrics live in `scripts.metrics` (Prometheus text format).
+
+Set OTEL_TRACING=1 to also emit OpenTelemetry spans (needs opentelemetry-api,
+plus an SDK/exporter configured by the application).
+"""
+import os
+import time
+from contextlib import nullcontext
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import AIMessage, ToolMessage
+
+from scripts import metrics
+
+_tracer = None
+if os.getenv("OTEL_TRACING") == "1":
+    try:
+        from opentelemetry import trace
+
+        _tracer = trace.get_tracer("ai-agent-projects")
+    except ImportError:
+        print("OTEL_TRACING=1 but opentelemetry is not installed; spans disabled")
+
+
+def span(name, **attributes):
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.start_as_current_span(name, attributes=attributes)
+
+
+def model_name(model):
+    return getattr(model, "model", None) or getattr(model, "model_name", None) or model._llm_type
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class InstrumentationMiddleware(AgentMiddleware):
+    """Time every model and tool call; put it innermost in the middleware list."""
+
+    def _record_model(self, model, elapsed, response):
+        model = metrics.model_label(model)
+        metrics.MODEL_CALL_SECONDS.observe(elapsed, model)
+        for message in getattr(response, "result", None) or [response]:
+            usage = getattr(message, "usage_metadata", None) if isinstance(message, AIMessage) else None
+            if usage:
+                metrics.MODEL_TOKENS.inc(model, "input", amount=usage.get("input_tokens", 0))
+                metrics.MODEL_TOKENS.inc(model, "output", amount=usage.get("output_tokens", 0))
+
+    def _record_tool(self, tool, elapsed, result):
+        metrics.TOOL_CALL_SECONDS.observe(elapsed, tool)
+        if isinstance(result, ToolMessage):
+            content = result.content if isinstance(result.content, str) else str(result.content)
+            metrics.TOOL_RESULT_BYTES.observe(len(content.encode()), tool)
+            if result.status == "error":
+                metrics.TOOL_ERRORS.inc(tool)
+
+    def wrap_model_call(self, request, handler):
+        model = model_name(request.model)
+        with span("agent.model_call", model=model):
+            start = time.perf_counter()
+            response = handler(request)
+        self._record_model(model, time.perf_counter() - start, response)
+        return response
+
+    async def awrap_model_call(self, request, handler):
+        model = model_name(request.model)
+        with span("agent.model_call", model=model):
+            start = time.perf_counter()
+            response = await handler(request)
+        self._record_model(model, time.perf_counter() - start, response)
+        return response
+
+    def wrap_tool_call(self, request, handler):
+        tool = request.tool_call["name"]
+        start = time.perf_counter()
+        try:
+            with span("agent.tool_call", tool=tool):
+                result = handler(request)
+        except Exception:
+            metrics.TOOL_ERRORS.inc(tool)
+            raise
+        self._record_tool(tool, time.perf_counter() - start, result)
+        return result
+
+    async def awrap_tool_call(self, request, handler):
+        tool = request.tool_call["name"]
+        start = time.perf_counter()
+        try:
+            with span("agent.tool_call", tool=tool):
+                result = await handler(request)
+        except Exception:
+            metrics.TOOL_ERRORS.inc(tool)
+            raise
+        self._record_tool(tool, time.perf_counter() - start, result)
+        return result
+
+
+# -------------------------
+# Streams
+# -------------------------
+async def observe_stream(stream, model, start=None):
+    """Pass through (message, metadata) pairs, recording TTFT and run time.
+
+    `start` lets callers include time spent before the stream was created
+    (e.g. waiting for an admission slot).
+    """
+    start = start or time.perf_counter()
+    first_token = True
+    # not made current: context set inside a generator would leak across yields
+    run_span = _tracer.start_span("agent.run", attributes={"model": model}) if _tracer else None
+    model = metrics.model_label(model)
+    try:
+        async for message, metadata in stream:
+            if first_token and isinstance(message, AIMessage) and message.text:
+                metrics.TIME_TO_FIRST_TOKEN.observe(time.perf_counter() - start, model)
+                first_token = False
+            yield message, metadata
+    finally:
+        metrics.RUN_SECONDS.observe(time.perf_counter() - start, model)
+        if run_span is not None:
+            run_span.end()
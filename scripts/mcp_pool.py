@@ -0,0 +1,361 @@
+"""
+Long-lived MCP session pool shared across agent queries.
+
+Each configured server is started once, its stdio session is kept open by a
+background task, and the loaded tool list is cached. Tools call through a
+session proxy, so a restarted server is picked up without rebuilding agents.
+
+Servers start lazily: tool schemas are cached on disk (versioned, keyed by
+server command and args), so the tool list is available without spawning
+anything, and a server process only starts the first time one of its tools
+is called. `revalidate_in_background` refreshes cached schemas from the live
+servers without delaying startup: servers that are already running are
+re-listed right away, the others when their session first starts, so it
+never spawns a server by itself.
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import convert_mcp_tool_to_langchain_tool
+from mcp.types import Tool as MCPTool
+
+from scripts import utils
+
+
+# -------------------------
+# Session Proxy
+# -------------------------
+class _SessionProxy:
+    """Routes tool calls to the pool's current session for one server."""
+
+    def __init__(self, pool, server_name):
+        self._pool = pool
+        self._server_name = server_name
+
+    async def list_tools(self, *args, **kwargs):
+        session = await self._pool.get_session(self._server_name)
+        return await session.list_tools(*args, **kwargs)
+
+    async def call_tool(self, *args, **kwargs):
+        session = await self._pool.get_session(self._server_name)
+        return await session.call_tool(*args, **kwargs)
+
+
+# -------------------------
+# Session Pool
+# -------------------------
+SCHEMA_CACHE_VERSION = 1
+
+
+def config_hash(server_config):
+    return hashlib.sha1(json.dumps(server_config, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def schema_key(server_config):
+    """Tool schemas depend on what is launched, not on env secrets."""
+    launch = {k: server_config.get(k) for k in ("transport", "command", "args", "url")}
+    return config_hash(launch)
+
+
+def _dump_tools(mcp_tools):
+    return [t.model_dump(mode="json", exclude_none=True) for t in mcp_tools]
+
+
+class MCPSessionPool:
+    """Keeps one warm session per MCP server and hands out cached tools."""
+
+    def __init__(self, config=None, health_interval=30.0, ping_timeout=10.0, lazy=True):
+        self.config = config
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.lazy = lazy
+
+        self._sessions = {}
+        self._started_configs = {}
+        self._tasks = {}
+        self._stop_events = {}
+        self._tools = {}
+        self._locks = {}
+        self._health_task = None
+        self._revalidate_tasks = set()
+        self._pending_revalidation = {}  # server name -> on_change
+
+    def _get_config(self, server_name):
+        config = self.config if self.config is not None else utils.load_mcp_config()
+        if server_name not in config:
+            raise ValueError(f"Unknown MCP server '{server_name}'")
+        return config[server_name]
+
+    def _get_lock(self, server_name):
+        if server_name not in self._locks:
+            self._locks[server_name] = asyncio.Lock()
+        return self._locks[server_name]
+
+    async def _serve(self, server_name, ready):
+        # The session context must be entered and exited in the same task,
+        # so each server lives in its own task until asked to stop.
+        server_config = self._get_config(server_name)
+        self._started_configs[server_name] = server_config
+        client = MultiServerMCPClient({server_name: server_config})
+        try:
+            async with client.session(server_name) as session:
+                self._sessions[server_name] = session
+                ready.set()
+                await self._stop_events[server_name].wait()
+        finally:
+            self._sessions.pop(server_name, None)
+            ready.set()
+
+    def _is_alive(self, server_name):
+        task = self._tasks.get(server_name)
+        if server_name not in self._sessions or task is None or task.done():
+            return False
+        # restart servers whose entry in mcp_config.json has changed
+        return self._started_configs.get(server_name) == self._get_config(server_name)
+
+    async def _start(self, server_name):
+        ready = asyncio.Event()
+        self._stop_events[server_name] = asyncio.Event()
+        task = asyncio.create_task(self._serve(server_name, ready))
+        self._tasks[server_name] = task
+
+        await ready.wait()
+        if server_name not in self._sessions:
+            # Surface the startup error from the server task
+            await task
+
+        print(f"MCP server '{server_name}' started")
+        if server_name in self._pending_revalidation:
+            self._schedule_revalidation(server_name, on_change=self._pending_revalidation.pop(server_name))
+
+    async def _stop(self, server_name):
+        task = self._tasks.pop(server_name, None)
+        stop_event = self._stop_events.pop(server_name, None)
+        if task is None:
+            return
+
+        stop_event.set()
+        try:
+            await asyncio.wait_for(task, timeout=self.ping_timeout)
+        except asyncio.TimeoutError:
+            task.cancel()
+        except Exception as e:
+            print(f"MCP server '{server_name}' stopped with error: {e}")
+
+    async def get_session(self, server_name):
+        """Return a live session for the server, starting it if needed."""
+        if self._is_alive(server_name):
+            return self._sessions[server_name]
+
+        async with self._get_lock(server_name):
+            if not self._is_alive(server_name):
+                await self._stop(server_name)
+                await self._start(server_name)
+            return self._sessions[server_name]
+
+    async def restart(self, server_name):
+        async with self._get_lock(server_name):
+            await self._stop(server_name)
+            await self._start(server_name)
+
+    async def get_tools(self, *server_names):
+        """Return cached tools for the given servers (all configured if none)."""
+        if len(server_names) == 0:
+            config = self.config if self.config is not None else utils.load_mcp_config()
+            server_names = tuple(config)
+
+        self._ensure_health_check()
+
+        keys = {name: (name, config_hash(self._get_config(name))) for name in server_names}
+
+        # servers without cached schemas are started concurrently
+        missing = [name for name in server_names if keys[name] not in self._tools]
+        loaded = await asyncio.gather(*(self._load_tools(name) for name in missing))
+        for name, server_tools in zip(missing, loaded):
+            self._tools[keys[name]] = server_tools
+
+        tools = []
+        for name in server_names:
+            tools.extend(self._tools[keys[name]])
+
+        return tools
+
+    # -------------------------
+    # Tool schema cache
+    # -------------------------
+    def _schema_path(self, server_name):
+        digest = schema_key(self._get_config(server_name))
+        return utils.get_cache_path("mcp_tools", f"{server_name}-{digest}.json")
+
+    def _read_schemas(self, server_name):
+        path = self._schema_path(server_name)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, dict) or data.get("version") != SCHEMA_CACHE_VERSION:
+                return None
+            return [MCPTool.model_validate(t) for t in data["tools"]]
+        except Exception as e:
+            print(f"Ignoring unreadable tool cache {path}: {e}")
+            return None
+
+    def _write_schemas(self, server_name, mcp_tools):
+        server_config = self._get_config(server_name)
+        data = {
+            "version": SCHEMA_CACHE_VERSION,
+            "command": server_config.get("command"),
+            "args": server_config.get("args"),
+            "tools": _dump_tools(mcp_tools),
+        }
+        path = self._schema_path(server_name)
+        # per-process temp file: several workers may refresh the same cache
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    async def list_server_tools(self, server_name):
+        """Fetch tool definitions from the running server and refresh the disk cache."""
+        session = await self.get_session(server_name)
+        mcp_tools = []
+        cursor = None
+        while True:
+            page = await session.list_tools(cursor=cursor)
+            mcp_tools.extend(page.tools)
+            cursor = page.nextCursor
+            if not cursor:
+                break
+
+        self._write_schemas(server_name, mcp_tools)
+        return mcp_tools
+
+    async def _load_tools(self, server_name):
+        mcp_tools = self._read_schemas(server_name) if self.lazy else None
+        if mcp_tools is None:
+            mcp_tools = await self.list_server_tools(server_name)
+
+        return self._convert_tools(server_name, mcp_tools)
+
+    def _convert_tools(self, server_name, mcp_tools):
+        proxy = _SessionProxy(self, server_name)
+        return [convert_mcp_tool_to_langchain_tool(proxy, tool) for tool in mcp_tools]
+
+    async def revalidate(self, *server_names, on_change=None):
+        """Re-list tools from the live servers; update caches for any that changed.
+
+        `on_change(changed_server_names)` is awaited when at least one changed.
+        """
+        cached = {name: self._read_schemas(name) for name in server_names}
+        results = await asyncio.gather(
+            *(self.list_server_tools(name) for name in server_names), return_exceptions=True
+        )
+
+        changed = []
+        for name, fresh in zip(server_names, results):
+            if isinstance(fresh, Exception):
+                print(f"MCP server '{name}' revalidation failed: {fresh}")
+                continue
+
+            if cached[name] is None or _dump_tools(cached[name]) != _dump_tools(fresh):
+                self._tools[(name, config_hash(self._get_config(name)))] = self._convert_tools(name, fresh)
+                changed.append(name)
+
+        if changed:
+            print(f"MCP tool definitions changed for {changed}")
+            if on_change is not None:
+                await on_change(changed)
+        return changed
+
+    def _schedule_revalidation(self, *server_names, on_change=None):
+        task = asyncio.create_task(self.revalidate(*server_names, on_change=on_change))
+        self._revalidate_tasks.add(task)
+        task.add_done_callback(self._revalidate_tasks.discard)
+        return task
+
+    def revalidate_in_background(self, *server_names, on_change=None):
+        """Revalidate running servers now and the others when they first start.
+
+        Returns the task for the running ones, or None if none is running.
+        """
+        running = [name for name in server_names if self._is_alive(name)]
+        for name in server_names:
+            if name not in running:
+                self._pending_revalidation[name] = on_change
+        return self._schedule_revalidation(*running, on_change=on_change) if running else None
+
+    async def health_check(self):
+        """Ping every running server and restart the ones that do not answer."""
+        for name in list(self._tasks):
+            if self._get_lock(name).locked():
+                # starting or restarting right now
+                continue
+
+            try:
+                if not self._is_alive(name):
+                    raise RuntimeError("server process exited")
+                session = self._sessions[name]
+                await asyncio.wait_for(session.send_ping(), timeout=self.ping_timeout)
+            except Exception as e:
+                print(f"MCP server '{name}' failed health check ({e!r}), restarting")
+                try:
+                    await self.restart(name)
+                except Exception as e:
+                    print(f"MCP server '{name}' restart failed: {e}")
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.health_check()
+
+    def _ensure_health_check(self):
+        if self.health_interval and (self._health_task is None or self._health_task.done()):
+            self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        for task in (self._health_task, *self._revalidate_tasks):
+            if task is not None:
+                task.cancel()
+        self._health_task = None
+        self._revalidate_tasks.clear()
+        self._pending_revalidation.clear()
+
+        for name in list(self._tasks):
+            await self._stop(name)
+
+        self._tools.clear()
+
+
+# -------------------------
+# Shared Pool
+# -------------------------
+_pool = None
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = MCPSessionPool()
+    return _pool
+
+
+def configure(**kwargs):
+    """Replace the shared pool, e.g. configure(config=stub_servers) in benchmarks."""
+    global _pool
+    _pool = MCPSessionPool(**kwargs)
+    return _pool
+
+
+async def get_tools(*server_names):
+    return await get_pool().get_tools(*server_names)
+
+
+async def close():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
@@ -0,0 +1,168 @@
+"""
+Minimal Prometheus metrics (text exposition format) without extra dependencies.
+
+Counters, histograms and callback gauges are kept in-process; `render()`
+returns the `/metrics` payload. With several workers each process reports
+its own values.
+
+Model names come from client requests, so only the models in METRICS_MODELS
+(comma-separated) get their own series; any other name is reported as "other".
+"""
+import bisect
+import os
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (100, 1000, 4000, 16000, 64000, 256000, 1000000)
+KNOWN_MODELS = frozenset(
+    m.strip()
+    for m in os.getenv("METRICS_MODELS", "gemini-2.5-flash,gemini-2.5-flash-lite,gemini-2.5-pro").split(",")
+    if m.strip()
+)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def lines(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            # per-bucket counts; values above the last bound only show up in +Inf (count)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def lines(self):
+        for labels, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_format_value(float(bound))}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            inf = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, inf)} {series[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(float(series[-2]))}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}"
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = ()
+
+    def lines(self):
+        yield f"{self.name} {_format_value(self.fn())}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        # re-registering a name (e.g. a module loaded twice) replaces it
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        out = []
+        for metric in self._metrics.values():
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help, labelnames=()):
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def histogram(name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name, help, fn):
+    return REGISTRY.register(Gauge(name, help, fn))
+
+
+def render():
+    return REGISTRY.render()
+
+
+def model_label(model):
+    """Bounded `model` label value: the name itself if known, else "other"."""
+    return model if model in KNOWN_MODELS else "other"
+
+
+# -------------------------
+# Agent Metrics
+# -------------------------
+TIME_TO_FIRST_TOKEN = histogram(
+    "agent_time_to_first_token_seconds", "Time from request start to the first streamed text token", ("model",)
+)
+RUN_SECONDS = histogram("agent_run_seconds", "Duration of a full agent run", ("model",))
+MODEL_CALL_SECONDS = histogram("agent_model_call_seconds", "Latency of a single model call", ("model",))
+MODEL_TOKENS = counter("agent_model_tokens_total", "Tokens reported by the model", ("model", "kind"))
+TOOL_CALL_SECONDS = histogram("agent_tool_call_seconds", "Latency of a single tool call", ("tool",))
+TOOL_RESULT_BYTES = histogram(
+    "agent_tool_result_bytes", "Size of tool results before post-processing", ("tool",), SIZE_BUCKETS
+)
+TOOL_ERRORS = counter("agent_tool_errors_total", "Tool calls that raised or returned an error", ("tool",))
+QUEUE_WAIT_SECONDS = histogram("agent_queue_wait_seconds", "Time a run waited for an admission slot")
+SEMANTIC_CACHE_LOOKUPS = counter(
+    "agent_semantic_cache_lookups_total", "Semantic cache lookups by result (hit, miss, error)", ("result",)
+)
@@ -59,7 +59,13 @@ FILE LOCATIONS:
 WORKFLOW - Follow these steps in order:
 1. Search for data files using glob_search (for LOCAL file discovery only)
 2. Upload file using upload_file (transfers from local to sandbox)
-3. ANALYZE THE DATASET FIRST - Use run_python_code to:
+   - For CSV/Excel files the result includes a DATASET PROFILE: shape, columns, dtypes,
+     null counts, ranges/means, top values and sample rows for every sheet.
+   - If a "fast copy" Parquet path is listed, load it with pd.read_parquet (much faster)
+   - The result lists the DataFrame variables the file was loaded into (e.g. titanic).
+     Use them directly; they persist between run_python_code calls in this conversation
+3. ANALYZE THE DATASET FIRST - Skip this step if upload_file returned a dataset profile.
+   Otherwise use run_python_code to:
    - Check file format (CSV, Excel, JSON, etc.)
    - For CSV/text files: Get shape, columns, data types, first few rows, null values
    - For Excel files: List all sheet names, then analyze each sheet separately
@@ -107,14 +113,17 @@ VISUALIZATION RULES:
 
 MULTI-STEP ANALYSIS:
 - Use run_python_code tool MULTIPLE times for complex analysis
-- Step 1: Always start with dataset info extraction
+- Step 1: Start from the dataset profile (or extract dataset info if there is none)
 - Step 2: Perform specific analysis based on user query
 - Step 3: Create visualization if requested
 - Each step should be a separate tool call with focused code
+- Variables persist between calls: reuse DataFrames and results from earlier steps instead of re-reading files
+- Every result ends with a "Variables" line listing what is in memory; if a dataset was evicted,
+  reload it with load_dataset('<name>')
 
 CRITICAL RULES:
 - You MUST call the appropriate tool for each step - do not just think, ACT by calling tools
-- NEVER skip the dataset exploration step
+- NEVER skip the dataset exploration step when no dataset profile was returned
 - Use run_python_code multiple times rather than one large code block
 - All file paths in code must use '/home/user/data/' prefix"""
 
@@ -149,6 +158,7 @@ def get_daily_briefing_prompt():
             - Read today's calendar events from Google Calendar
             - Summarize unread emails from Gmail
             - Show top news headlines using web_search and yahoo finance news
+            - These lookups are independent: request weather, calendar, Gmail and news tools together in one step so they run in parallel
             - Present information in a clear, organized format"""
 
 # -------------------------
@@ -0,0 +1,143 @@
+"""
+Content-addressed file uploads into a sandbox session.
+
+- Each upload is keyed by the SHA-256 of the file. Local digests are cached
+  by (size, mtime), so an unchanged file is not re-hashed.
+- The session keeps a manifest of what it already holds (`session.files`,
+  sandbox path -> (sha256, absolute path)); a recycled sandbox starts empty.
+  A file is skipped when it is already there, and copied inside the sandbox
+  when the same content exists under another name.
+- Large files are streamed in `chunk_size` parts instead of being read into
+  memory at once, optionally zlib-compressed in transit. The parts are
+  reassembled and checked against the digest inside the sandbox.
+"""
+import hashlib
+import os
+import threading
+import zlib
+
+CHUNK_SIZE = 8 * 1024 * 1024
+COMPRESS_MIN_BYTES = 1024 * 1024
+# already compressed; zlib would only cost time
+COMPRESSED_SUFFIXES = {".xlsx", ".xls", ".parquet", ".zip", ".gz", ".bz2", ".xz", ".png", ".jpg", ".jpeg", ".pdf"}
+
+_digests = {}  # abspath -> (size, mtime_ns, sha256)
+_digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    """SHA-256 of a local file, cached until its size or mtime changes."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    with _digests_lock:
+        cached = _digests.get(path)
+    if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+        return cached[2]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+# runs inside the sandbox; joins (and inflates) the parts, then verifies the digest
+_ASSEMBLE_CODE = """
+import hashlib as _hashlib, os as _os, zlib as _zlib
+def _assemble(target, sources, compressed, digest, remove_sources):
+    _os.makedirs(_os.path.dirname(target) or ".", exist_ok=True)
+    h = _hashlib.sha256()
+    inflate = _zlib.decompressobj() if compressed else None
+    with open(target + ".tmp", "wb") as out:
+        for source in sources:
+            with open(source, "rb") as f:
+                data = f.read()
+            if inflate:
+                data = inflate.decompress(data)
+            h.update(data)
+            out.write(data)
+        if inflate:
+            data = inflate.flush()
+            h.update(data)
+            out.write(data)
+    if h.hexdigest() != digest:
+        _os.remove(target + ".tmp")
+        raise ValueError(f"checksum mismatch for {target}")
+    _os.replace(target + ".tmp", target)
+    if remove_sources:
+        for source in sources:
+            _os.remove(source)
+_assemble(%r, %r, %r, %r, %r)
+"""
+
+
+def _run(sandbox, code):
+    execution = sandbox.run_code(code)
+    if execution.error:
+        raise RuntimeError(f"{execution.error.name}: {execution.error.value}")
+
+
+def _write_parts(sandbox, local_path, sandbox_path, chunk_size, compress):
+    """Stream the file as numbered parts; returns their sandbox paths."""
+    parts, buffer = [], bytearray()
+    deflate = zlib.compressobj(level=6) if compress else None
+
+    def flush():
+        info = sandbox.files.write(f"{sandbox_path}.part{len(parts):04d}", bytes(buffer))
+        parts.append(info.path)
+        buffer.clear()
+
+    with open(local_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            buffer += deflate.compress(block) if deflate else block
+            if len(buffer) >= chunk_size:
+                flush()
+    if deflate:
+        buffer += deflate.flush()
+    if buffer or not parts:
+        flush()
+    return parts
+
+
+def upload(session, local_path, sandbox_path, chunk_size=CHUNK_SIZE, compress=True):
+    """Make `local_path` available at `sandbox_path` (relative to the sandbox home).
+
+    Returns (absolute sandbox path, how), where `how` is "cached", "copied"
+    or "uploaded".
+    """
+    digest = file_digest(local_path)
+    sandbox = session.sandbox
+
+    known = session.files.get(sandbox_path)
+    if known and known[0] == digest:
+        return known[1], "cached"
+
+    same_content = next((p for p, (d, _) in session.files.items() if d == digest), None)
+    size = os.path.getsize(local_path)
+    compress = (
+        compress
+        and size >= COMPRESS_MIN_BYTES
+        and os.path.splitext(local_path)[1].lower() not in COMPRESSED_SUFFIXES
+    )
+
+    if same_content is not None:
+        # same bytes under another name: copy inside the sandbox, nothing is transferred
+        source = session.files[same_content][1]
+        _run(sandbox, _ASSEMBLE_CODE % (sandbox_path, [source], False, digest, False))
+        target = source[: -len(same_content)] + sandbox_path
+        how = "copied"
+    elif size <= chunk_size and not compress:
+        with open(local_path, "rb") as f:
+            target = sandbox.files.write(sandbox_path, f).path
+        how = "uploaded"
+    else:
+        parts = _write_parts(sandbox, local_path, sandbox_path, chunk_size, compress)
+        target = parts[0][: -len(".part0000")]
+        _run(sandbox, _ASSEMBLE_CODE % (target, parts, compress, digest, True))
+        how = "uploaded"
+
+    session.files[sandbox_path] = (digest, target)
+    return target, how
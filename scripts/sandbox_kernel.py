@@ -0,0 +1,94 @@
+"""
+Python kernel for the local sandbox backend (see sandbox_pool.LocalBackend).
+
+Runs in its own process. Reads one JSON request per line on stdin and writes
+one JSON reply per line on the original stdout; user output is captured.
+Variables persist between requests, like a notebook kernel. Figures left open
+by the code are returned as base64 PNGs, and the value of a trailing
+expression is returned as text.
+
+    {"code": "..."}  ->  {"stdout": "...", "stderr": "...", "results": [...], "error": null}
+"""
+import ast
+import base64
+import contextlib
+import io
+import json
+import sys
+import traceback
+
+WARMUP_MODULES = ("pandas", "numpy", "matplotlib")
+
+
+def warm_up(namespace):
+    """Pre-import the usual analysis stack so the first execution is fast."""
+    for module in WARMUP_MODULES:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        namespace["plt"] = plt
+    except ImportError:
+        pass
+    try:
+        import pandas as pd
+
+        namespace["pd"] = pd
+    except ImportError:
+        pass
+
+
+def collect_figures():
+    plt = sys.modules.get("matplotlib.pyplot")
+    if plt is None:
+        return []
+    results = []
+    for num in plt.get_fignums():
+        buffer = io.BytesIO()
+        plt.figure(num).savefig(buffer, format="png", bbox_inches="tight")
+        results.append({"png": base64.b64encode(buffer.getvalue()).decode()})
+    plt.close("all")
+    return results
+
+
+def execute(code, namespace):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    results, error = [], None
+    with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+        try:
+            tree = ast.parse(code, mode="exec")
+            last = tree.body.pop() if tree.body and isinstance(tree.body[-1], ast.Expr) else None
+            exec(compile(tree, "<code>", "exec"), namespace)
+            value = None
+            if last is not None:
+                value = eval(compile(ast.Expression(last.value), "<code>", "eval"), namespace)
+            results.extend(collect_figures())
+            if value is not None:
+                results.append({"text": repr(value)})
+        except BaseException as e:  # noqa: BLE001 - report everything, including SystemExit
+            error = {"name": type(e).__name__, "value": str(e), "traceback": traceback.format_exc()}
+    return {"stdout": stdout.getvalue(), "stderr": stderr.getvalue(), "results": results, "error": error}
+
+
+def main():
+    protocol = sys.stdout
+    namespace = {"__name__": "__main__"}
+    warm_up(namespace)
+    protocol.write(json.dumps({"ready": True}) + "\n")
+    protocol.flush()
+
+    for line in sys.stdin:
+        request = json.loads(line)
+        reply = execute(request["code"], namespace)
+        protocol.write(json.dumps(reply, default=str) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
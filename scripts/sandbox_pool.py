@@ -0,0 +1,465 @@
+"""
+Sandbox pool for the code execution agent.
+
+Every thread_id gets its own sandbox session instead of all threads sharing
+one interpreter. A session is leased for the duration of a tool call (calls
+on the same thread run one at a time), keeps its variables between calls,
+is recycled after `max_executions` and reaped after `idle_timeout` seconds
+without use. `min_spares` sandboxes are booted in the background with
+pandas/matplotlib already imported, so a new thread does not pay start-up
+latency. E2B sandboxes expire `timeout` seconds after they were created or
+last renewed, so spares close to that age are replaced and sessions are
+renewed when leased past half of it.
+
+Backends:
+- E2BBackend: e2b_code_interpreter cloud sandboxes.
+- LocalBackend: one local Python process per sandbox (scripts/sandbox_kernel.py)
+  with the same `run_code` / `files.write` surface. It is not isolated; use it
+  for development, tests and benchmarks.
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from scripts import utils
+
+KERNEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_kernel.py")
+E2B_HOME = "/home/user"
+E2B_WARMUP_CODE = "import pandas as pd\nimport matplotlib.pyplot as plt"
+SPARE_EXPIRY_MARGIN = 60  # seconds; spares this close to expiring are replaced
+
+
+# -------------------------
+# Local Backend
+# -------------------------
+class ExecutionError:
+    def __init__(self, name, value, traceback=""):
+        self.name = name
+        self.value = value
+        self.traceback = traceback
+
+    def __repr__(self):
+        return f"ExecutionError(name={self.name!r}, value={self.value!r})"
+
+
+class Result:
+    def __init__(self, png=None, text=None):
+        self.png = png
+        self.text = text
+
+    def __repr__(self):
+        return f"Result({self.text})" if self.text is not None else "Result(<png>)"
+
+
+class Logs:
+    def __init__(self, stdout=(), stderr=()):
+        self.stdout = list(stdout)
+        self.stderr = list(stderr)
+
+    def __repr__(self):
+        return f"Logs(stdout: {self.stdout}, stderr: {self.stderr})"
+
+
+class Execution:
+    """Same fields as e2b's `Execution`: results, logs and error."""
+
+    def __init__(self, results=(), logs=None, error=None):
+        self.results = list(results)
+        self.logs = logs or Logs()
+        self.error = error
+
+    def __repr__(self):
+        return f"Execution(Results: {self.results}, Logs: {self.logs}, Error: {self.error})"
+
+
+class _WriteInfo:
+    def __init__(self, path):
+        self.path = path
+
+
+class _LocalFiles:
+    def __init__(self, sandbox):
+        self._sandbox = sandbox
+
+    def write(self, path, data):
+        """Write `data` (bytes, str or a binary file object) under the sandbox home."""
+        target = self._sandbox.resolve(path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            if hasattr(data, "read"):
+                shutil.copyfileobj(data, f)
+            else:
+                f.write(data.encode() if isinstance(data, str) else data)
+        return _WriteInfo(target)
+
+
+class LocalSandbox:
+    """A Python subprocess with a private home directory.
+
+    Paths under /home/user in code are mapped to the home directory, so code
+    written for E2B runs unchanged.
+    """
+
+    def __init__(self, home):
+        self.home = home
+        self.files = _LocalFiles(self)
+        self._lock = threading.Lock()
+        self._proc = subprocess.Popen(
+            [sys.executable, "-u", KERNEL_PATH],
+            cwd=home,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+        )
+        ready = self._proc.stdout.readline()
+        if not ready:
+            raise RuntimeError("sandbox kernel failed to start")
+
+    def resolve(self, path):
+        if path.startswith(E2B_HOME):
+            path = path[len(E2B_HOME):]
+        return os.path.join(self.home, path.lstrip("/\\"))
+
+    def is_running(self):
+        return self._proc.poll() is None
+
+    def run_code(self, code, timeout=None):
+        code = code.replace(E2B_HOME, self.home.replace("\\", "/"))
+        with self._lock:
+            if not self.is_running():
+                return Execution(error=ExecutionError("SandboxError", "sandbox is not running"))
+            # a stuck execution is ended by killing the kernel; the pool then replaces it
+            timed_out = threading.Event()
+            timer = None
+            if timeout:
+                timer = threading.Timer(timeout, lambda: (timed_out.set(), self._proc.kill()))
+                timer.start()
+            try:
+                self._proc.stdin.write(json.dumps({"code": code}) + "\n")
+                self._proc.stdin.flush()
+                line = self._proc.stdout.readline()
+            except OSError:
+                line = ""
+            finally:
+                if timer:
+                    timer.cancel()
+            if not line:
+                self._proc.wait()
+
+        if not line:
+            if timed_out.is_set():
+                return Execution(error=ExecutionError("TimeoutError", f"execution stopped after {timeout}s"))
+            return Execution(error=ExecutionError("SandboxError", "sandbox kernel exited"))
+        reply = json.loads(line)
+        error = ExecutionError(**reply["error"]) if reply["error"] else None
+        logs = Logs([reply["stdout"]] if reply["stdout"] else [], [reply["stderr"]] if reply["stderr"] else [])
+        return Execution([Result(**r) for r in reply["results"]], logs, error)
+
+    def kill(self):
+        if self.is_running():
+            self._proc.kill()
+        self._proc.wait()
+        for stream in (self._proc.stdin, self._proc.stdout):
+            stream.close()
+        shutil.rmtree(self.home, ignore_errors=True)
+
+
+class LocalBackend:
+    lifetime = None  # local kernels never expire
+    cheap_liveness = True  # is_running() is a local poll()
+
+    def __init__(self, root=None):
+        self.root = root or os.path.dirname(utils.get_cache_path("sandboxes", "x"))
+
+    def create(self):
+        return LocalSandbox(tempfile.mkdtemp(prefix="sbx-", dir=self.root))
+
+    def renew(self, sandbox):
+        pass
+
+    def kill(self, sandbox):
+        sandbox.kill()
+
+
+class E2BBackend:
+    cheap_liveness = False  # is_running() is a network round trip
+
+    def __init__(self, timeout=40 * 60, warmup_code=E2B_WARMUP_CODE):
+        self.timeout = timeout
+        self.lifetime = timeout
+        self.warmup_code = warmup_code
+
+    def create(self):
+        from e2b_code_interpreter import Sandbox
+
+        sandbox = Sandbox.create(timeout=self.timeout)
+        if self.warmup_code:
+            sandbox.run_code(self.warmup_code)
+        return sandbox
+
+    def renew(self, sandbox):
+        """Restart the sandbox's expiry clock."""
+        sandbox.set_timeout(self.timeout)
+
+    def kill(self, sandbox):
+        sandbox.kill()
+
+
+# -------------------------
+# Pool
+# -------------------------
+class Session:
+    def __init__(self, thread_id, sandbox):
+        self.thread_id = thread_id
+        self.sandbox = sandbox
+        self.lock = threading.Lock()
+        self.executions = 0
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.renewed_at = self.created_at
+        self.busy = False
+        self.failed = False  # set by callers after an execution error; triggers a liveness check
+        self.files = {}  # uploaded files, see sandbox_files.upload
+
+
+class SandboxPool:
+    def __init__(self, backend, min_spares=1, max_sessions=16, idle_timeout=600, max_executions=500,
+                 maintain_interval=5.0, window=1000):
+        self.backend = backend
+        self.min_spares = min_spares
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_executions = max_executions
+        self.maintain_interval = maintain_interval
+
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # thread_id -> Session, least recently used first
+        self._spares = deque()  # (created_at, sandbox)
+        self._wake = threading.Event()
+        self._closed = False
+        self._maintainer = None
+
+        self._session_waits = deque(maxlen=window)
+        self.counts = {"warm_starts": 0, "cold_starts": 0, "recycled": 0, "reaped": 0, "evicted": 0}
+
+    # -------------------------
+    # Spares and Reaping
+    # -------------------------
+    def start(self):
+        """Boot spares and start the background maintainer (replenish + reap)."""
+        if self._maintainer is None:
+            self._maintainer = threading.Thread(target=self._maintain, name="sandbox-pool", daemon=True)
+            self._maintainer.start()
+        return self
+
+    def _maintain(self):
+        while not self._closed:
+            try:
+                self.replenish()
+                self.reap()
+            except Exception as e:
+                print(f"Sandbox pool maintenance failed: {e}")
+            self._wake.wait(self.maintain_interval)
+            self._wake.clear()
+
+    def _spare_expired(self, created_at, now):
+        lifetime = getattr(self.backend, "lifetime", None)
+        return lifetime is not None and now - created_at > lifetime - SPARE_EXPIRY_MARGIN
+
+    def replenish(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [spare for spare in self._spares if self._spare_expired(spare[0], now)]
+            for spare in expired:
+                self._spares.remove(spare)
+        self._kill_all([sandbox for _, sandbox in expired])
+
+        while not self._closed and len(self._spares) < self.min_spares:
+            sandbox = self.backend.create()
+            with self._lock:
+                closed = self._closed
+                if not closed:
+                    self._spares.append((time.monotonic(), sandbox))
+            if closed:
+                self._kill_all([sandbox])
+
+    def reap(self):
+        """Kill sessions idle for longer than `idle_timeout`."""
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                s for s in self._sessions.values() if not s.busy and now - s.last_used > self.idle_timeout
+            ]
+            for session in idle:
+                del self._sessions[session.thread_id]
+        self.counts["reaped"] += len(idle)
+        self._kill_all([s.sandbox for s in idle])
+
+    def _kill_all(self, sandboxes):
+        for sandbox in sandboxes:
+            try:
+                self.backend.kill(sandbox)
+            except Exception as e:
+                print(f"Failed to kill sandbox: {e}")
+
+    # -------------------------
+    # Sessions
+    # -------------------------
+    def _new_sandbox(self):
+        now = time.monotonic()
+        sandbox, expired = None, []
+        with self._lock:
+            while self._spares and sandbox is None:
+                created_at, spare = self._spares.popleft()
+                if self._spare_expired(created_at, now):
+                    expired.append(spare)
+                else:
+                    sandbox = spare
+        if sandbox is not None:
+            try:
+                # a spare may have been waiting for a while; its session gets the full lifetime
+                self.backend.renew(sandbox)
+            except Exception as e:
+                print(f"Spare sandbox is gone, starting a new one: {e}")
+                expired.append(sandbox)
+                sandbox = None
+        self._kill_all(expired)
+        if sandbox is not None:
+            self.counts["warm_starts"] += 1
+        else:
+            self.counts["cold_starts"] += 1
+            sandbox = self.backend.create()
+        self._wake.set()  # top the spares back up
+        return sandbox
+
+    def _session(self, thread_id):
+        with self._lock:
+            session = self._sessions.get(thread_id)
+            if session is not None:
+                self._sessions.move_to_end(thread_id)
+                return session
+
+        start = time.perf_counter()
+        sandbox = self._new_sandbox()
+        self._session_waits.append(time.perf_counter() - start)
+
+        evicted = []
+        with self._lock:
+            session = self._sessions.get(thread_id)
+            if session is not None:
+                # another call on this thread won the race
+                self._spares.append((time.monotonic(), sandbox))
+                return session
+            session = self._sessions[thread_id] = Session(thread_id, sandbox)
+            # over the cap: drop the least recently used idle sessions
+            for other in list(self._sessions.values()):
+                if len(self._sessions) <= self.max_sessions:
+                    break
+                if other is not session and not other.busy:
+                    del self._sessions[other.thread_id]
+                    evicted.append(other.sandbox)
+        self.counts["evicted"] += len(evicted)
+        self._kill_all(evicted)
+        return session
+
+    @contextmanager
+    def lease(self, thread_id="default"):
+        """Hold `thread_id`'s session (creating it from a spare if needed) for the `with` body."""
+        while True:
+            session = self._session(thread_id)
+            session.lock.acquire()
+            if self._sessions.get(thread_id) is session:
+                break
+            # recycled or reaped while we waited for the lock
+            session.lock.release()
+
+        session.busy = True
+        session.failed = False
+        lifetime = getattr(self.backend, "lifetime", None)
+        if lifetime is not None and time.monotonic() - session.renewed_at > lifetime / 2:
+            try:
+                self.backend.renew(session.sandbox)
+                session.renewed_at = time.monotonic()
+            except Exception as e:
+                print(f"Failed to renew sandbox for {thread_id}: {e}")
+                session.failed = True
+        try:
+            yield session
+        except BaseException:
+            session.failed = True
+            raise
+        finally:
+            session.executions += 1
+            session.last_used = time.monotonic()
+            session.busy = False
+            # on E2B liveness is a network call, so it is only checked after a failure
+            check = session.failed or getattr(self.backend, "cheap_liveness", True)
+            recycle = session.executions >= self.max_executions or (check and not self._alive(session.sandbox))
+            if recycle:
+                with self._lock:
+                    if self._sessions.get(thread_id) is session:
+                        del self._sessions[thread_id]
+                self.counts["recycled"] += 1
+            session.lock.release()
+            if recycle:
+                self._kill_all([session.sandbox])
+
+    @staticmethod
+    def _alive(sandbox):
+        is_running = getattr(sandbox, "is_running", None)
+        return is_running() if callable(is_running) else True
+
+    def release(self, thread_id):
+        """End a thread's session (e.g. when the conversation is deleted)."""
+        with self._lock:
+            session = self._sessions.pop(thread_id, None)
+        if session is not None:
+            with session.lock:
+                self._kill_all([session.sandbox])
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            sandboxes = [s.sandbox for s in self._sessions.values()] + [sandbox for _, sandbox in self._spares]
+            self._sessions.clear()
+            self._spares.clear()
+        self._wake.set()
+        self._kill_all(sandboxes)
+
+    def stats(self):
+        waits = sorted(self._session_waits)
+        new_session = {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        if waits:
+            new_session = {
+                "p50": statistics.median(waits),
+                "p95": waits[min(int(len(waits) * 0.95), len(waits) - 1)],
+                "max": waits[-1],
+            }
+        return {
+            "sessions": len(self._sessions),
+            "busy": sum(1 for s in self._sessions.values() if s.busy),
+            "spares": len(self._spares),
+            **self.counts,
+            "new_session_seconds": {k: round(v, 4) for k, v in new_session.items()},
+        }
+
+
+def from_env():
+    """SandboxPool configured from SANDBOX_* variables (backend e2b by default)."""
+    kind = os.getenv("SANDBOX_BACKEND", "e2b")
+    backend = LocalBackend() if kind == "local" else E2BBackend(timeout=int(os.getenv("SANDBOX_TIMEOUT", "2400")))
+    return SandboxPool(
+        backend,
+        min_spares=int(os.getenv("SANDBOX_MIN_SPARES", "1")),
+        max_sessions=int(os.getenv("SANDBOX_MAX_SESSIONS", "16")),
+        idle_timeout=int(os.getenv("SANDBOX_IDLE_TIMEOUT", "600")),
+    )
@@ -0,0 +1,215 @@
+"""
+Persistent per-thread kernel state for `run_python_code`.
+
+The sandbox kernel already keeps variables between calls; this module makes
+that usable by the agent:
+
+- Uploaded datasets are loaded once into named DataFrames (`titanic`,
+  `imdb_movie_data`, `sales_2024_orders` for sales/2024/orders.csv, ...),
+  from the Parquet copy when there is one, so later steps do not re-parse the
+  file. Names are kept per sandbox path: another file that maps to a taken
+  name gets a suffix (`orders_2`) instead of replacing it.
+  `load_dataset(name)` reloads one after it was evicted or overwritten.
+- After every execution the tool reports the variables in the namespace with
+  their memory footprint, so the model knows what it can reuse.
+- When tracked objects exceed `memory_limit_mb`, the large objects the code
+  has not referenced for the longest time are deleted from the namespace.
+
+All of it runs inside the sandbox as plain Python, so it works with both the
+E2B and the local backend.
+"""
+import ast
+import json
+import os
+import re
+
+MEMORY_LIMIT_MB = int(os.getenv("SANDBOX_MEMORY_LIMIT_MB", "512"))
+EVICTABLE_BYTES = 1024 * 1024  # smaller objects are never evicted
+REPORTED_VARIABLES = 10
+
+# defines the helpers once per kernel; safe to prepend to every call
+_STATE_CODE = '''
+if "_agent_state" not in globals():
+    import gc as _gc, json as _json, sys as _sys, types as _types
+    _agent_state = {"clock": 0, "touched": {}, "datasets": {}, "names": {}, "versions": {}}
+    _AGENT_HIDDEN = {"In", "Out", "exit", "quit", "get_ipython"}
+
+    def _agent_sizeof(value):
+        try:
+            if hasattr(value, "memory_usage"):
+                usage = value.memory_usage(index=True, deep=True)
+                return int(usage.sum() if hasattr(usage, "sum") else usage)
+            if hasattr(value, "nbytes"):
+                return int(value.nbytes)
+            if isinstance(value, dict):
+                return _sys.getsizeof(value) + sum(_agent_sizeof(v) for v in value.values())
+            if isinstance(value, (list, tuple)):
+                return _sys.getsizeof(value) + sum(_sys.getsizeof(v) for v in value)
+        except Exception:
+            pass
+        return _sys.getsizeof(value)
+
+    def load_dataset(name):
+        """(Re)load an uploaded dataset into the variable `name` and return it."""
+        import pandas as pd
+        path, parquet, sheet = _agent_state["datasets"][name]
+        df = None
+        if parquet:
+            try:
+                df = pd.read_parquet(parquet)
+            except Exception:
+                df = None
+        if df is None:
+            if path.lower().endswith((".xlsx", ".xls")):
+                df = pd.read_excel(path, sheet_name=sheet)
+            else:
+                df = pd.read_csv(path, sep="\\t" if path.lower().endswith(".tsv") else ",")
+        globals()[name] = df
+        _agent_state["clock"] += 1
+        _agent_state["touched"][name] = _agent_state["clock"]
+        return df
+
+    def _agent_register(name, path, parquet, sheet, version):
+        # one variable per (sandbox path, sheet); a taken name gets a suffix
+        known_name = _agent_state["names"].get((path, sheet))
+        if known_name is None:
+            base, n = name, 1
+            while name in _agent_state["datasets"]:
+                n += 1
+                name = f"{base}_{n}"
+            _agent_state["names"][(path, sheet)] = name
+        else:
+            name = known_name
+        known = (_agent_state["datasets"].get(name), _agent_state["versions"].get(name))
+        _agent_state["datasets"][name] = (path, parquet, sheet)
+        _agent_state["versions"][name] = version
+        if known != ((path, parquet, sheet), version) or name not in globals():
+            load_dataset(name)
+        df = globals()[name]
+        print(_json.dumps({"name": name, "shape": list(df.shape)}))
+
+    def _agent_drop(value):
+        # IPython output history keeps its own references
+        out = globals().get("Out")
+        if isinstance(out, dict):
+            for key in [k for k, v in out.items() if v is value]:
+                del out[key]
+        for name in ("_", "__", "___"):
+            if globals().get(name) is value:
+                globals()[name] = None
+
+    def _agent_inspect(referenced, limit):
+        _agent_state["clock"] += 1
+        clock = _agent_state["clock"]
+        for name in referenced:
+            _agent_state["touched"][name] = clock
+        variables = []
+        for name, value in list(globals().items()):
+            if name.startswith("_") or name in _AGENT_HIDDEN:
+                continue
+            if isinstance(value, _types.ModuleType) or callable(value):
+                continue
+            entry = {"name": name, "type": type(value).__name__, "bytes": _agent_sizeof(value)}
+            if hasattr(value, "shape"):
+                entry["shape"] = list(getattr(value, "shape", ()) or ())
+            variables.append(entry)
+
+        total = sum(v["bytes"] for v in variables)
+        evicted = []
+        if total > limit:
+            candidates = sorted(
+                (v for v in variables if v["bytes"] >= %d and _agent_state["touched"].get(v["name"], 0) < clock),
+                key=lambda v: (_agent_state["touched"].get(v["name"], 0), -v["bytes"]),
+            )
+            for v in candidates:
+                if total <= limit:
+                    break
+                _agent_drop(globals().pop(v["name"]))
+                _agent_state["touched"].pop(v["name"], None)
+                total -= v["bytes"]
+                evicted.append(v)
+            if evicted:
+                _gc.collect()
+        kept = [v for v in variables if v not in evicted]
+        kept.sort(key=lambda v: -v["bytes"])
+        print(_json.dumps({
+            "total": total, "limit": limit, "count": len(kept), "variables": kept[:%d],
+            "evicted": evicted, "datasets": sorted(_agent_state["datasets"]),
+        }))
+''' % (EVICTABLE_BYTES, REPORTED_VARIABLES)
+
+
+def dataset_name(file_name, sheet=None):
+    """Python identifier for a dataset: "IMDB-Movie-Data.csv" -> "imdb_movie_data", "sub/big.csv" -> "sub_big"."""
+    stem = os.path.splitext(file_name.replace("\\", "/").strip("/"))[0]
+    if sheet:
+        stem = f"{stem}_{sheet}"
+    name = re.sub(r"\W+", "_", stem.casefold()).strip("_") or "dataset"
+    return f"df_{name}" if name[0].isdigit() else name
+
+
+def referenced_names(code):
+    """Names the code reads or assigns; they count as recently used."""
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return []
+    return sorted({node.id for node in ast.walk(tree) if isinstance(node, ast.Name)})
+
+
+def _last_json(execution):
+    for line in reversed("".join(execution.logs.stdout).splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    return None
+
+
+def register_dataset(sandbox, name, path, parquet_path=None, sheet=None, version=None):
+    """Load a file in the sandbox into a DataFrame variable; returns (variable name, shape) or None.
+
+    `name` is the preferred variable name; it gets a suffix when another file
+    already uses it. `version` (e.g. the file digest) forces a reload when it changes.
+    """
+    execution = sandbox.run_code(
+        _STATE_CODE + f"\n_agent_register({name!r}, {path!r}, {parquet_path!r}, {sheet!r}, {version!r})"
+    )
+    if execution.error:
+        print(f"Loading {name} failed: {execution.error.name}: {execution.error.value}")
+        return None
+    report = _last_json(execution)
+    return (report["name"], report["shape"]) if report else None
+
+
+def inspect(sandbox, code, memory_limit_mb=MEMORY_LIMIT_MB):
+    """Report the namespace after `code` ran, evicting large stale objects over the limit."""
+    execution = sandbox.run_code(
+        _STATE_CODE + f"\n_agent_inspect({referenced_names(code)!r}, {int(memory_limit_mb * 1024 * 1024)})"
+    )
+    if execution.error:
+        return None
+    return _last_json(execution)
+
+
+def _mb(n):
+    return f"{n / (1024 * 1024):.1f} MB"
+
+
+def render(report):
+    """One or two lines for the model, e.g. "Variables (2.1 MB of 512.0 MB): titanic DataFrame 891x12 0.3 MB"."""
+    if not report:
+        return ""
+    items = []
+    for v in report["variables"]:
+        shape = "x".join(str(d) for d in v["shape"]) if v.get("shape") else ""
+        items.append(" ".join(p for p in (v["name"], v["type"], shape, _mb(v["bytes"])) if p))
+    more = report["count"] - len(report["variables"])
+    if more > 0:
+        items.append(f"+{more} more")
+    lines = [f"Variables ({_mb(report['total'])} of {_mb(report['limit'])}): " + (", ".join(items) or "none")]
+    if report["evicted"]:
+        evicted = ", ".join(f"{v['name']} ({_mb(v['bytes'])})" for v in report["evicted"])
+        lines.append(
+            f"Evicted to stay under the memory limit: {evicted}. "
+            "Recreate them if needed; uploaded datasets reload with load_dataset('<name>')."
+        )
+    return "\n".join(lines)
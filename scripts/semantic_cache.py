@@ -0,0 +1,334 @@
+"""
+Semantic response cache for repeated (paraphrased) questions.
+
+A stateless question is embedded and compared against earlier questions in
+the same namespace (model + user). Above `threshold` cosine similarity the
+stored answer is streamed back without calling the model or any tool.
+
+- Embedders are pluggable: anything with `async embed(texts) -> vectors`.
+  `OllamaEmbedder` uses a local Ollama model, `LangChainEmbedder` wraps any
+  LangChain `Embeddings`, and `HashingEmbedder` needs no model at all (it
+  only catches near-identical wording; use it for tests and benchmarks).
+- The index is brute-force NumPy cosine search, one matrix per namespace,
+  which stays well under a millisecond for a few thousand entries.
+- An answer lives for the shortest TTL among the tool categories it used
+  (weather 10 min, stock prices 1 min, ...); answers without tools live longest.
+- Invalidation: runs that call a write tool (create-event, update_cells,
+  INSERT/UPDATE SQL, ...) are not stored and drop cached answers in that
+  category; runs with tool errors are not stored; `invalidate()` clears by
+  category or namespace (the servers call it when MCP tool schemas change).
+
+Enable in the stream servers with SEMANTIC_CACHE=1; pick the embedder with
+SEMANTIC_CACHE_EMBEDDER=ollama:<model>|hashing and the cut-off with
+SEMANTIC_CACHE_THRESHOLD.
+"""
+import os
+import re
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from langchain.messages import AIMessage, AIMessageChunk, ToolMessage
+
+from scripts import metrics
+
+TOOL_CATEGORIES = {
+    "get_weather": "weather",
+    "web_search": "news",
+    "get_stock_info": "finance",
+    "search_emails": "email",
+    "read_email": "email",
+    "list-events": "calendar",
+    "create-event": "calendar",
+    "update-event": "calendar",
+    "delete-event": "calendar",
+    "list_spreadsheets": "sheets",
+    "get_sheet_data": "sheets",
+    "update_cells": "sheets",
+    "mysql_query": "sql",
+}
+
+# seconds; "general" is an answer that used no tools, "tool" any unlisted tool
+CATEGORY_TTLS = {
+    "general": 3600,
+    "tool": 300,
+    "weather": 600,
+    "news": 300,
+    "finance": 60,
+    "email": 120,
+    "calendar": 300,
+    "sheets": 300,
+    "sql": 600,
+}
+
+WRITE_TOOLS = {
+    "create-event", "update-event", "delete-event",
+    "update_cells", "batch_update_cells", "add_rows",
+    "send_email", "draft_email", "modify_email", "delete_email",
+}
+_WRITE_SQL = re.compile(r"\b(insert|update|delete|replace|merge|create|alter|drop|truncate|grant)\b", re.I)
+
+REPLAY_CHUNK_CHARS = 256
+
+
+def normalize_query(text):
+    return " ".join(text.split()).casefold()
+
+
+# -------------------------
+# Embedders
+# -------------------------
+class HashingEmbedder:
+    """Hashed word, word-pair and character-trigram features; no model needed."""
+
+    def __init__(self, dim=1024):
+        self.dim = dim
+
+    def _features(self, text):
+        words = re.findall(r"\w+", text.casefold())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f" {word} "
+            features.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+        return features
+
+    async def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vectors
+
+
+class OllamaEmbedder:
+    """Embeddings from a local Ollama model, e.g. `ollama pull nomic-embed-text`."""
+
+    def __init__(self, model="nomic-embed-text", host=None):
+        import ollama
+
+        self.model = model
+        self._client = ollama.AsyncClient(host=host)
+
+    async def embed(self, texts):
+        response = await self._client.embed(model=self.model, input=list(texts))
+        return np.asarray(response.embeddings, dtype=np.float32)
+
+
+class LangChainEmbedder:
+    """Adapter for any LangChain `Embeddings` (OpenAI, Google, HuggingFace, ...)."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    async def embed(self, texts):
+        return np.asarray(await self.embeddings.aembed_documents(list(texts)), dtype=np.float32)
+
+
+def get_embedder(spec="ollama:nomic-embed-text"):
+    """Embedder from a spec string: "hashing" or "ollama:<model>"."""
+    kind, _, model = spec.partition(":")
+    if kind == "hashing":
+        return HashingEmbedder()
+    if kind == "ollama":
+        return OllamaEmbedder(model or "nomic-embed-text")
+    raise ValueError(f"Unknown embedder '{spec}' (use 'hashing' or 'ollama:<model>')")
+
+
+# -------------------------
+# Vector Index
+# -------------------------
+class VectorIndex:
+    """Brute-force cosine search over unit vectors kept in one NumPy matrix."""
+
+    def __init__(self, capacity=64):
+        self._matrix = None
+        self._capacity = capacity
+        self._keys = []
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, vector):
+        if self._matrix is None:
+            self._matrix = np.zeros((self._capacity, vector.shape[0]), dtype=np.float32)
+        elif len(self._keys) == self._matrix.shape[0]:
+            self._matrix = np.vstack([self._matrix, np.zeros_like(self._matrix)])
+        row = len(self._keys)
+        self._matrix[row] = vector
+        self._keys.append(key)
+        self._rows[key] = row
+
+    def remove(self, key):
+        # move the last row into the hole so the matrix stays dense
+        row = self._rows.pop(key)
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._matrix[row] = self._matrix[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+        self._keys.pop()
+
+    def search(self, vector):
+        """Return (key, score) of the nearest vector, or (None, -1.0) when empty."""
+        if not self._keys:
+            return None, -1.0
+        scores = self._matrix[: len(self._keys)] @ vector
+        row = int(np.argmax(scores))
+        return self._keys[row], float(scores[row])
+
+
+# -------------------------
+# Semantic Cache
+# -------------------------
+class _Entry:
+    def __init__(self, namespace, query, answer, categories, expires_at):
+        self.namespace = namespace
+        self.query = query
+        self.answer = answer
+        self.categories = categories
+        self.expires_at = expires_at
+
+
+class SemanticCache:
+    def __init__(self, embedder=None, threshold=0.9, max_entries=2048, ttls=None, categories=None):
+        self.embedder = embedder or HashingEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttls = {**CATEGORY_TTLS, **(ttls or {})}
+        self.categories = {**TOOL_CATEGORIES, **(categories or {})}
+
+        self._entries = OrderedDict()  # key -> _Entry, oldest first
+        self._indexes = {}  # namespace -> VectorIndex
+        self.stats = {"hits": 0, "misses": 0, "stored": 0, "skipped": 0, "invalidated": 0, "errors": 0}
+
+    def category_for(self, tool_name):
+        return self.categories.get(tool_name, "tool")
+
+    def is_write(self, tool_name, args):
+        if tool_name in WRITE_TOOLS:
+            return True
+        return self.category_for(tool_name) == "sql" and bool(_WRITE_SQL.search(args or ""))
+
+    async def _embed(self, text):
+        vector = (await self.embedder.embed([normalize_query(text)]))[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        index = self._indexes[entry.namespace]
+        index.remove(key)
+        if not len(index):
+            del self._indexes[entry.namespace]
+
+    async def lookup(self, query, namespace):
+        """Return (entry or None, query vector). The vector is None if embedding failed."""
+        try:
+            vector = await self._embed(query)
+        except Exception as e:
+            # the cache must never take the agent down; treat as a miss
+            print(f"Semantic cache embedding failed: {e}")
+            self.stats["errors"] += 1
+            metrics.SEMANTIC_CACHE_LOOKUPS.inc("error")
+            return None, None
+
+        index = self._indexes.get(namespace)
+        key, score = index.search(vector) if index is not None else (None, -1.0)
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at < time.time():
+            self._remove(key)
+            entry = None
+        if entry is None or score < self.threshold:
+            self.stats["misses"] += 1
+            metrics.SEMANTIC_CACHE_LOOKUPS.inc("miss")
+            return None, vector
+
+        self.stats["hits"] += 1
+        metrics.SEMANTIC_CACHE_LOOKUPS.inc("hit")
+        return entry, vector
+
+    def store(self, query, namespace, vector, answer, tools_used):
+        categories = {self.category_for(name) for name in tools_used} or {"general"}
+        ttl = min(self.ttls.get(category, self.ttls["tool"]) for category in categories)
+
+        key = uuid.uuid4().hex
+        self._entries[key] = _Entry(namespace, query, answer, categories, time.time() + ttl)
+        self._indexes.setdefault(namespace, VectorIndex()).add(key, vector)
+        self.stats["stored"] += 1
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, category=None, namespace=None):
+        """Drop entries in `category` and/or `namespace` (everything when both are None)."""
+        keys = [
+            key for key, entry in self._entries.items()
+            if (category is None or category in entry.categories)
+            and (namespace is None or entry.namespace == namespace)
+        ]
+        for key in keys:
+            self._remove(key)
+        self.stats["invalidated"] += len(keys)
+        return len(keys)
+
+    async def replay(self, entry):
+        """Stream a cached answer as (message, metadata) pairs, like `astream(stream_mode="messages")`."""
+        message_id = f"cached-{uuid.uuid4().hex[:12]}"
+        metadata = {"langgraph_node": "model", "semantic_cache": True}
+        for start in range(0, len(entry.answer), REPLAY_CHUNK_CHARS):
+            chunk = entry.answer[start:start + REPLAY_CHUNK_CHARS]
+            yield AIMessageChunk(content=chunk, id=message_id), metadata
+
+    async def record(self, stream, query, namespace, vector):
+        """Pass a live `astream(stream_mode="messages")` through and store its final answer."""
+        answer = []
+        tools_used = set()
+        call_args = {}  # (message id, index) -> [tool name, args text]
+        failed = False
+
+        async for message, metadata in stream:
+            if isinstance(message, ToolMessage):
+                tools_used.add(message.name)
+                failed = failed or message.status == "error"
+                # the answer is the text after the last tool result
+                answer = []
+            elif isinstance(message, AIMessage):
+                if message.text:
+                    answer.append(message.text)
+                chunks = message.tool_call_chunks if isinstance(message, AIMessageChunk) else [
+                    {"name": tc["name"], "args": str(tc["args"]), "index": idx}
+                    for idx, tc in enumerate(message.tool_calls)
+                ]
+                for tc in chunks:
+                    call = call_args.setdefault((message.id, tc.get("index")), [None, ""])
+                    call[0] = call[0] or tc.get("name")
+                    call[1] += tc.get("args") or ""
+            yield message, metadata
+
+        # only reached when the run completed
+        writes = {self.category_for(name) for name, args in call_args.values() if self.is_write(name, args)}
+        for category in writes:
+            self.invalidate(category=category)
+        answer = "".join(answer)
+        if writes or failed or not answer.strip():
+            self.stats["skipped"] += 1
+            return
+        self.store(query, namespace, vector, answer, tools_used)
+
+    def get_stats(self):
+        return {"entries": len(self._entries), "namespaces": len(self._indexes), **self.stats}
+
+
+def from_env():
+    """SemanticCache configured from SEMANTIC_CACHE_* variables, or None when disabled."""
+    if os.getenv("SEMANTIC_CACHE", "0") != "1":
+        return None
+    return SemanticCache(
+        embedder=get_embedder(os.getenv("SEMANTIC_CACHE_EMBEDDER", "ollama:nomic-embed-text")),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048")),
+    )
@@ -0,0 +1,533 @@
+"""
+Local SQL layer for the MySQL/TiDB assistant.
+
+- SchemaCache: introspects the database once (a single information_schema
+  query through the MCP SQL tool), keeps it on disk for SQL_SCHEMA_TTL and
+  renders a compact table/column list for the system prompt, so the model
+  does not rediscover the schema with SHOW TABLES/DESCRIBE every conversation.
+- SQLCacheMiddleware: read-only queries are normalized (comments, whitespace,
+  keyword case) and answered from an LRU with a TTL. Identical queries in
+  flight share one call, and any write clears the cache.
+- SQLiteReplica: optional local copy of hot tables, seeded table by table
+  like upload_mysql_db.ipynb (from the Olist SQLite file or MySQL) with the
+  source's column types and case-insensitive text. SQLite still differs
+  from MySQL (implicit casts, collations, functions), so the replica only
+  answers query shapes (the SQL with literals removed) whose results matched
+  the server's REPLICA_VERIFICATIONS times; one mismatch or SQLite error
+  sends that shape to the server for good.
+"""
+import asyncio
+import datetime
+import decimal
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import ToolMessage
+
+from scripts import utils
+from scripts.tool_cache import MemoryBackend
+
+SQL_TOOLS = ("mysql_query",)
+REPLICA_VERIFICATIONS = 2
+READ_ONLY_STATEMENTS = {"select", "with", "show", "describe", "desc", "explain"}
+
+SCHEMA_QUERY = (
+    "SELECT table_name, column_name, data_type FROM information_schema.columns "
+    "WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position"
+)
+
+_QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.)*"|`[^`]*`)""")
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*|#[^\n]*", re.S)
+_WRITES = re.compile(
+    r"\b(insert|update|delete|replace|merge|create|alter|drop|truncate|grant|revoke|rename|lock|call|load)\b"
+    r"|\binto\s+(outfile|dumpfile)\b|\bfor\s+update\b"
+)
+_NONDETERMINISTIC = re.compile(
+    r"\b(rand|uuid|uuid_short|sysdate|now|curdate|curtime|unix_timestamp"
+    r"|last_insert_id|found_rows|row_count|connection_id)\s*\("
+    # these also work without parentheses
+    r"|\b(current_date|current_time|current_timestamp|localtime|localtimestamp|utc_date|utc_time|utc_timestamp)\b"
+)
+_TABLES = re.compile(r"\b(?:from|join)\s+([`\w.]+)")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+# -------------------------
+# SQL Helpers
+# -------------------------
+def normalize_sql(sql):
+    """Fold comments, whitespace and case outside quoted literals/identifiers."""
+    parts = _QUOTED.split(sql)
+    for idx in range(0, len(parts), 2):
+        parts[idx] = " ".join(_COMMENTS.sub(" ", parts[idx]).split()).casefold()
+    return " ".join(part for part in parts if part).strip().rstrip(";").strip()
+
+
+def _unquoted(normalized):
+    return " ".join(_QUOTED.split(normalized)[::2])
+
+
+def is_cacheable(normalized):
+    """One read-only, deterministic statement."""
+    code = _unquoted(normalized)
+    words = code.split(maxsplit=1)
+    return (
+        bool(words)
+        and words[0] in READ_ONLY_STATEMENTS
+        and ";" not in code
+        and not _WRITES.search(code)
+        and not _NONDETERMINISTIC.search(code)
+    )
+
+
+def referenced_tables(normalized):
+    """Table names after FROM/JOIN (subqueries and comma joins are not listed)."""
+    names = _TABLES.findall(_unquoted(normalized))
+    return {name.strip("`").split(".")[-1].strip("`") for name in names}
+
+
+def query_shape(normalized):
+    """The statement with string and number literals replaced by `?`."""
+    parts = _QUOTED.split(normalized)
+    for idx in range(0, len(parts), 2):
+        parts[idx] = _NUMBERS.sub("?", parts[idx])
+    # quoted parts: keep `identifiers`, replace 'strings' and "strings"
+    for idx in range(1, len(parts), 2):
+        if not parts[idx].startswith("`"):
+            parts[idx] = "?"
+    return "".join(parts)
+
+
+def _canonical(value):
+    if isinstance(value, bool):
+        value = int(value)
+    try:
+        return round(float(value), 6)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def rows_match(rows, other, ordered):
+    """Compare result sets by value (numbers as floats, everything else as text)."""
+    if not isinstance(rows, list) or not isinstance(other, list) or len(rows) != len(other):
+        return False
+    a = [tuple(_canonical(v) for v in row.values()) for row in rows if isinstance(row, dict)]
+    b = [tuple(_canonical(v) for v in row.values()) for row in other if isinstance(row, dict)]
+    if not ordered:
+        a, b = sorted(a, key=repr), sorted(b, key=repr)
+    return len(a) == len(rows) and a == b
+
+
+def sql_arg(args):
+    """(name, value) of the SQL argument in a tool call's args."""
+    for key in ("sql", "query"):
+        if isinstance(args.get(key), str):
+            return key, args[key]
+    return None, None
+
+
+def sql_param(sql_tool):
+    """Name of the SQL parameter in a tool's args schema ({name: JSON schema})."""
+    return next((key for key in ("sql", "query") if key in sql_tool.args), "sql")
+
+
+def tool_text(content):
+    """Text of a tool result, whether a string or a list of MCP content blocks."""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") if isinstance(block, dict) else str(block) for block in content)
+
+
+# -------------------------
+# Schema Cache
+# -------------------------
+class SchemaCache:
+    def __init__(self, server="tidb_ecommerce", ttl=86400, path=None):
+        self.ttl = ttl
+        self.path = path or utils.get_cache_path("sql_schema", f"{server}.json")
+        self.tables = {}  # table -> [(column, type)]
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - cached.get("fetched_at", 0) > self.ttl:
+            return None
+        return cached["tables"]
+
+    def _write(self, tables):
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": time.time(), "tables": tables}, f)
+        os.replace(tmp_path, self.path)
+
+    async def load(self, sql_tool, refresh=False):
+        """Tables and columns, from disk when fresh, otherwise from one query through `sql_tool`."""
+        cached = None if refresh else self._read()
+        if cached is not None:
+            self.tables = cached
+            return self.tables
+
+        rows = json.loads(tool_text(await sql_tool.ainvoke({sql_param(sql_tool): SCHEMA_QUERY})))
+        tables = {}
+        for row in rows:
+            row = {k.lower(): v for k, v in row.items()}
+            if "table_name" in row and "column_name" in row:
+                tables.setdefault(row["table_name"], []).append([row["column_name"], row.get("data_type")])
+        if not tables:
+            raise ValueError("schema query returned no columns")
+
+        self.tables = tables
+        self._write(tables)
+        return self.tables
+
+    def summary(self):
+        """Compact schema for the system prompt; empty when nothing is loaded."""
+        if not self.tables:
+            return ""
+        lines = [
+            f"- {table}({', '.join(f'{name} {kind}' if kind else name for name, kind in columns)})"
+            for table, columns in sorted(self.tables.items())
+        ]
+        return "Database schema (already known; no need to run SHOW TABLES or DESCRIBE):\n" + "\n".join(lines)
+
+
+# -------------------------
+# Local Replica
+# -------------------------
+class SQLiteReplica:
+    """Read-only local copy of some tables, queried instead of the remote server."""
+
+    def __init__(self, path=None):
+        self.path = path or utils.get_cache_path("sql_replica.sqlite")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.tables = self._list_tables(self._conn)
+        self.refreshed_at = None
+
+    @staticmethod
+    def _list_tables(conn):
+        rows = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        return {name for (name,) in rows}
+
+    @staticmethod
+    def _source_types(source, table):
+        """{column: declared type} from the source database."""
+        cur = source.cursor()
+        if isinstance(source, sqlite3.Connection):
+            cur.execute(f"PRAGMA table_info(`{table}`)")
+            return {row[1]: row[2] for row in cur.fetchall()}
+        cur.execute(
+            "SELECT column_name, column_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = %s",
+            (table,),
+        )
+        return {row[0]: row[1] for row in cur.fetchall()}
+
+    @staticmethod
+    def sqlite_type(declared):
+        """SQLite column definition for a MySQL/SQLite declared type."""
+        declared = (declared or "").casefold()
+        if "int" in declared or declared.startswith("bool"):
+            return "INTEGER"
+        if any(t in declared for t in ("dec", "numeric", "float", "double", "real")):
+            return "REAL"
+        if any(t in declared for t in ("blob", "binary")):
+            return "BLOB"
+        if any(t in declared for t in ("date", "time", "year")):
+            return "TEXT"
+        if any(t in declared for t in ("char", "text", "enum", "set", "json", "clob")):
+            # MySQL's default collations compare text case-insensitively
+            return "TEXT COLLATE NOCASE"
+        return ""
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, decimal.Decimal):
+            return float(value)
+        if isinstance(value, (datetime.date, datetime.time, datetime.timedelta)):
+            return str(value)
+        return value
+
+    def mirror(self, source, tables=None, batch_size=5000):
+        """Copy `tables` (default: all) from a DB-API connection (sqlite3 or pymysql).
+
+        Each table is loaded into a staging table and swapped in, so queries
+        keep seeing the previous copy until the new one is complete.
+        """
+        src = source.cursor()
+        if tables is None:
+            if isinstance(source, sqlite3.Connection):
+                src.execute("SELECT name FROM sqlite_master WHERE type='table'")
+            else:
+                src.execute("SHOW TABLES")
+            tables = [row[0] for row in src.fetchall()]
+
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            for table in tables:
+                types = self._source_types(source, table)
+                src.execute(f"SELECT * FROM `{table}`")
+                columns = [col[0] for col in src.description]
+                staging = f"{table}__staging"
+                conn.execute(f"DROP TABLE IF EXISTS `{staging}`")
+                definitions = ", ".join(f"`{c}` {self.sqlite_type(types.get(c))}".rstrip() for c in columns)
+                conn.execute(f"CREATE TABLE `{staging}` ({definitions})")
+                placeholders = ", ".join(["?"] * len(columns))
+                while rows := src.fetchmany(batch_size):
+                    rows = [tuple(self._value(v) for v in row) for row in rows]
+                    conn.executemany(f"INSERT INTO `{staging}` VALUES ({placeholders})", rows)
+                with conn:
+                    conn.execute(f"DROP TABLE IF EXISTS `{table}`")
+                    conn.execute(f"ALTER TABLE `{staging}` RENAME TO `{table}`")
+                print(f"Mirrored table: {table}")
+        finally:
+            conn.close()
+        self.tables = self._list_tables(self._conn)
+        self.refreshed_at = time.time()
+
+    def covers(self, tables):
+        # queries are normalized to lower case; SQLite names are case-insensitive
+        return bool(tables) and tables <= {table.casefold() for table in self.tables}
+
+    def query(self, sql):
+        with self._lock:
+            cur = self._conn.execute(sql)
+            columns = [col[0] for col in cur.description or ()]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def connect_source(spec):
+    """DB-API connection for a replica source: "sqlite:<path>" or "mysql".
+
+    "mysql" reads the same MYSQL_* variables as the MySQL MCP server in
+    mcp_config.json (MYSQL_HOST, MYSQL_PORT, MYSQL_USER, MYSQL_PASS, MYSQL_DB, MYSQL_SSL).
+    """
+    kind, _, path = spec.partition(":")
+    if kind == "sqlite":
+        return sqlite3.connect(path)
+    if kind == "mysql":
+        import pymysql
+
+        return pymysql.connect(
+            host=os.getenv("MYSQL_HOST"),
+            port=int(os.getenv("MYSQL_PORT", "4000")),
+            user=os.getenv("MYSQL_USER"),
+            password=os.getenv("MYSQL_PASS"),
+            database=os.getenv("MYSQL_DB", "ecommerce"),
+            ssl={"ssl": {}} if os.getenv("MYSQL_SSL", "true").lower() == "true" else None,
+        )
+    raise ValueError(f"Unknown replica source '{spec}' (use 'sqlite:<path>' or 'mysql')")
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class SQLCacheMiddleware(AgentMiddleware):
+    """Answer repeated read-only SQL tool calls from an LRU or a local replica."""
+
+    def __init__(self, sql_tools=SQL_TOOLS, ttl=300, max_entries=512, replica=None,
+                 verifications=REPLICA_VERIFICATIONS):
+        super().__init__()
+        self.sql_tools = set(sql_tools)
+        self.ttl = ttl
+        self.replica = replica
+        self.verifications = verifications
+        self.backend = MemoryBackend(max_entries=max_entries)
+        self.stats = {
+            "hits": 0, "misses": 0, "coalesced": 0, "uncached": 0,
+            "replica": 0, "replica_verified": 0, "replica_mismatches": 0,
+        }
+        self._inflight = {}
+        self._shapes = {}  # query shape -> matching checks so far, or -1 once it differed
+
+    def _prepare(self, request):
+        """(cache key, normalized SQL), or None when the call must go to the server as is."""
+        name = request.tool_call["name"]
+        if name not in self.sql_tools:
+            return None
+        sql = sql_arg(request.tool_call["args"])[1]
+        if sql is None:
+            return None
+        normalized = normalize_sql(sql)
+        if not is_cacheable(normalized):
+            self.stats["uncached"] += 1
+            if _WRITES.search(_unquoted(normalized)):
+                # the data changed under us
+                self.backend.clear()
+            return None
+        return f"{name}:{normalized}", normalized
+
+    def _hit(self, request, key):
+        item = self.backend.get(key)
+        if item is None:
+            return None
+        self.stats["hits"] += 1
+        return item[1].model_copy(update={"tool_call_id": request.tool_call["id"]})
+
+    def _replica_checks(self, normalized):
+        """Matching checks for this query's shape, or None when the replica must not be used."""
+        if self.replica is None or not self.replica.covers(referenced_tables(normalized)):
+            return None
+        checks = self._shapes.get(query_shape(normalized), 0)
+        return None if checks < 0 else checks
+
+    def _replica_rows(self, request, normalized):
+        try:
+            return self.replica.query(sql_arg(request.tool_call["args"])[1])
+        except sqlite3.Error:
+            # MySQL-only syntax or functions
+            self._shapes[query_shape(normalized)] = -1
+            return None
+
+    def _from_replica(self, request, normalized):
+        """Answer from the replica, only for shapes that already matched the server."""
+        checks = self._replica_checks(normalized)
+        if checks is None or checks < self.verifications:
+            return None
+        rows = self._replica_rows(request, normalized)
+        if rows is None:
+            return None
+        self.stats["replica"] += 1
+        return ToolMessage(
+            content=json.dumps(rows, indent=2, default=str),
+            tool_call_id=request.tool_call["id"],
+            name=request.tool_call["name"],
+        )
+
+    def _verify_replica(self, request, normalized, result):
+        """Compare a server answer with the replica's to decide whether the shape can be served locally."""
+        checks = self._replica_checks(normalized)
+        if checks is None or checks >= self.verifications:
+            return
+        if not isinstance(result, ToolMessage) or result.status == "error":
+            return
+        rows = self._replica_rows(request, normalized)
+        if rows is None:
+            return
+        try:
+            server_rows = json.loads(tool_text(result.content))
+        except ValueError:
+            server_rows = None
+        shape = query_shape(normalized)
+        if rows_match(rows, server_rows, ordered=" order by " in f" {_unquoted(normalized)} "):
+            self._shapes[shape] = self._shapes.get(shape, 0) + 1
+            self.stats["replica_verified"] += 1
+        else:
+            self._shapes[shape] = -1
+            self.stats["replica_mismatches"] += 1
+
+    def _store(self, key, result):
+        if isinstance(result, ToolMessage) and result.status != "error":
+            self.backend.set(key, result, self.ttl)
+
+    def wrap_tool_call(self, request, handler):
+        prepared = self._prepare(request)
+        if prepared is None:
+            return handler(request)
+        key, normalized = prepared
+
+        result = self._hit(request, key)
+        if result is not None:
+            return result
+        self.stats["misses"] += 1
+        result = self._from_replica(request, normalized)
+        if result is None:
+            result = handler(request)
+            self._verify_replica(request, normalized, result)
+        self._store(key, result)
+        return result
+
+    async def awrap_tool_call(self, request, handler):
+        prepared = self._prepare(request)
+        if prepared is None:
+            return await handler(request)
+        key, normalized = prepared
+
+        result = self._hit(request, key)
+        if result is not None:
+            return result
+
+        # single flight: identical queries in progress share the first caller's result
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            result = await asyncio.shield(future)
+            return result.model_copy(update={"tool_call_id": request.tool_call["id"]})
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.stats["misses"] += 1
+        try:
+            result = None
+            if self.replica is not None:
+                result = await asyncio.to_thread(self._from_replica, request, normalized)
+            if result is None:
+                result = await handler(request)
+                if self.replica is not None:
+                    await asyncio.to_thread(self._verify_replica, request, normalized, result)
+            self._store(key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        self.backend.clear()
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        if self.replica is not None:
+            stats["replica_tables"] = sorted(self.replica.tables)
+            stats["replica_shapes"] = {
+                "served": sum(1 for c in self._shapes.values() if c >= self.verifications),
+                "verifying": sum(1 for c in self._shapes.values() if 0 <= c < self.verifications),
+                "rejected": sum(1 for c in self._shapes.values() if c < 0),
+            }
+        return stats
+
+
+def replica_from_env():
+    """SQLiteReplica when SQL_REPLICA_SOURCE is set, else None. Seed it with `mirror_in_background`."""
+    if not os.getenv("SQL_REPLICA_SOURCE"):
+        return None
+    return SQLiteReplica(os.getenv("SQL_REPLICA_PATH"))
+
+
+async def mirror_in_background(replica, refresh_seconds=None):
+    """Seed `replica` from SQL_REPLICA_SOURCE/SQL_REPLICA_TABLES, then refresh every `refresh_seconds`."""
+    tables = [t.strip() for t in os.getenv("SQL_REPLICA_TABLES", "").split(",") if t.strip()] or None
+
+    def mirror():
+        source = connect_source(os.environ["SQL_REPLICA_SOURCE"])
+        try:
+            replica.mirror(source, tables)
+        finally:
+            source.close()
+
+    while True:
+        try:
+            await asyncio.to_thread(mirror)
+        except Exception as e:
+            print(f"SQL replica refresh failed: {e}")
+        if not refresh_seconds:
+            return
+        await asyncio.sleep(refresh_seconds)
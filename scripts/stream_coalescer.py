@@ -0,0 +1,92 @@
+"""
+Coalesce identical in-flight streaming requests into one agent run.
+
+The first request for a key starts the producer; later requests with the same
+key subscribe to it. Every chunk is buffered for the lifetime of the run, so
+late joiners replay from the start and then follow live. When the last
+subscriber disconnects the run is cancelled.
+"""
+import asyncio
+
+
+class _Run:
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def publish(self):
+        # wake everyone waiting on the current event, then arm a fresh one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class StreamCoalescer:
+    def __init__(self):
+        self._runs = {}
+        self.stats = {"runs": 0, "joined": 0}
+
+    async def _produce(self, key, run, stream):
+        try:
+            async for chunk in stream:
+                run.chunks.append(chunk)
+                run.publish()
+        except asyncio.CancelledError:
+            run.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            run.error = e
+        finally:
+            run.done = True
+            if self._runs.get(key) is run:
+                del self._runs[key]
+            run.publish()
+
+    async def subscribe(self, key, stream_factory, on_join=None):
+        """Yield the chunks of the run for `key`, starting one if needed.
+
+        `stream_factory()` must return an async iterator; it is only called
+        when no run for `key` is in flight. Otherwise `on_join()` is called,
+        e.g. to release capacity reserved for a run that will not start.
+        """
+        run = self._runs.get(key)
+        if run is None:
+            run = _Run()
+            self._runs[key] = run
+            run.task = asyncio.create_task(self._produce(key, run, stream_factory()))
+            self.stats["runs"] += 1
+        else:
+            self.stats["joined"] += 1
+            if on_join is not None:
+                on_join()
+        # do not keep the factory's captured state alive for the rest of the stream
+        stream_factory = None
+
+        run.subscribers += 1
+        idx = 0
+        try:
+            while True:
+                changed = run.changed
+                while idx < len(run.chunks):
+                    yield run.chunks[idx]
+                    idx += 1
+
+                if run.done:
+                    if run.error is not None:
+                        raise run.error
+                    return
+
+                await changed.wait()
+        finally:
+            run.subscribers -= 1
+            if run.subscribers == 0 and not run.done:
+                # nobody is listening any more; stop the agent run
+                if self._runs.get(key) is run:
+                    del self._runs[key]
+                run.task.cancel()
+
+    def in_flight(self):
+        return len(self._runs)
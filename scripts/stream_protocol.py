@@ -0,0 +1,188 @@
+"""
+Compact, batched NDJSON event stream for agent responses.
+
+`to_events` turns `agent.astream(stream_mode="messages")` output into small
+typed frames; `batch_frames` coalesces them over a time/size window and
+yields several NDJSON lines per write. Frames (one JSON object per line):
+
+    {"t": "text", "d": "<text delta>"}
+    {"t": "tool_start", "i": "<call id>", "n": "<tool name>"}
+    {"t": "tool_args", "i": "<call id>", "d": "<partial JSON args>"}
+    {"t": "tool_result", "i": "<call id>", "n": "<tool name>", "d": "<content>", "e": 1, "a": [...]}
+    {"t": "done", "u": {"input_tokens": .., "output_tokens": .., "total_tokens": ..}}
+
+"e" is only present when the tool failed and "a" only when the tool produced
+artifacts (chart handles, see scripts/artifacts.py); "done" carries "c": 1
+when the answer was replayed from the semantic cache. A run that fails ends with
+{"t": "error", "d": "<message>"} instead of "done". Uses orjson when installed.
+"""
+import asyncio
+import json
+import time
+
+from langchain.messages import AIMessage, AIMessageChunk, ToolMessage
+
+try:
+    import orjson
+
+    def dumps(obj):
+        return orjson.dumps(obj, default=str)
+
+except ImportError:
+    orjson = None
+
+    def dumps(obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str).encode()
+
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "total_tokens")
+
+
+# -------------------------
+# Events
+# -------------------------
+def artifact_handles(message):
+    """Artifact handles a tool attached to its ToolMessage (response_format="content_and_artifact")."""
+    artifact = getattr(message, "artifact", None)
+    if isinstance(artifact, dict):
+        return artifact.get("artifacts") or []
+    return []
+
+
+def _tool_call_chunks(message):
+    if isinstance(message, AIMessageChunk):
+        return message.tool_call_chunks
+    # a complete (non-streamed) message: send each call's args in one delta
+    return [
+        {"id": tc["id"], "name": tc["name"], "args": json.dumps(tc["args"]), "index": idx}
+        for idx, tc in enumerate(message.tool_calls)
+    ]
+
+
+async def to_events(stream):
+    """Typed frames from an `astream(stream_mode="messages")` iterator."""
+    usage = dict.fromkeys(USAGE_KEYS, 0)
+    call_ids = {}  # (message id, chunk index) -> tool call id
+    cached = False
+
+    async for message, metadata in stream:
+        cached = cached or bool(metadata.get("semantic_cache"))
+        if isinstance(message, ToolMessage):
+            frame = {"t": "tool_result", "i": message.tool_call_id, "n": message.name, "d": message.text}
+            if message.status == "error":
+                frame["e"] = 1
+            handles = artifact_handles(message)
+            if handles:
+                frame["a"] = handles
+            yield frame
+            continue
+
+        if not isinstance(message, AIMessage):
+            continue
+
+        if message.text:
+            yield {"t": "text", "d": message.text}
+
+        for tc in _tool_call_chunks(message):
+            index = tc.get("index")
+            key = (message.id, index if index is not None else tc.get("id"))
+            if tc.get("id") and key not in call_ids:
+                call_ids[key] = tc["id"]
+                yield {"t": "tool_start", "i": tc["id"], "n": tc.get("name")}
+            if tc.get("args"):
+                yield {"t": "tool_args", "i": call_ids.get(key, tc.get("id")), "d": tc["args"]}
+
+        if message.usage_metadata:
+            for k in USAGE_KEYS:
+                usage[k] += message.usage_metadata.get(k, 0)
+
+    done = {"t": "done", "u": usage}
+    if cached:
+        done["c"] = 1
+    yield done
+
+
+# -------------------------
+# Batching
+# -------------------------
+def _merge(pending, frame):
+    """Append a delta to the previous frame when both extend the same text or args."""
+    if pending and frame["t"] in ("text", "tool_args"):
+        last = pending[-1]
+        if last["t"] == frame["t"] and last.get("i") == frame.get("i"):
+            last["d"] += frame["d"]
+            return len(frame["d"].encode())
+    pending.append(dict(frame))
+    data = frame.get("d") or ""
+    return (len(data.encode()) if isinstance(data, str) else len(dumps(data))) + 16
+
+
+async def merge_frames(events, window=0.05, max_bytes=4096):
+    """Yield lists of frames, flushing every `window` seconds or `max_bytes` of payload.
+
+    Adjacent text (or same-call args) deltas are merged into one frame. With
+    `window=0` every frame is passed on as soon as it arrives.
+    """
+    queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for frame in events:
+                await queue.put(frame)
+            await queue.put(done)
+        except Exception as e:
+            await queue.put(e)
+
+    task = asyncio.create_task(pump())
+    pending, size, deadline = [], 0, None
+    try:
+        while True:
+            if pending and window:
+                try:
+                    item = await asyncio.wait_for(queue.get(), max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    item = None
+            else:
+                item = await queue.get()
+
+            if isinstance(item, Exception):
+                if pending:
+                    yield pending
+                raise item
+
+            if item is not None and item is not done:
+                if not pending:
+                    deadline = time.monotonic() + window
+                size += _merge(pending, item)
+                # tool boundaries and the final frame go out right away
+                if window and size < max_bytes and item["t"] in ("text", "tool_args"):
+                    if time.monotonic() < deadline:
+                        continue
+
+            if pending:
+                yield pending
+                pending, size = [], 0
+
+            if item is done:
+                return
+    finally:
+        task.cancel()
+
+
+async def batch_frames(events, window=0.05, max_bytes=4096):
+    """NDJSON bytes for `merge_frames` batches, one write per batch.
+
+    A failing run ends with an error frame instead of a truncated response.
+    """
+    try:
+        async for frames in merge_frames(events, window, max_bytes):
+            yield b"".join(dumps(frame) + b"\n" for frame in frames)
+    except Exception as e:
+        print(f"Event stream failed: {e!r}")
+        yield dumps({"t": "error", "d": str(e) or type(e).__name__}) + b"\n"
+
+
+def sse_event(seq, frame):
+    """Server-Sent Events message; `seq` is echoed back as Last-Event-ID on reconnect."""
+    return b"id: %d\nevent: %s\ndata: %s\n\n" % (seq, frame["t"].encode(), dumps(frame))
@@ -0,0 +1,323 @@
+"""
+Resumable agent runs for the SSE and WebSocket transports.
+
+Each run gets a stream id and executes in a background task that does not
+depend on any client connection. Its event frames are numbered and kept in a
+bounded ring buffer, so a client that drops can reconnect with the last
+sequence number it saw (SSE `Last-Event-ID`) and continue without re-running
+the agent. Finished runs stay resumable for `retain_seconds`.
+
+With several workers, `SharedRunRegistry` also writes every run's events to
+SQLite. A worker that did not start the run can then serve its events, a
+resume or a cancel, by polling that table.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+
+from scripts import stream_protocol
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db", "runs.db")
+
+
+class StreamGone(Exception):
+    """The requested events have already left the ring buffer."""
+
+
+class _Run:
+    def __init__(self, max_events):
+        self.events = deque(maxlen=max_events)  # (seq, frame)
+        self.seq = 0
+        self.done = False
+        self.finished_at = None
+        self.changed = asyncio.Event()
+        self.task = None
+
+    def append(self, frame):
+        self.seq += 1
+        self.events.append((self.seq, frame))
+
+    def publish(self):
+        # wake everyone waiting on the current event, then arm a fresh one
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    def first_seq(self):
+        return self.events[0][0] if self.events else self.seq + 1
+
+
+class RunRegistry:
+    def __init__(self, max_events=2000, retain_seconds=300, max_runs=1000, window=0.05):
+        self.max_events = max_events
+        self.retain_seconds = retain_seconds
+        self.max_runs = max_runs
+        self.window = window
+        self._runs = {}
+
+    async def _produce(self, stream_id, run, events):
+        try:
+            async for frames in stream_protocol.merge_frames(events, window=self.window):
+                for frame in frames:
+                    run.append(frame)
+                run.publish()
+                await self._on_events(stream_id, run, len(frames))
+        except asyncio.CancelledError:
+            run.append({"t": "error", "d": "cancelled"})
+            raise
+        except Exception as e:
+            run.append({"t": "error", "d": str(e)})
+        finally:
+            run.done = True
+            run.finished_at = time.monotonic()
+            run.publish()
+            self._on_done(stream_id, run)
+
+    async def _on_events(self, stream_id, run, count):
+        """Called after `count` new events were appended to `run`."""
+
+    def _on_done(self, stream_id, run):
+        """Called once when `run` has finished (its final events are appended)."""
+
+    def start(self, events_factory):
+        """Start a run from `events_factory()` (an async iterator of frames); return its stream id."""
+        self.prune()
+        stream_id = uuid.uuid4().hex
+        run = _Run(self.max_events)
+        self._runs[stream_id] = run
+        run.task = asyncio.create_task(self._produce(stream_id, run, events_factory()))
+        return stream_id
+
+    def cancel(self, stream_id):
+        run = self._runs.get(stream_id)
+        if run is None:
+            return False
+        run.task.cancel()
+        return True
+
+    def prune(self):
+        """Drop finished runs past retention, then the oldest finished ones over `max_runs`."""
+        now = time.monotonic()
+        finished = [(run.finished_at, sid) for sid, run in self._runs.items() if run.done]
+        for finished_at, sid in sorted(finished):
+            if now - finished_at > self.retain_seconds or len(self._runs) > self.max_runs:
+                del self._runs[sid]
+
+    def validate(self, stream_id, last_event_id=0):
+        """Raise KeyError for unknown/expired runs, StreamGone if events were dropped."""
+        run = self._runs[stream_id]
+        if last_event_id + 1 < run.first_seq():
+            raise StreamGone(
+                f"events after {last_event_id} are no longer buffered (oldest is {run.first_seq()})"
+            )
+        return run
+
+    async def subscribe(self, stream_id, last_event_id=0, heartbeat=None):
+        """Yield (seq, frame) after `last_event_id` until the run ends.
+
+        With `heartbeat` set, yields None whenever that many seconds pass
+        without an event, so transports can send keep-alives.
+        """
+        run = self.validate(stream_id, last_event_id)
+        next_seq = last_event_id + 1
+        while True:
+            changed = run.changed
+            if next_seq < run.first_seq():
+                raise StreamGone(f"client fell behind; events before {run.first_seq()} were dropped")
+
+            # copy first: the producer may append while this generator is suspended
+            for seq, frame in list(islice(run.events, next_seq - run.first_seq(), None)):
+                yield seq, frame
+                next_seq = seq + 1
+
+            if run.done and next_seq > run.seq:
+                return
+
+            try:
+                await asyncio.wait_for(changed.wait(), heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    def stats(self):
+        running = sum(1 for run in self._runs.values() if not run.done)
+        return {"runs": len(self._runs), "running": running}
+
+
+class SharedRunRegistry(RunRegistry):
+    """RunRegistry whose events are mirrored to SQLite, so any worker can serve, resume or cancel a run.
+
+    The worker that started a run executes it and serves it from memory as
+    before; other workers poll the table every `poll_interval` seconds.
+    """
+
+    def __init__(self, path=None, poll_interval=0.1, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or os.getenv("STREAM_RUNS_DB", DEFAULT_DB_PATH)
+        self.poll_interval = poll_interval
+        self._watcher = None
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stream_runs (stream_id TEXT PRIMARY KEY, last_seq INTEGER NOT NULL, "
+            "done INTEGER NOT NULL DEFAULT 0, finished_at REAL, cancel INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stream_events "
+            "(stream_id TEXT NOT NULL, seq INTEGER NOT NULL, frame TEXT NOT NULL, PRIMARY KEY (stream_id, seq))"
+        )
+        self._conn.commit()
+
+    # -------------------------
+    # Writes (worker running the run)
+    # -------------------------
+    def _write(self, stream_id, events, last_seq, done=False):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stream_events (stream_id, seq, frame) VALUES (?, ?, ?)",
+                [(stream_id, seq, stream_protocol.dumps(frame).decode()) for seq, frame in events],
+            )
+            self._conn.execute(
+                "INSERT INTO stream_runs (stream_id, last_seq, done, finished_at) VALUES (?, ?, ?, ?) "
+                # a batch still being written when the run was cancelled must not reopen it
+                "ON CONFLICT(stream_id) DO UPDATE SET last_seq = MAX(last_seq, excluded.last_seq), "
+                "done = MAX(done, excluded.done), finished_at = COALESCE(finished_at, excluded.finished_at)",
+                (stream_id, last_seq, int(done), time.time() if done else None),
+            )
+            # same ring-buffer bound as in memory
+            self._conn.execute(
+                "DELETE FROM stream_events WHERE stream_id = ? AND seq <= ?", (stream_id, last_seq - self.max_events)
+            )
+            self._conn.commit()
+
+    async def _on_events(self, stream_id, run, count):
+        events = list(islice(run.events, max(len(run.events) - count, 0), None))
+        await asyncio.to_thread(self._write, stream_id, events, run.seq)
+
+    def _on_done(self, stream_id, run):
+        # may run while the task is being cancelled, so write synchronously
+        try:
+            self._write(stream_id, list(run.events)[-1:], run.seq, done=True)
+        except sqlite3.Error as e:
+            print(f"Failed to record end of run {stream_id}: {e}")
+
+    def start(self, events_factory):
+        stream_id = super().start(events_factory)
+        # registered before the first event, so other workers can subscribe right away
+        self._write(stream_id, [], 0)
+        if self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch_cancellations())
+        return stream_id
+
+    async def _watch_cancellations(self):
+        while True:
+            await asyncio.sleep(max(self.poll_interval * 10, 1.0))
+            try:
+                rows = await asyncio.to_thread(self._fetch, "SELECT stream_id FROM stream_runs WHERE cancel = 1 AND done = 0")
+            except sqlite3.Error as e:
+                print(f"Run cancellation check failed: {e}")
+                continue
+            for (stream_id,) in rows:
+                run = self._runs.get(stream_id)
+                if run is not None and not run.done:
+                    run.task.cancel()
+
+    # -------------------------
+    # Reads (any worker)
+    # -------------------------
+    def _fetch(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _state(self, stream_id):
+        """(last_seq, done, first_seq), or None when the run is unknown or expired."""
+        rows = self._fetch(
+            "SELECT last_seq, done, finished_at, "
+            "(SELECT MIN(seq) FROM stream_events WHERE stream_id = ?) FROM stream_runs WHERE stream_id = ?",
+            (stream_id, stream_id),
+        )
+        if not rows:
+            return None
+        last_seq, done, finished_at, first_seq = rows[0]
+        if done and time.time() - finished_at > self.retain_seconds:
+            return None
+        return last_seq, bool(done), first_seq if first_seq is not None else last_seq + 1
+
+    def cancel(self, stream_id):
+        if stream_id in self._runs:
+            return super().cancel(stream_id)
+        with self._lock:
+            cur = self._conn.execute(
+                "UPDATE stream_runs SET cancel = 1 WHERE stream_id = ? AND done = 0", (stream_id,)
+            )
+            self._conn.commit()
+        return cur.rowcount == 1
+
+    def prune(self):
+        super().prune()
+        with self._lock:
+            expired = [
+                sid for (sid,) in self._conn.execute(
+                    "SELECT stream_id FROM stream_runs WHERE done = 1 AND finished_at < ?",
+                    (time.time() - self.retain_seconds,),
+                )
+            ]
+            for sid in expired:
+                self._conn.execute("DELETE FROM stream_events WHERE stream_id = ?", (sid,))
+                self._conn.execute("DELETE FROM stream_runs WHERE stream_id = ?", (sid,))
+            self._conn.commit()
+
+    def validate(self, stream_id, last_event_id=0):
+        if stream_id in self._runs:
+            return super().validate(stream_id, last_event_id)
+        state = self._state(stream_id)
+        if state is None:
+            raise KeyError(stream_id)
+        if last_event_id + 1 < state[2]:
+            raise StreamGone(f"events after {last_event_id} are no longer buffered (oldest is {state[2]})")
+        return state
+
+    async def subscribe(self, stream_id, last_event_id=0, heartbeat=None):
+        if stream_id in self._runs:
+            async for item in super().subscribe(stream_id, last_event_id, heartbeat):
+                yield item
+            return
+
+        self.validate(stream_id, last_event_id)
+        next_seq = last_event_id + 1
+        idle = 0.0
+        while True:
+            state = await asyncio.to_thread(self._state, stream_id)
+            if state is None:
+                return
+            last_seq, done, first_seq = state
+            if next_seq < first_seq:
+                raise StreamGone(f"client fell behind; events before {first_seq} were dropped")
+
+            rows = await asyncio.to_thread(
+                self._fetch,
+                "SELECT seq, frame FROM stream_events WHERE stream_id = ? AND seq >= ? ORDER BY seq",
+                (stream_id, next_seq),
+            )
+            for seq, frame in rows:
+                yield seq, json.loads(frame)
+                next_seq = seq + 1
+
+            # done is written after the last events, so nothing can be missed here
+            if done and next_seq > last_seq:
+                return
+            if rows:
+                idle = 0.0
+                continue
+            await asyncio.sleep(self.poll_interval)
+            idle += self.poll_interval
+            if heartbeat and idle >= heartbeat:
+                idle = 0.0
+                yield None
@@ -0,0 +1,90 @@
+"""
+Cross-process per-thread leases in SQLite.
+
+With several uvicorn workers, two requests for the same `thread_id` can land
+on different processes and interleave checkpoint writes. A worker takes a
+lease on the thread for the duration of a run; others wait for it. Leases
+expire (and are renewed while held), so a crashed worker cannot block a
+thread forever.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "db", "leases.db")
+
+
+class LeaseTimeout(Exception):
+    """The thread stayed leased by another worker for longer than the wait timeout."""
+
+
+class ThreadLeases:
+    def __init__(self, path=None, ttl=60.0, poll_interval=0.05):
+        self.path = path or os.getenv("THREAD_LEASE_DB", DEFAULT_DB_PATH)
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS thread_leases "
+            "(thread_id TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def try_acquire(self, thread_id, token):
+        """Take the lease if it is free or expired; True on success."""
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO thread_leases (thread_id, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE thread_leases.expires_at < ?",
+                (thread_id, token, now + self.ttl, now),
+            )
+            self._conn.commit()
+            return cur.rowcount == 1
+
+    def renew(self, thread_id, token):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE thread_leases SET expires_at = ? WHERE thread_id = ? AND owner = ?",
+                (time.time() + self.ttl, thread_id, token),
+            )
+            self._conn.commit()
+
+    def release(self, thread_id, token):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM thread_leases WHERE thread_id = ? AND owner = ?", (thread_id, token)
+            )
+            self._conn.commit()
+
+    async def _keep_alive(self, thread_id, token):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            await asyncio.to_thread(self.renew, thread_id, token)
+
+    @asynccontextmanager
+    async def hold(self, thread_id, timeout=None):
+        """Hold the lease on `thread_id` for the body of the `async with`."""
+        token = f"{self.owner}-{uuid.uuid4().hex[:8]}"
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not await asyncio.to_thread(self.try_acquire, thread_id, token):
+            if deadline is not None and time.monotonic() > deadline:
+                raise LeaseTimeout(f"thread '{thread_id}' is busy")
+            await asyncio.sleep(self.poll_interval)
+
+        renewer = asyncio.create_task(self._keep_alive(thread_id, token))
+        try:
+            yield
+        finally:
+            renewer.cancel()
+            await asyncio.to_thread(self.release, thread_id, token)
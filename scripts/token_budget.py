@@ -0,0 +1,199 @@
+"""
+Token-budget message windowing for long threads.
+
+Only the most recent messages that fit in `max_tokens` are sent to the
+model; the full history stays in the checkpoint. Token counts come from a
+local tiktoken estimate (or len/4 without tiktoken) and are cached per
+message. An AIMessage with tool calls and its ToolMessages are never split,
+and the window always begins with a user message (Gemini rejects a
+conversation that opens with a model turn): it starts at a HumanMessage when
+one fits, otherwise the current turn's question is kept in front of it.
+
+With `summary_model` set, messages that fall out of the window are folded
+into a running summary (only the newly dropped ones each time), which is
+appended to the system message. The summary is updated in the model call
+wrapper, so it uses the same window as trimming.
+"""
+from collections import OrderedDict
+from typing import Annotated, NotRequired
+
+from langchain.agents.middleware import AgentMiddleware, AgentState
+from langchain.agents.middleware.types import ExtendedModelResponse, PrivateStateAttr
+from langchain.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langgraph.types import Command
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+MESSAGE_OVERHEAD = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation with the new messages below.
+Keep facts, decisions, names, numbers and open questions. Be concise.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+Updated summary:"""
+
+
+def estimate_tokens(text):
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+class TokenBudgetState(AgentState):
+    conversation_summary: NotRequired[Annotated[str, PrivateStateAttr]]
+    summarized_through: NotRequired[Annotated[str, PrivateStateAttr]]
+
+
+class TokenBudgetMiddleware(AgentMiddleware):
+    """Send the model only the newest messages that fit a token budget."""
+
+    state_schema = TokenBudgetState
+
+    def __init__(self, max_tokens=16000, summary_model=None, cache_size=10000):
+        super().__init__()
+        self.max_tokens = max_tokens
+        self.summary_model = summary_model
+        self.cache_size = cache_size
+        self._counts = OrderedDict()
+
+    # -------------------------
+    # Token counting
+    # -------------------------
+    def count(self, message):
+        key = (message.id, len(message.text)) if message.id else None
+        if key is not None and key in self._counts:
+            self._counts.move_to_end(key)
+            return self._counts[key]
+
+        tokens = estimate_tokens(message.text) + MESSAGE_OVERHEAD
+        if isinstance(message, AIMessage) and message.tool_calls:
+            tokens += estimate_tokens(str(message.tool_calls))
+
+        if key is not None:
+            self._counts[key] = tokens
+            if len(self._counts) > self.cache_size:
+                self._counts.popitem(last=False)
+        return tokens
+
+    def window_start(self, messages, budget=None):
+        """Index of the first message that fits in the budget."""
+        budget = self.max_tokens if budget is None else budget
+        total = 0
+        start = len(messages)
+        for idx in range(len(messages) - 1, -1, -1):
+            tokens = self.count(messages[idx])
+            # always keep the newest message, even if it alone is over budget
+            if total + tokens > budget and start < len(messages):
+                break
+            total += tokens
+            start = idx
+
+        # never start on a ToolMessage whose tool-call request was cut off
+        while 0 < start < len(messages) and isinstance(messages[start], ToolMessage):
+            start -= 1
+
+        # start on a user message when one is in the window
+        if 0 < start < len(messages) and not isinstance(messages[start], HumanMessage):
+            human = next(
+                (idx for idx in range(start, len(messages)) if isinstance(messages[idx], HumanMessage)), None
+            )
+            if human is not None:
+                start = human
+        return start
+
+    @staticmethod
+    def turn_question(messages, start):
+        """The HumanMessage that opened the turn `messages[start]` belongs to, if cut off."""
+        if start == 0 or start >= len(messages) or isinstance(messages[start], HumanMessage):
+            return None
+        return next((m for m in reversed(messages[:start]) if isinstance(m, HumanMessage)), None)
+
+    # -------------------------
+    # Summarization
+    # -------------------------
+    def _summary_update(self, state, messages, start):
+        """Summary prompt for messages[:start] not summarized yet, and the id of the last one."""
+        summarized_through = state.get("summarized_through")
+        ids = [m.id for m in messages]
+        first = ids.index(summarized_through) + 1 if summarized_through in ids else 0
+        dropped = messages[first:start]
+        if not dropped:
+            return None, None
+
+        transcript = "\n".join(f"{m.type}: {m.text}" for m in dropped if m.text)
+        prompt = SUMMARY_PROMPT.format(
+            summary=state.get("conversation_summary") or "(none)", messages=transcript
+        )
+        return prompt, dropped[-1].id
+
+    # -------------------------
+    # Windowing
+    # -------------------------
+    def _system_message(self, request, summary):
+        if not summary:
+            return request.system_message
+        summary_text = f"Summary of the earlier conversation:\n{summary}"
+        if request.system_message is not None:
+            summary_text = f"{request.system_message.text}\n\n{summary_text}"
+        return SystemMessage(summary_text)
+
+    def _window_start(self, request):
+        """Window start for the request: max_tokens minus the system message and the current summary.
+
+        Summarization and trimming both use this one index, so every message
+        left out of the window is in the summary.
+        """
+        system_message = self._system_message(request, request.state.get("conversation_summary"))
+        budget = self.max_tokens
+        if system_message is not None:
+            budget -= estimate_tokens(system_message.text)
+        return self.window_start(request.messages, max(budget, 0))
+
+    def _trim(self, request, start, summary):
+        messages = request.messages
+        system_message = self._system_message(request, summary)
+        if start == 0 and system_message is request.system_message:
+            return request
+        window = messages[start:]
+        question = self.turn_question(messages, start)
+        if question is not None:
+            # the whole window is one tool-calling turn; keep the question that started it
+            window = [question, *window]
+        return request.override(messages=window, system_message=system_message)
+
+    @staticmethod
+    def _respond(response, update):
+        if update is None:
+            return response
+        return ExtendedModelResponse(model_response=response, command=Command(update=update))
+
+    def wrap_model_call(self, request, handler):
+        start = self._window_start(request)
+        summary, update = request.state.get("conversation_summary"), None
+        if self.summary_model is not None:
+            prompt, last_id = self._summary_update(request.state, request.messages, start)
+            if prompt is not None:
+                summary = self.summary_model.invoke([HumanMessage(prompt)]).text
+                update = {"conversation_summary": summary, "summarized_through": last_id}
+        return self._respond(handler(self._trim(request, start, summary)), update)
+
+    async def awrap_model_call(self, request, handler):
+        start = self._window_start(request)
+        summary, update = request.state.get("conversation_summary"), None
+        if self.summary_model is not None:
+            prompt, last_id = self._summary_update(request.state, request.messages, start)
+            if prompt is not None:
+                summary = (await self.summary_model.ainvoke([HumanMessage(prompt)])).text
+                update = {"conversation_summary": summary, "summarized_through": last_id}
+        return self._respond(await handler(self._trim(request, start, summary)), update)
@@ -0,0 +1,261 @@
+"""
+TTL cache for tool results.
+
+Identical tool calls ("weather in Mumbai", the same headline search) are
+answered from cache for a per-tool TTL. Keys are case- and whitespace-folded,
+concurrent identical calls share a single upstream request, and hit/miss
+counters are kept per tool. If the caller that is fetching is cancelled,
+one of the waiting callers runs the call instead of all of them failing.
+
+Backend is chosen with TOOL_CACHE_BACKEND=memory|sqlite (default memory);
+set TOOL_CACHE=0 to disable caching.
+"""
+import asyncio
+import functools
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+from scripts import utils
+
+DEFAULT_TTLS = {
+    "get_weather": 600,
+    "web_search": 300,
+}
+
+
+def normalize(value):
+    """Fold case and whitespace so "  Mumbai" and "mumbai " share a key."""
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    return value
+
+
+def make_key(tool_name, args, kwargs):
+    payload = [normalize(a) for a in args] + sorted(
+        (k, normalize(v)) for k, v in kwargs.items()
+    )
+    return f"{tool_name}:{json.dumps(payload, default=str)}"
+
+
+# -------------------------
+# Backends
+# -------------------------
+class MemoryBackend:
+    """In-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._items[key] = (time.time() + ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+class SQLiteBackend:
+    """On-disk cache shared across processes; values must be JSON serializable."""
+
+    def __init__(self, path=None):
+        self.path = path or utils.get_cache_path("tool_cache.db")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM tool_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, default=str), time.time() + ttl),
+            )
+            self._conn.commit()
+
+    def purge_expired(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_cache")
+            self._conn.commit()
+
+
+# -------------------------
+# Tool Cache
+# -------------------------
+class ToolCache:
+    def __init__(self, backend=None, ttls=None, default_ttl=300, enabled=True):
+        self.backend = backend or MemoryBackend()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.stats = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0})
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._ainflight = {}
+
+    def ttl_for(self, tool_name):
+        return self.ttls.get(tool_name, self.default_ttl)
+
+    def _lookup(self, tool_name, key):
+        item = self.backend.get(key)
+        if item is not None:
+            self.stats[tool_name]["hits"] += 1
+        return item
+
+    def get_or_call(self, tool_name, key, fn):
+        if not self.enabled:
+            return fn()
+
+        while True:
+            item = self._lookup(tool_name, key)
+            if item is not None:
+                return item[1]
+
+            # single flight: the first caller fetches, the others wait for it
+            with self._lock:
+                flight = self._inflight.get(key)
+                leader = flight is None
+                if leader:
+                    flight = {"done": threading.Event(), "value": None, "error": None, "finished": False}
+                    self._inflight[key] = flight
+
+            if leader:
+                break
+            self.stats[tool_name]["coalesced"] += 1
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            if flight["finished"]:
+                return flight["value"]
+            # the leader was interrupted without a result; one waiter takes over
+
+        self.stats[tool_name]["misses"] += 1
+        try:
+            flight["value"] = fn()
+            flight["finished"] = True
+            self.backend.set(key, flight["value"], self.ttl_for(tool_name))
+            return flight["value"]
+        except Exception as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight["done"].set()
+
+    async def aget_or_call(self, tool_name, key, afn):
+        if not self.enabled:
+            return await afn()
+
+        loop = asyncio.get_running_loop()
+        flight_key = (id(loop), key)
+        while True:
+            item = self._lookup(tool_name, key)
+            if item is not None:
+                return item[1]
+
+            future = self._ainflight.get(flight_key)
+            if future is None:
+                break
+            self.stats[tool_name]["coalesced"] += 1
+            try:
+                # shielded, so a cancelled follower does not cancel the leader
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                # the leader was cancelled, not us; one follower re-runs the call
+
+        future = loop.create_future()
+        self._ainflight[flight_key] = future
+        self.stats[tool_name]["misses"] += 1
+        try:
+            value = await afn()
+            self.backend.set(key, value, self.ttl_for(tool_name))
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            self._ainflight.pop(flight_key, None)
+
+    def get_stats(self):
+        return {name: dict(counts) for name, counts in self.stats.items()}
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        backend = SQLiteBackend() if os.getenv("TOOL_CACHE_BACKEND") == "sqlite" else MemoryBackend()
+        _cache = ToolCache(backend=backend, enabled=os.getenv("TOOL_CACHE", "1") != "0")
+    return _cache
+
+
+def cached(tool_name):
+    """Cache a tool function (sync or async) under `tool_name`'s TTL."""
+
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                key = make_key(tool_name, args, kwargs)
+                return await get_cache().aget_or_call(tool_name, key, lambda: fn(*args, **kwargs))
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = make_key(tool_name, args, kwargs)
+            return get_cache().get_or_call(tool_name, key, lambda: fn(*args, **kwargs))
+        return wrapper
+
+    return decorator
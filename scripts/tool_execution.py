@@ -0,0 +1,83 @@
+"""
+Tool execution middleware: per-tool concurrency caps and timeouts.
+
+`create_agent` already dispatches every tool call of one AIMessage as its own
+task, so independent calls run concurrently and their ToolMessages are merged
+back in call order. This middleware bounds that fan-out per tool and stops a
+slow tool from holding up the whole step.
+"""
+import asyncio
+import threading
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import ToolMessage
+
+
+class ToolExecutionMiddleware(AgentMiddleware):
+    """Cap concurrent calls per tool and time out slow tool calls.
+
+    Args:
+        max_concurrency: per-tool limits, e.g. {"get_weather": 4}
+        default_max_concurrency: limit for tools not listed (None = unlimited)
+        timeouts: per-tool timeouts in seconds
+        default_timeout: timeout for tools not listed (None = no timeout)
+
+    Timeouts apply to async execution (`ainvoke`/`astream`) and start once
+    the call holds its concurrency slot; the sync path only enforces
+    concurrency caps.
+    """
+
+    def __init__(self, max_concurrency=None, default_max_concurrency=None,
+                 timeouts=None, default_timeout=60.0):
+        super().__init__()
+        self.max_concurrency = max_concurrency or {}
+        self.default_max_concurrency = default_max_concurrency
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+
+        self._async_limits = {}
+        self._sync_limits = {}
+        self._lock = threading.Lock()
+
+    def _limit_for(self, tool_name):
+        return self.max_concurrency.get(tool_name, self.default_max_concurrency)
+
+    def _get_limiter(self, limiters, tool_name, factory):
+        limit = self._limit_for(tool_name)
+        if limit is None:
+            return None
+        with self._lock:
+            if tool_name not in limiters:
+                limiters[tool_name] = factory(limit)
+            return limiters[tool_name]
+
+    def wrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        limiter = self._get_limiter(self._sync_limits, name, threading.BoundedSemaphore)
+        if limiter is None:
+            return handler(request)
+
+        with limiter:
+            return handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+        timeout = self.timeouts.get(name, self.default_timeout)
+        limiter = self._get_limiter(self._async_limits, name, asyncio.Semaphore)
+
+        async def run():
+            # the timeout covers the call itself, not the wait for a free slot
+            try:
+                return await asyncio.wait_for(handler(request), timeout=timeout)
+            except asyncio.TimeoutError:
+                return ToolMessage(
+                    content=f"Error: tool '{name}' timed out after {timeout}s",
+                    tool_call_id=request.tool_call["id"],
+                    name=name,
+                    status="error",
+                )
+
+        if limiter is None:
+            return await run()
+        async with limiter:
+            return await run()
@@ -0,0 +1,246 @@
+"""
+Post-process large tool outputs before they reach the model.
+
+Outputs over a per-tool character cap are replaced with a compact digest:
+tabular results (sheet values, SQL rows, lists of records) get row counts,
+column stats and head/tail rows; anything else is cut to head and tail.
+The full payload is spilled to a local blob store and the model gets a
+handle it can page through with the `read_tool_output` tool. Blobs not used
+for TOOL_OUTPUT_BLOB_TTL seconds (default a day) are deleted, as are the least
+recently used ones once the store is over TOOL_OUTPUT_BLOB_MAX_MB (default 256).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import threading
+import time
+from collections import Counter
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import ToolMessage
+from langchain.tools import tool
+
+from scripts import utils
+
+
+# -------------------------
+# Blob Store
+# -------------------------
+class BlobStore:
+    """Content-addressed text blobs on local disk, evicted by age and total size.
+
+    A blob's mtime is its last use (written or read); eviction runs every
+    `evict_every` puts.
+    """
+
+    def __init__(self, root=None, max_age=None, max_bytes=None, evict_every=50):
+        self.root = root or os.path.join(utils.CACHE_DIR, "blobs")
+        self.max_age = max_age if max_age is not None else int(os.getenv("TOOL_OUTPUT_BLOB_TTL", "86400"))
+        self.max_bytes = (
+            max_bytes if max_bytes is not None else int(os.getenv("TOOL_OUTPUT_BLOB_MAX_MB", "256")) * 1024 * 1024
+        )
+        self.evict_every = evict_every
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+        self.evict()
+
+    def _path(self, handle):
+        return os.path.join(self.root, f"{os.path.basename(handle)}.txt")
+
+    def put(self, text):
+        handle = hashlib.sha256(text.encode()).hexdigest()[:16]
+        path = self._path(handle)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % self.evict_every == 0
+        if evict:
+            self.evict()
+        return handle
+
+    def get(self, handle):
+        path = self._path(handle)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return text
+
+    def evict(self):
+        """Delete blobs older than max_age, then the least recently used ones over max_bytes."""
+        now = time.time()
+        blobs = []
+        for entry in os.scandir(self.root):
+            if not entry.name.endswith(".txt"):
+                continue
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            blobs.append((st.st_mtime, st.st_size, entry.path))
+
+        blobs.sort()
+        total = sum(size for _, size, _ in blobs)
+        for mtime, size, path in blobs:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+blob_store = BlobStore()
+
+
+@tool
+def read_tool_output(handle: str, offset: int = 0, limit: int = 4000):
+    """Read part of a large tool output that was stored instead of returned in full.
+
+    Args:
+        handle: blob handle given in the truncated tool result
+        offset: character offset to start reading from
+        limit: number of characters to return (max 4000)
+    """
+    text = blob_store.get(handle)
+    if text is None:
+        return f"Error: no stored output with handle {handle}"
+
+    limit = min(limit, 4000)
+    chunk = text[offset:offset + limit]
+    return f"[chars {offset}-{offset + len(chunk)} of {len(text)}]\n{chunk}"
+
+
+# -------------------------
+# Summaries
+# -------------------------
+def _as_table(data):
+    """Return (columns, rows) if `data` looks tabular, else None."""
+    if isinstance(data, dict):
+        # Google Sheets style {"values": [[header...], [row...]]} or {"rows": [...]}
+        for key in ("values", "rows", "data", "results"):
+            if isinstance(data.get(key), list):
+                return _as_table(data[key])
+        return None
+
+    if not isinstance(data, list) or len(data) < 2:
+        return None
+
+    if all(isinstance(row, dict) for row in data):
+        columns = list(dict.fromkeys(k for row in data for k in row))
+        return columns, [[row.get(c) for c in columns] for row in data]
+
+    if all(isinstance(row, list) for row in data):
+        header, rows = data[0], data[1:]
+        return [str(c) for c in header], rows
+
+    return None
+
+
+def _column_stats(values):
+    present = [v for v in values if v not in (None, "")]
+    stats = {"non_null": len(present)}
+
+    numbers = []
+    for v in present:
+        try:
+            numbers.append(float(v))
+        except (TypeError, ValueError):
+            break
+    else:
+        if numbers:
+            stats.update(min=min(numbers), max=max(numbers), mean=round(statistics.fmean(numbers), 4))
+            return stats
+
+    counts = Counter(str(v) for v in present)
+    stats["distinct"] = len(counts)
+    if counts:
+        stats["top"] = counts.most_common(1)[0][0][:50]
+    return stats
+
+
+def summarize_table(columns, rows, head=3, tail=2):
+    lines = [f"Table: {len(rows)} rows x {len(columns)} columns"]
+    for idx, column in enumerate(columns):
+        values = [row[idx] if idx < len(row) else None for row in rows]
+        lines.append(f"- {column}: {json.dumps(_column_stats(values), default=str)}")
+
+    lines.append(f"Head ({min(head, len(rows))} rows):")
+    lines.extend(json.dumps(row, default=str) for row in rows[:head])
+    tail_rows = rows[max(head, len(rows) - tail):]
+    if tail_rows:
+        lines.append(f"Tail ({len(tail_rows)} rows):")
+        lines.extend(json.dumps(row, default=str) for row in tail_rows)
+    return "\n".join(lines)
+
+
+def summarize_output(text, max_chars):
+    try:
+        table = _as_table(json.loads(text))
+    except (ValueError, TypeError):
+        table = None
+
+    if table is not None:
+        summary = summarize_table(*table)
+        if len(summary) <= max_chars:
+            return summary
+
+    half = max_chars // 2
+    return f"{text[:half]}\n... [{len(text) - 2 * half} chars omitted] ...\n{text[-half:]}"
+
+
+# -------------------------
+# Middleware
+# -------------------------
+class ToolOutputMiddleware(AgentMiddleware):
+    """Cap tool output size per tool and spill full payloads to the blob store."""
+
+    tools = [read_tool_output]
+
+    def __init__(self, max_chars=4000, per_tool=None):
+        super().__init__()
+        self.max_chars = max_chars
+        self.per_tool = per_tool or {}
+
+    def _over_limit(self, result):
+        if not isinstance(result, ToolMessage) or result.name == read_tool_output.name:
+            return False
+        limit = self.per_tool.get(result.name, self.max_chars)
+        return limit is not None and len(result.text) > limit
+
+    def _process(self, result):
+        if not self._over_limit(result):
+            return result
+
+        limit = self.per_tool.get(result.name, self.max_chars)
+        text = result.text
+        handle = blob_store.put(text)
+        content = (
+            f"{summarize_output(text, limit)}\n\n"
+            f"[Output truncated from {len(text)} chars. Full result stored with handle "
+            f"'{handle}'; use read_tool_output to read more.]"
+        )
+        return result.model_copy(update={"content": content})
+
+    def wrap_tool_call(self, request, handler):
+        return self._process(handler(request))
+
+    async def awrap_tool_call(self, request, handler):
+        result = await handler(request)
+        if not self._over_limit(result):
+            return result
+        # digesting and writing the blob happen off the event loop
+        return await asyncio.to_thread(self._process, result)
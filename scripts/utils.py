@@ -2,17 +2,38 @@ import os
 import json
 
 
+# Local cache directory for tool results, blobs and other derived data
+CACHE_DIR = os.getenv(
+    "AGENT_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache")
+)
+
+
+def get_cache_path(*parts):
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+
 # -------------------------
 # MCP Config Loader
 # -------------------------
+MCP_CONFIG_PATH = os.path.join(os.path.dirname(__file__), 'mcp_config.json')
+
+# Parsed once; re-read only when the file's mtime changes
+_config_cache = {"mtime": None, "config": None}
+
+
 def load_mcp_config(*server_names):
-    config_path = os.path.join(os.path.dirname(__file__), 'mcp_config.json')
+    mtime = os.stat(MCP_CONFIG_PATH).st_mtime_ns
+    if _config_cache["mtime"] != mtime:
+        with open(MCP_CONFIG_PATH, 'r') as f:
+            _config_cache["config"] = json.load(f)
+        _config_cache["mtime"] = mtime
 
-    with open(config_path, 'r') as f:
-        all_configs = json.load(f)
+    all_configs = _config_cache["config"]
 
     if len(server_names)==0:
-        return all_configs
+        return dict(all_configs)
     
     selected_configs = {}
     for name in server_names: